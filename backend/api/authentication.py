@@ -0,0 +1,88 @@
+import copy
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from rest_framework.authentication import TokenAuthentication
+
+from recipes.versioning import bump_version, cache_is_shared, get_version
+
+
+def get_auth_version(user_id):
+    return get_version(f'auth:{user_id}')
+
+
+def invalidate_user_tokens(user_id):
+    bump_version(f'auth:{user_id}')
+    token_cache.discard_user(user_id)
+
+
+class TokenCache:
+
+    def __init__(self, max_size, ttl):
+        self.max_size = max_size
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get_ttl(self):
+        # Об отзыве токена в другом процессе кэш узнаёт только через общий
+        # кэш версий; без него токены не кэшируются.
+        return self.ttl if cache_is_shared() else 0
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            user, token, version, expires_at = entry
+            if expires_at < time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+        if version != get_auth_version(user.pk):
+            self.discard(key)
+            return None
+        return copy.copy(user), token
+
+    def set(self, key, user, token, version):
+        ttl = self.get_ttl()
+        if ttl <= 0:
+            return
+        with self._lock:
+            self._entries[key] = (user, token, version,
+                                  time.monotonic() + ttl)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def discard(self, key):
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def discard_user(self, user_id):
+        with self._lock:
+            for key in [key for key, (user, *_) in self._entries.items()
+                        if user.pk == user_id]:
+                del self._entries[key]
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+token_cache = TokenCache(settings.AUTH_TOKEN_CACHE_SIZE,
+                         settings.AUTH_TOKEN_CACHE_TTL)
+
+
+class CachedTokenAuthentication(TokenAuthentication):
+
+    def authenticate_credentials(self, key):
+        cached = token_cache.get(key)
+        if cached is not None:
+            return cached
+        user, token = super().authenticate_credentials(key)
+        version = get_auth_version(user.pk)
+        token_cache.set(key, user, token, version)
+        return copy.copy(user), token
@@ -0,0 +1,185 @@
+import hashlib
+import threading
+
+from django.core.cache import caches
+from django.http import HttpResponse, HttpResponseNotModified
+from django.utils.cache import quote_etag
+from rest_framework.renderers import JSONRenderer
+
+from recipes.versioning import get_version
+
+
+class ReferenceDataCacheMixin:
+    reference_version = None
+    reference_cache_size = 256
+
+    _rendered = {}
+    _rendered_lock = threading.Lock()
+
+    def get_etag(self, version):
+        return quote_etag(f'{self.reference_version}-{version}')
+
+    def etag_matches(self, request, etag):
+        if_none_match = request.META.get('HTTP_IF_NONE_MATCH', '')
+        return etag in [tag.strip() for tag in if_none_match.split(',')]
+
+    def cached_response(self, request, render, key):
+        version = get_version(self.reference_version)
+        etag = self.get_etag(version)
+        if self.etag_matches(request, etag):
+            response = HttpResponseNotModified()
+            response['ETag'] = etag
+            return response
+        if request.accepted_renderer.format != 'json':
+            response = render()
+            response['ETag'] = etag
+            return response
+
+        cache_key = (self.reference_version, version, key)
+        body = self._rendered.get(cache_key)
+        if body is None:
+            body = JSONRenderer().render(render().data)
+            with self._rendered_lock:
+                for stale_key in [
+                    stale_key for stale_key in self._rendered
+                    if stale_key[0] == self.reference_version
+                    and stale_key[1] != version
+                ]:
+                    del self._rendered[stale_key]
+                while len(self._rendered) >= self.reference_cache_size:
+                    del self._rendered[next(iter(self._rendered))]
+                self._rendered[cache_key] = body
+        response = HttpResponse(body, content_type='application/json')
+        response['ETag'] = etag
+        return response
+
+    def list(self, request, *args, **kwargs):
+        return self.cached_response(
+            request,
+            lambda: super(ReferenceDataCacheMixin, self).list(
+                request, *args, **kwargs),
+            ('list', request.get_full_path())
+        )
+
+    def retrieve(self, request, *args, **kwargs):
+        return self.cached_response(
+            request,
+            lambda: super(ReferenceDataCacheMixin, self).retrieve(
+                request, *args, **kwargs),
+            ('retrieve',
+             kwargs.get(self.lookup_url_kwarg or self.lookup_field))
+        )
+
+
+class ResponseCacheStats:
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._endpoints = {}
+
+    def record(self, endpoint, hit):
+        with self._lock:
+            stats = self._endpoints.setdefault(endpoint,
+                                               {'hits': 0, 'misses': 0})
+            stats['hits' if hit else 'misses'] += 1
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                endpoint: {
+                    **stats,
+                    'hit_ratio': stats['hits'] / (stats['hits']
+                                                  + stats['misses']),
+                }
+                for endpoint, stats in self._endpoints.items()
+            }
+
+    def clear(self):
+        with self._lock:
+            self._endpoints.clear()
+
+
+response_cache_stats = ResponseCacheStats()
+
+
+class AnonymousResponseCacheMixin:
+    """Кэш готовых ответов list и retrieve для анонимных запросов.
+
+    Ключ содержит версию из get_response_version_name(): чтобы сбросить
+    закэшированные ответы, достаточно поднять версию.
+    """
+    response_cache_alias = 'responses'
+    # Версия списков и шаблон версии страницы объекта, например
+    # 'recipe:{}'. Без шаблона страницы сбрасываются вместе со списками.
+    response_version_name = None
+    response_object_version_name = None
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        assert cls.response_version_name, (
+            f'{cls.__name__}: не задан response_version_name'
+        )
+
+    def get_response_version_name(self):
+        if (self.action == 'list'
+                or self.response_object_version_name is None):
+            return self.response_version_name
+        lookup = str(self.kwargs.get(self.lookup_url_kwarg
+                                     or self.lookup_field, ''))
+        # По нечисловому id объекта нет, и кэшировать нечего.
+        if not lookup.isdigit():
+            return None
+        return self.response_object_version_name.format(lookup)
+
+    def get_response_cache_key(self, request, version):
+        # Параметры сортируются, чтобы порядок в строке запроса не плодил
+        # копий. Ссылки на страницы и картинки абсолютные, поэтому адрес
+        # сайта тоже входит в ключ.
+        params = sorted((name, sorted(values))
+                        for name, values in request.query_params.lists())
+        lookup = self.kwargs.get(self.lookup_url_kwarg or self.lookup_field)
+        digest = hashlib.sha1(repr((
+            self.action, lookup, request.build_absolute_uri('/'), params
+        )).encode()).hexdigest()
+        return f'response:{self.basename}:{version}:{digest}'
+
+    def cached_anonymous_response(self, request, render):
+        if (request.user.is_authenticated
+                or request.accepted_renderer.format != 'json'):
+            return render()
+        version_name = self.get_response_version_name()
+        if version_name is None:
+            return render()
+        cache = caches[self.response_cache_alias]
+        key = self.get_response_cache_key(request, get_version(version_name))
+        body = cache.get(key)
+        response_cache_stats.record(
+            f'{request.method} {request.resolver_match.view_name}',
+            body is not None
+        )
+        if body is None:
+            response = render()
+            if response.status_code != 200:
+                return response
+            body = JSONRenderer().render(response.data)
+            cache.set(key, body)
+            status = 'MISS'
+        else:
+            status = 'HIT'
+        response = HttpResponse(body, content_type='application/json')
+        response['X-Cache'] = status
+        return response
+
+    def list(self, request, *args, **kwargs):
+        return self.cached_anonymous_response(
+            request,
+            lambda: super(AnonymousResponseCacheMixin, self).list(
+                request, *args, **kwargs)
+        )
+
+    def retrieve(self, request, *args, **kwargs):
+        return self.cached_anonymous_response(
+            request,
+            lambda: super(AnonymousResponseCacheMixin, self).retrieve(
+                request, *args, **kwargs)
+        )
@@ -1,7 +1,8 @@
 import django_filters
 from django.contrib.auth import get_user_model
-from django.db.models import Count
+from rest_framework.filters import OrderingFilter
 
+from recipes.fulltext import search_recipes
 from recipes.models import Recipe, Tag, Ingredient
 
 User = get_user_model()
@@ -21,10 +22,18 @@ class RecipeFilter(django_filters.rest_framework.FilterSet):
         conjoined=False,
 
     )
+    search = django_filters.CharFilter(method='filter_search')
 
     class Meta:
         model = Recipe
-        fields = ['tags', 'author', 'is_favorited', 'is_in_shopping_cart']
+        fields = ['tags', 'author', 'is_favorited', 'is_in_shopping_cart',
+                  'search']
+
+    def filter_search(self, queryset, name, value):
+        value = value.strip()
+        if not value:
+            return queryset
+        return search_recipes(queryset, value)
 
     def filter_is_favorited(self, recipes, name, value):
         user = self.request.user
@@ -46,6 +55,16 @@ class RecipeFilter(django_filters.rest_framework.FilterSet):
         return queryset
 
 
+class RecipeOrderingFilter(OrderingFilter):
+    # Результаты поиска без явного ordering сортируются по релевантности.
+
+    def get_ordering(self, request, queryset, view):
+        if (self.ordering_param not in request.query_params
+                and 'search_rank' in queryset.query.annotations):
+            return ('-search_rank', 'pk')
+        return super().get_ordering(request, queryset, view)
+
+
 class SubscriptionFilter(django_filters.FilterSet):
     recipes_limit = django_filters.NumberFilter(method='filter_recipes_limit')
 
@@ -55,10 +74,7 @@ class SubscriptionFilter(django_filters.FilterSet):
 
     def filter_recipes_limit(self, queryset, name, value):
         if value is not None:
-            queryset = queryset.annotate(
-                recipes_count=Count('recipes')).filter(
-                recipes_count__lte=value
-            )
+            queryset = queryset.filter(recipes_count__lte=value)
         return queryset
 
 
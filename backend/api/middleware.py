@@ -0,0 +1,183 @@
+import logging
+import threading
+import time
+from contextlib import ExitStack, contextmanager
+
+from django.conf import settings
+from django.db import connections
+
+logger = logging.getLogger('api.metrics')
+
+
+class QueryBudgetExceeded(Exception):
+    pass
+
+
+class MetricsStore:
+
+    fields = ('queries', 'db', 'app', 'serialize', 'render', 'total')
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._endpoints = {}
+
+    def record(self, endpoint, sample):
+        with self._lock:
+            stats = self._endpoints.setdefault(endpoint, {
+                'count': 0,
+                **{f'{field}_sum': 0 for field in self.fields},
+                **{f'{field}_max': 0 for field in self.fields},
+            })
+            stats['count'] += 1
+            for field in self.fields:
+                stats[f'{field}_sum'] += sample[field]
+                stats[f'{field}_max'] = max(stats[f'{field}_max'],
+                                            sample[field])
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                endpoint: {
+                    'count': stats['count'],
+                    **{f'{field}_avg': stats[f'{field}_sum'] / stats['count']
+                       for field in self.fields},
+                    **{f'{field}_max': stats[f'{field}_max']
+                       for field in self.fields},
+                }
+                for endpoint, stats in self._endpoints.items()
+            }
+
+    def clear(self):
+        with self._lock:
+            self._endpoints.clear()
+
+
+metrics_store = MetricsStore()
+
+
+@contextmanager
+def measure(request, phase):
+    """Добавляет время блока без запросов к БД в фазу phase запроса."""
+    sample = getattr(request, 'metrics', None)
+    # Вложенные сериализаторы уже учтены во внешнем.
+    if sample is None or sample['measuring']:
+        yield
+        return
+    sample['measuring'] = True
+    started, db = time.perf_counter(), sample['db']
+    try:
+        yield
+    finally:
+        sample[phase] += max(time.perf_counter() - started
+                             - (sample['db'] - db), 0.0)
+        sample['measuring'] = False
+
+
+class InstrumentationMiddleware:
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def record_query(self, sample, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            sample['queries'] += 1
+            sample['db'] += time.perf_counter() - started
+
+    def capture_queries(self, sample):
+        stack = ExitStack()
+        for connection in connections.all():
+            stack.enter_context(connection.execute_wrapper(
+                lambda *args: self.record_query(sample, *args)
+            ))
+        return stack
+
+    def __call__(self, request):
+        sample = request.metrics = {
+            'queries': 0, 'db': 0.0, 'app': 0.0, 'serialize': 0.0,
+            'render': 0.0, 'total': 0.0, 'view_started': None,
+            'render_started': None, 'db_at_view': 0.0,
+            'db_at_render': None, 'measuring': False,
+        }
+        started = time.perf_counter()
+        with self.capture_queries(sample):
+            response = self.get_response(request)
+        sample['total'] = time.perf_counter() - started
+        if sample['view_started'] is not None:
+            if sample['render_started'] is None:
+                view_finished, view_db = time.perf_counter(), sample['db']
+            else:
+                view_finished = sample['render_started']
+                view_db = sample['db_at_render']
+            sample['app'] = max(
+                view_finished - sample['view_started']
+                - (view_db - sample['db_at_view']) - sample['serialize'],
+                0.0
+            )
+
+        endpoint = self.get_endpoint(request)
+        # Заголовок уходит до тела, поэтому у потокового ответа в нём нет
+        # запросов генератора; метрики и бюджет учитывают их после потока.
+        response['Server-Timing'] = self.server_timing(sample)
+        if response.streaming:
+            response.streaming_content = self.stream(
+                response.streaming_content, endpoint, sample, started
+            )
+            return response
+        self.finish(endpoint, sample)
+        return response
+
+    def stream(self, content, endpoint, sample, started):
+        with self.capture_queries(sample):
+            yield from content
+        sample['total'] = time.perf_counter() - started
+        self.finish(endpoint, sample)
+
+    def finish(self, endpoint, sample):
+        metrics_store.record(endpoint, sample)
+        self.check_budget(endpoint, sample['queries'])
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        request.metrics['view_started'] = time.perf_counter()
+        request.metrics['db_at_view'] = request.metrics['db']
+
+    def process_template_response(self, request, response):
+        # render — только работа рендерера над готовыми данными; сборка
+        # serializer.data считается отдельно в serialize.
+        sample = request.metrics
+        sample['render_started'] = time.perf_counter()
+        sample['db_at_render'] = sample['db']
+
+        def render_finished(response):
+            sample['render'] = (time.perf_counter()
+                                - sample['render_started'])
+        response.add_post_render_callback(render_finished)
+        return response
+
+    def get_endpoint(self, request):
+        if request.resolver_match is None:
+            return f'{request.method} <unresolved>'
+        return f'{request.method} {request.resolver_match.view_name}'
+
+    def server_timing(self, sample):
+        return ', '.join((
+            f'db;dur={sample["db"] * 1000:.2f};'
+            f'desc="{sample["queries"]} queries"',
+            f'app;dur={sample["app"] * 1000:.2f}',
+            f'serialize;dur={sample["serialize"] * 1000:.2f}',
+            f'render;dur={sample["render"] * 1000:.2f}',
+            f'total;dur={sample["total"] * 1000:.2f}',
+        ))
+
+    def check_budget(self, endpoint, queries):
+        budget = settings.QUERY_BUDGETS.get(endpoint,
+                                            settings.QUERY_BUDGET_DEFAULT)
+        if budget is None or queries <= budget:
+            return
+        message = (f'{endpoint}: {queries} SQL-запросов при бюджете'
+                   f' {budget}')
+        if settings.QUERY_BUDGET_MODE == 'raise':
+            raise QueryBudgetExceeded(message)
+        logger.warning(message)
@@ -1,6 +1,200 @@
+import base64
+import binascii
+import json
+from collections import OrderedDict
+
+from django.core.exceptions import FieldDoesNotExist
+from django.core.exceptions import ValidationError as DjangoValidationError
+from django.db import connections
+from django.db.models import DateTimeField, Q
+from rest_framework.exceptions import NotFound, ValidationError
 from rest_framework.pagination import LimitOffsetPagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
 
 
 class LimitSubscriptionsPagination(LimitOffsetPagination):
     default_limit = 15
     page_size_query_param = 'recipes_limit'
+
+
+class LimitOffsetCursorPagination(LimitOffsetPagination):
+    cursor_query_param = 'cursor'
+    count_query_param = 'count'
+    count_modes = ('exact', 'approx', 'none')
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.cursor_mode = self.cursor_query_param in request.query_params
+        self.count_mode = self.get_count_mode(request)
+        self.has_next = None
+        if self.cursor_mode:
+            return self.paginate_by_cursor(queryset, request)
+        if self.count_mode == 'exact':
+            return super().paginate_queryset(queryset, request, view)
+
+        self.limit = self.get_limit(request)
+        self.offset = self.get_offset(request)
+        self.count = self.get_count(queryset)
+        results = list(queryset[self.offset:self.offset + self.limit + 1])
+        self.has_next = len(results) > self.limit
+        return results[:self.limit]
+
+    def get_count_mode(self, request):
+        count_mode = request.query_params.get(
+            self.count_query_param,
+            'none' if self.cursor_mode else 'exact'
+        )
+        if count_mode not in self.count_modes:
+            raise ValidationError({
+                self.count_query_param:
+                    f'Допустимые значения: {", ".join(self.count_modes)}.'
+            })
+        return count_mode
+
+    def get_count(self, queryset):
+        if self.count_mode == 'none':
+            return None
+        connection = connections[queryset.db]
+        if (self.count_mode == 'approx'
+                and connection.vendor == 'postgresql'
+                and not queryset.query.where):
+            with connection.cursor() as cursor:
+                cursor.execute(
+                    'SELECT reltuples::bigint FROM pg_class'
+                    ' WHERE oid = %s::regclass',
+                    [queryset.model._meta.db_table]
+                )
+                return max(cursor.fetchone()[0], 0)
+        return super().get_count(queryset)
+
+    def get_keyset_ordering(self, queryset):
+        ordering = (queryset.query.order_by
+                    or queryset.model._meta.ordering
+                    or ('pk',))
+        field = str(ordering[0])
+        descending = field.startswith('-')
+        try:
+            model_field = queryset.model._meta.get_field(field.lstrip('-'))
+        except FieldDoesNotExist:
+            model_field = None
+        if (model_field is None or not model_field.concrete
+                or model_field.many_to_many):
+            raise ValidationError({
+                self.cursor_query_param:
+                    'Курсор недоступен для этой сортировки.'
+            })
+        # Сортировка по внешнему ключу без attname пошла бы по Meta.ordering
+        # связанной модели, а курсор сравнивает id — страницы терялись бы.
+        return model_field, descending
+
+    def encode_cursor(self, value, pk):
+        return base64.urlsafe_b64encode(
+            json.dumps([value, pk]).encode()
+        ).decode()
+
+    def decode_cursor(self, request):
+        cursor = request.query_params.get(self.cursor_query_param)
+        if not cursor:
+            return None
+        try:
+            position = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        except (binascii.Error, TypeError, ValueError):
+            raise NotFound('Неверный курсор.')
+        if (not isinstance(position, list) or len(position) != 2
+                or type(position[1]) is not int):
+            raise NotFound('Неверный курсор.')
+        return position
+
+    def clean_cursor_value(self, model_field, value):
+        # Значение из курсора попадает в фильтр, поэтому приводится к типу
+        # поля сортировки: иначе подделанный курсор давал бы ошибку 500.
+        if value is None or isinstance(value, (bool, list, dict)):
+            raise NotFound('Неверный курсор.')
+        try:
+            return model_field.to_python(value)
+        except DjangoValidationError:
+            raise NotFound('Неверный курсор.')
+
+    def paginate_by_cursor(self, queryset, request):
+        self.limit = self.get_limit(request)
+        self.count = self.get_count(queryset)
+        model_field, descending = self.get_keyset_ordering(queryset)
+        field = model_field.attname
+        prefix = '-' if descending else ''
+        queryset = queryset.order_by(f'{prefix}{field}', f'{prefix}pk')
+        position = self.decode_cursor(request)
+        if position is not None:
+            value, pk = position
+            value = self.clean_cursor_value(model_field, value)
+            lookup = 'lt' if descending else 'gt'
+            queryset = queryset.filter(
+                Q(**{f'{field}__{lookup}': value})
+                | Q(**{field: value, f'pk__{lookup}': pk})
+            )
+        results = list(queryset[:self.limit + 1])
+        self.next_position = None
+        if len(results) > self.limit:
+            last = results[self.limit - 1]
+            self.next_position = (getattr(last, field), last.pk)
+        return results[:self.limit]
+
+    def get_next_link(self):
+        if self.cursor_mode:
+            if self.next_position is None:
+                return None
+            return replace_query_param(
+                self.request.build_absolute_uri(),
+                self.cursor_query_param,
+                self.encode_cursor(*self.next_position)
+            )
+        if self.has_next is None:
+            return super().get_next_link()
+        if not self.has_next:
+            return None
+        return replace_query_param(
+            replace_query_param(self.request.build_absolute_uri(),
+                                self.limit_query_param, self.limit),
+            self.offset_query_param, self.offset + self.limit
+        )
+
+    def get_previous_link(self):
+        if self.cursor_mode:
+            return None
+        return super().get_previous_link()
+
+    def get_paginated_response(self, data):
+        if not self.cursor_mode:
+            return super().get_paginated_response(data)
+        response = OrderedDict()
+        if self.count is not None:
+            response['count'] = self.count
+        response['next'] = self.get_next_link()
+        response['previous'] = None
+        response['results'] = data
+        return Response(response)
+
+
+class FeedPagination(LimitOffsetCursorPagination):
+    """Только курсор по (created_at, id), без подсчёта общего числа."""
+
+    created_at_field = DateTimeField()
+
+    def paginate_feed(self, fetch, request):
+        self.request = request
+        self.cursor_mode = True
+        self.count = None
+        self.limit = self.get_limit(request)
+        position = self.decode_cursor(request)
+        if position is not None:
+            value, pk = position
+            if not isinstance(value, str):
+                raise NotFound('Неверный курсор.')
+            position = (self.clean_cursor_value(self.created_at_field, value),
+                        pk)
+        keys = fetch(position, self.limit + 1)
+        self.next_position = None
+        if len(keys) > self.limit:
+            created_at, pk = keys[self.limit - 1]
+            self.next_position = (created_at.isoformat(), pk)
+        return [pk for _, pk in keys[:self.limit]]
@@ -1,24 +1,186 @@
 from collections import Counter
 
+from django.conf import settings
 from django.contrib.auth import get_user_model
+from django.db import transaction
 from rest_framework import serializers
+from rest_framework.relations import MANY_RELATION_KWARGS
 from djoser.serializers import (
     UserSerializer as DjoserUserSerializer
 )
-from drf_extra_fields.fields import Base64ImageField as DrfBase64ImageField
+from drf_extra_fields.fields import Base64FileField
 
 from recipes import constants
+from recipes.counters import change_counter
+from recipes.images import detect_format, get_rendition
 from recipes.models import (
     FavoriteRecipe, Ingredient, Recipe,
     RecipeIngredient, ShoppingCart, Subscription, Tag
 )
 
+from .middleware import measure
+
 User = get_user_model()
 
 
-class ProfileSerializer(DjoserUserSerializer):
+def get_objects_by_ids(ids, queryset):
+    duplicates = sorted(item_id for item_id, count in Counter(ids).items()
+                        if count > 1)
+    if duplicates:
+        raise serializers.ValidationError(
+            f'Элементы не должны дублироваться в одном рецепте:'
+            f' {duplicates}.'
+        )
+    objects = queryset.in_bulk(ids)
+    missing = [item_id for item_id in ids if item_id not in objects]
+    if missing:
+        raise serializers.ValidationError(
+            f'Некоторые элементы не существуют: {missing}.'
+        )
+    return objects
+
+
+class BulkManyRelatedField(serializers.ManyRelatedField):
+
+    def to_internal_value(self, data):
+        if isinstance(data, str) or not hasattr(data, '__iter__'):
+            self.fail('not_a_list', input_type=type(data).__name__)
+        if not self.allow_empty and len(data) == 0:
+            self.fail('empty')
+        ids = []
+        for item in data:
+            if isinstance(item, bool) or not str(item).isdigit():
+                self.child_relation.fail('incorrect_type',
+                                         data_type=type(item).__name__)
+            ids.append(int(item))
+        objects = get_objects_by_ids(ids, self.child_relation.get_queryset())
+        return [objects[item_id] for item_id in ids]
+
+
+class BulkPrimaryKeyRelatedField(serializers.PrimaryKeyRelatedField):
+
+    @classmethod
+    def many_init(cls, *args, **kwargs):
+        list_kwargs = {'child_relation': cls(*args, **kwargs)}
+        for key in kwargs:
+            if key in MANY_RELATION_KWARGS:
+                list_kwargs[key] = kwargs[key]
+        return BulkManyRelatedField(**list_kwargs)
+
+
+def parse_fieldset(value):
+    fieldset = {}
+    for path in (value or '').split(','):
+        node = fieldset
+        for name in filter(None, path.strip().split('.')):
+            node = node.setdefault(name, {})
+    return fieldset
+
+
+class SparseFieldsMixin:
+    """Оставляет в ответе только поля из fields и убирает поля из omit.
+
+    Оба аргумента — деревья из parse_fieldset: пустое поддерево означает
+    поле целиком, непустое передаётся вложенному сериализатору.
+    """
+
+    def __init__(self, *args, fields=None, omit=None, **kwargs):
+        self.sparse_fields = fields or {}
+        self.sparse_omit = omit or {}
+        super().__init__(*args, **kwargs)
+
+    def get_fields(self):
+        fields = super().get_fields()
+        for param, fieldset in (('fields', self.sparse_fields),
+                                ('omit', self.sparse_omit)):
+            unknown = [
+                name for name, nested in fieldset.items()
+                if name not in fields or nested and not isinstance(
+                    getattr(fields[name], 'child', fields[name]),
+                    SparseFieldsMixin
+                )
+            ]
+            if unknown:
+                raise serializers.ValidationError(
+                    {param: f'Неизвестные поля: {", ".join(unknown)}.'}
+                )
+        if self.sparse_fields:
+            fields = {name: field for name, field in fields.items()
+                      if name in self.sparse_fields}
+        fields = {name: field for name, field in fields.items()
+                  if self.sparse_omit.get(name, True)}
+        for name, field in fields.items():
+            field = getattr(field, 'child', field)
+            if isinstance(field, SparseFieldsMixin):
+                field.sparse_fields = self.sparse_fields.get(name) or {}
+                field.sparse_omit = self.sparse_omit.get(name) or {}
+        return fields
+
+
+class TimedSerializerMixin:
+    """Время to_representation идёт в фазу serialize метрик запроса."""
+
+    def to_representation(self, instance):
+        with measure(self.context.get('request'), 'serialize'):
+            return super().to_representation(instance)
+
+
+class ThumbnailMixin:
+    list_actions = ('list', 'list_subscriptions', 'pantry', 'feed',
+                    'popular', 'similar')
+
+    def __init__(self, *args, thumbnail=None, **kwargs):
+        self.thumbnail = thumbnail
+        super().__init__(*args, **kwargs)
+
+    def use_thumbnail(self):
+        if self.thumbnail is not None:
+            return self.thumbnail
+        view = self.context.get('view')
+        return getattr(view, 'action', None) in self.list_actions
+
+    def to_representation(self, value):
+        if not value or not self.use_thumbnail():
+            return super().to_representation(value)
+        path = get_rendition(value.instance, value.field.name, 'thumbnail',
+                             settings.IMAGE_LIST_FORMAT)
+        if path is None:
+            return super().to_representation(value)
+        url = value.storage.url(path)
+        request = self.context.get('request')
+        return request.build_absolute_uri(url) if request else url
+
+
+class Base64ImageField(ThumbnailMixin, Base64FileField):
+    # Формат проверяется по сигнатуре, без Pillow: декодирование и
+    # пересжатие идут в фоновой обработке копий (recipes.images).
+    ALLOWED_TYPES = ('jpg', 'png', 'gif', 'webp')
+    INVALID_FILE_MESSAGE = 'Загрузите корректное изображение.'
+    INVALID_TYPE_MESSAGE = ('Поддерживаются изображения JPEG, PNG, GIF'
+                            ' и WebP.')
+
+    def to_internal_value(self, data):
+        # Размер проверяется по длине строки base64 ещё до декодирования.
+        max_size = settings.IMAGE_MAX_UPLOAD_SIZE
+        if isinstance(data, str) and len(data) * 3 // 4 > max_size:
+            raise serializers.ValidationError(
+                f'Размер изображения не должен превышать'
+                f' {max_size // 2 ** 20} МБ.'
+            )
+        return super().to_internal_value(data)
+
+    def get_file_extension(self, filename, decoded_file):
+        return detect_format(decoded_file)
+
+
+class ThumbnailImageField(ThumbnailMixin, serializers.ImageField):
+    pass
+
+
+class ProfileSerializer(TimedSerializerMixin, SparseFieldsMixin,
+                        DjoserUserSerializer):
     is_subscribed = serializers.SerializerMethodField()
-    avatar = DrfBase64ImageField(max_length=None, use_url=True, required=False)
+    avatar = Base64ImageField(max_length=None, use_url=True, required=False)
 
     class Meta(DjoserUserSerializer.Meta):
         model = User
@@ -26,13 +188,17 @@ class ProfileSerializer(DjoserUserSerializer):
         read_only_fields = ('is_subscribed', 'avatar')
 
     def get_is_subscribed(self, user):
+        if hasattr(user, 'is_subscribed'):
+            return user.is_subscribed
         request = self.context.get('request')
         return (request and request.user.is_authenticated
                 and Subscription.objects.filter(user=request.user,
                                                 author=user).exists())
 
 
-class SimpleRecipeSerializer(serializers.ModelSerializer):
+class SimpleRecipeSerializer(TimedSerializerMixin,
+                             serializers.ModelSerializer):
+    image = ThumbnailImageField(thumbnail=True, read_only=True)
 
     class Meta:
         model = Recipe
@@ -49,33 +215,38 @@ class SubscriptionSerializer(ProfileSerializer):
 
     def get_recipes(self, user):
         request = self.context.get('request')
-        return SimpleRecipeSerializer(
-            user.recipes.all()[:int(
+        if hasattr(user, 'recipes_preview'):
+            recipes = user.recipes_preview
+        else:
+            recipes = user.recipes.all()[:int(
                 request.GET.get('recipes_limit', 10**10)
-            )], many=True,
+            )]
+        return SimpleRecipeSerializer(
+            recipes, many=True,
             context={'request': request}
         ).data
 
     def get_recipes_count(self, user):
-        return user.recipes.count()
+        return user.recipes_count
 
 
-class AvatarSerializer(serializers.ModelSerializer):
-    avatar = DrfBase64ImageField()
+class AvatarSerializer(TimedSerializerMixin, serializers.ModelSerializer):
+    avatar = Base64ImageField(thumbnail=False)
 
     class Meta:
         model = User
         fields = ('avatar',)
 
 
-class TagSerializer(serializers.ModelSerializer):
+class TagSerializer(TimedSerializerMixin, serializers.ModelSerializer):
     class Meta:
         model = Tag
         fields = ('id', 'name', 'slug')
         read_only_fields = ('slug', 'name')
 
 
-class IngredientSerializer(serializers.ModelSerializer):
+class IngredientSerializer(TimedSerializerMixin,
+                           serializers.ModelSerializer):
     class Meta:
         model = Ingredient
         fields = ('id', 'name', 'measurement_unit')
@@ -83,9 +254,7 @@ class IngredientSerializer(serializers.ModelSerializer):
 
 
 class RecipeIngredientSerializer(serializers.ModelSerializer):
-    id = serializers.PrimaryKeyRelatedField(queryset=Ingredient.objects.all(),
-                                            source='ingredient.id',
-                                            required=True)
+    id = serializers.IntegerField(source='ingredient.id', required=True)
     name = serializers.CharField(source='ingredient.name', read_only=True)
     measurement_unit = serializers.CharField(
         source='ingredient.measurement_unit',
@@ -101,14 +270,15 @@ class RecipeIngredientSerializer(serializers.ModelSerializer):
         fields = ('id', 'name', 'measurement_unit', 'amount')
 
 
-class RecipeSerializer(serializers.ModelSerializer):
-    tags = serializers.PrimaryKeyRelatedField(queryset=Tag.objects.all(),
-                                              many=True,
-                                              allow_empty=False)
+class RecipeSerializer(TimedSerializerMixin, SparseFieldsMixin,
+                       serializers.ModelSerializer):
+    tags = BulkPrimaryKeyRelatedField(queryset=Tag.objects.all(),
+                                      many=True,
+                                      allow_empty=False)
     is_favorited = serializers.SerializerMethodField()
     is_in_shopping_cart = serializers.SerializerMethodField()
     author = ProfileSerializer(read_only=True)
-    image = DrfBase64ImageField()
+    image = Base64ImageField()
     ingredients = RecipeIngredientSerializer(many=True,
                                              source='recipe_ingredients',
                                              required=True, allow_empty=False,
@@ -124,65 +294,80 @@ class RecipeSerializer(serializers.ModelSerializer):
         read_only_fields = ('is_favorited', 'is_in_shopping_cart',
                             'id', 'author')
 
-    @staticmethod
-    def tags_or_ingredients_validation(
-            tags_or_ingredients,
-            field_name,
-            model_class
-    ):
-        if not tags_or_ingredients:
-            raise serializers.ValidationError({
-                field_name: 'Рецепт должен содержать хотя бы один элемент'
-            })
-        names = {item.name for item in tags_or_ingredients}
-        existing_names = set(model_class.objects.filter(name__in=names)
-                             .values_list('name', flat=True))
-        missing_names = names - existing_names
-
-        if missing_names:
-            raise serializers.ValidationError({
-                field_name: f'Некоторые элементы не существуют:'
-                            f' {missing_names}.'
-            })
-
-        duplicates = [item_id for item_id, count in Counter(names).items()
-                      if count > 1]
-        if duplicates:
-            raise serializers.ValidationError({
-                field_name: f'Элементы не должны дублироваться'
-                            f' в одном рецепте: {duplicates}.'
-            })
-
     def validate_image(self, image):
         if not image:
             raise serializers.ValidationError('Изображение не выбрано.')
         return image
 
     def validate_ingredients(self, ingredients):
-        self.tags_or_ingredients_validation(
-            [ingredient.get('ingredient').get('id')
-             for ingredient in ingredients],
-            'ingredients', Ingredient)
+        get_objects_by_ids(
+            [ingredient['ingredient']['id'] for ingredient in ingredients],
+            Ingredient.objects.only('id')
+        )
         return ingredients
 
-    def validate_tags(self, tags):
-        self.tags_or_ingredients_validation(tags, 'tags', Tag)
-        return tags
-
     def to_representation(self, instance):
+        if hasattr(instance, 'author_is_subscribed'):
+            instance.author.is_subscribed = instance.author_is_subscribed
         data = super().to_representation(instance)
-        data['tags'] = TagSerializer(instance.tags.all(), many=True).data
+        if 'tags' in data:
+            data['tags'] = TagSerializer(instance.tags.all(), many=True).data
+        return data
+
+    def validate(self, data):
+        for field, source in (('ingredients', 'recipe_ingredients'),
+                              ('tags', 'tags')):
+            if source not in data:
+                raise serializers.ValidationError(
+                    {field: 'Обязательное поле.'}
+                )
         return data
 
     def create_ingredients(self, recipe, ingredients_data):
-        RecipeIngredient.objects.bulk_create(
+        recipe_ingredients = RecipeIngredient.objects.bulk_create(
             RecipeIngredient(
                 recipe=recipe,
-                ingredient=ingredient_data.pop('ingredient')['id'],
+                ingredient_id=ingredient_data.pop('ingredient')['id'],
                 amount=ingredient_data.pop('amount')
             ) for ingredient_data in ingredients_data
         )
+        change_counter(Ingredient, 'recipes_count',
+                       [row.ingredient_id for row in recipe_ingredients])
+
+    def update_ingredients(self, recipe, ingredients_data):
+        amounts = {
+            ingredient_data['ingredient']['id']: ingredient_data['amount']
+            for ingredient_data in ingredients_data
+        }
+        existing = {
+            recipe_ingredient.ingredient_id: recipe_ingredient
+            for recipe_ingredient in RecipeIngredient.objects.filter(
+                recipe=recipe
+            ).only('id', 'ingredient_id', 'amount')
+        }
+        removed = existing.keys() - amounts.keys()
+        if removed:
+            RecipeIngredient.objects.filter(
+                recipe=recipe, ingredient_id__in=removed
+            ).delete()
+        changed = []
+        for ingredient_id, recipe_ingredient in existing.items():
+            amount = amounts.get(ingredient_id)
+            if amount is not None and recipe_ingredient.amount != amount:
+                recipe_ingredient.amount = amount
+                changed.append(recipe_ingredient)
+        if changed:
+            RecipeIngredient.objects.bulk_update(changed, ['amount'])
+        added = [ingredient_id for ingredient_id in amounts
+                 if ingredient_id not in existing]
+        RecipeIngredient.objects.bulk_create(
+            RecipeIngredient(recipe=recipe, ingredient_id=ingredient_id,
+                             amount=amounts[ingredient_id])
+            for ingredient_id in added
+        )
+        change_counter(Ingredient, 'recipes_count', added)
 
+    @transaction.atomic
     def create(self, validated_data):
         ingredients_data = validated_data.pop('recipe_ingredients', [])
         tags_data = validated_data.pop('tags', [])
@@ -192,20 +377,16 @@ class RecipeSerializer(serializers.ModelSerializer):
         self.create_ingredients(recipe, ingredients_data)
         return recipe
 
+    @transaction.atomic
     def update(self, instance, validated_data):
-        ingredients_data = validated_data.pop('recipe_ingredients', [])
-        self.validate_ingredients(ingredients_data)
-        tags_data = validated_data.pop('tags', [])
-        self.validate_tags(tags_data)
-
-        instance.tags.set(tags_data)
-
-        instance.recipe_ingredients.all().delete()
-        self.create_ingredients(instance, ingredients_data)
-
+        instance.tags.set(validated_data.pop('tags'))
+        self.update_ingredients(instance,
+                                validated_data.pop('recipe_ingredients'))
         return super().update(instance, validated_data)
 
     def get_is_favorited(self, recipe):
+        if hasattr(recipe, 'is_favorited'):
+            return recipe.is_favorited
         request = self.context.get('request')
         return (request
                 and request.user.is_authenticated
@@ -213,6 +394,8 @@ class RecipeSerializer(serializers.ModelSerializer):
                                                   recipe=recipe).exists())
 
     def get_is_in_shopping_cart(self, recipe):
+        if hasattr(recipe, 'is_in_shopping_cart'):
+            return recipe.is_in_shopping_cart
         request = self.context.get('request')
 
         return (request
@@ -1,7 +1,7 @@
 from django.urls import include, path
 from rest_framework.routers import DefaultRouter
 
-from .views import (IngredientViewSet, RecipeViewSet,
+from .views import (IngredientViewSet, MetricsView, RecipeViewSet,
                     TagViewSet, ProfileViewSet)
 
 
@@ -16,5 +16,6 @@ router.register(r'ingredients', IngredientViewSet,
 
 urlpatterns = [
     path('auth/', include('djoser.urls.authtoken')),
+    path('metrics/', MetricsView.as_view(), name='metrics'),
     path('', include(router.urls)),
 ]
@@ -1,24 +1,16 @@
 from django.utils import timezone
 
 
-def generate_shopping_list_text(ingredient_quantities, recipes):
+def generate_shopping_list_lines(ingredient_quantities, recipe_names):
     date_created = timezone.now().strftime('%Y-%m-%d %H:%M:%S')
-    header = f'Список покупок составлен: {date_created}'
+    yield f'Список покупок составлен: {date_created}\n'
 
-    product_header = 'Продукты:'
-    products = '\n'.join(
-        [
-            f'{index}. {item["ingredient__name"].capitalize()} --'
-            f' {item["total_amount"]} {item["ingredient__measurement_unit"]}'
-            for index, item in enumerate(ingredient_quantities, start=1)
-        ]
-    )
+    yield 'Продукты:\n'
+    for index, item in enumerate(ingredient_quantities, start=1):
+        yield (f'{index}. {item["ingredient__name"].capitalize()} --'
+               f' {item["total_amount"]}'
+               f' {item["ingredient__measurement_unit"]}\n')
 
-    recipe_header = 'Рецепты:'
-    recipes_list = '\n'.join(
-        [f'{index}. {recipe.name}' for index, recipe in enumerate(recipes,
-                                                                  start=1)]
-    )
-
-    return '\n'.join([header, product_header, products,
-                      recipe_header, recipes_list])
+    yield 'Рецепты:\n'
+    for index, name in enumerate(recipe_names, start=1):
+        yield f'{index}. {name}\n'
@@ -1,38 +1,81 @@
+from django.conf import settings
 from django.contrib.auth import get_user_model
 from django.shortcuts import get_object_or_404
 from django_filters.rest_framework import DjangoFilterBackend
 from rest_framework import permissions, status, viewsets
 from rest_framework.decorators import action
-from rest_framework.filters import OrderingFilter
 from rest_framework.pagination import LimitOffsetPagination
 from rest_framework.permissions import (IsAuthenticated, AllowAny,
                                         IsAuthenticatedOrReadOnly)
 from rest_framework.response import Response
-from django.http import FileResponse
+from rest_framework.views import APIView
+from django.http import Http404, StreamingHttpResponse
 from django.urls import reverse
 from rest_framework.exceptions import ValidationError
-from django.db.models import Sum
+from django.db.models import (BooleanField, Prefetch, Sum, Value,
+                              prefetch_related_objects)
 import djoser.views
 
-from .filters import RecipeFilter, IngredientFilter
+from .caching import (AnonymousResponseCacheMixin, ReferenceDataCacheMixin,
+                      response_cache_stats)
+from .middleware import metrics_store
+from backend.db.pool import get_pool_stats
+from .filters import RecipeFilter, RecipeOrderingFilter, IngredientFilter
+from .pagination import FeedPagination, LimitOffsetCursorPagination
+from recipes.feed import get_feed
+from recipes.invalidation import RECIPE_LISTS, RECIPE_VERSION
+from recipes.pantry import pantry_index
+from recipes.search import ingredient_index
+from recipes.shortlinks import short_link_resolver
 from recipes.models import (FavoriteRecipe, Ingredient, Recipe,
-                            ShoppingCart, Subscription, Tag, RecipeIngredient)
+                            ShoppingCart, SimilarRecipe, Subscription, Tag,
+                            RecipeIngredient)
 from .permissions import IsOwnerOrReadOnly
 from .serializers import (
     AvatarSerializer, IngredientSerializer,
     ProfileSerializer, RecipeSerializer,
-    TagSerializer, SimpleRecipeSerializer, SubscriptionSerializer
+    TagSerializer, SimpleRecipeSerializer, SubscriptionSerializer,
+    parse_fieldset
 )
-from .utils import generate_shopping_list_text
+from .utils import generate_shopping_list_lines
 
 User = get_user_model()
 
 
-class ProfileViewSet(djoser.views.UserViewSet):
+class SparseFieldsViewMixin:
+    sparse_actions = ('list', 'retrieve')
+
+    def get_fieldsets(self):
+        if self.action not in self.sparse_actions:
+            return {}, {}
+        return (parse_fieldset(self.request.query_params.get('fields')),
+                parse_fieldset(self.request.query_params.get('omit')))
+
+    def includes(self, *path):
+        fields, omit = self.get_fieldsets()
+        for name in path:
+            if fields and name not in fields or omit.get(name) == {}:
+                return False
+            fields, omit = fields.get(name, {}), omit.get(name, {})
+        return True
+
+    def get_sparse_kwargs(self):
+        if self.action not in self.sparse_actions:
+            return {}
+        fields, omit = self.get_fieldsets()
+        return {'fields': fields, 'omit': omit}
+
+    def get_serializer(self, *args, **kwargs):
+        return super().get_serializer(*args, **kwargs,
+                                      **self.get_sparse_kwargs())
+
+
+class ProfileViewSet(SparseFieldsViewMixin, djoser.views.UserViewSet):
     queryset = User.objects.all()
     serializer_class = ProfileSerializer
-    pagination_class = LimitOffsetPagination
+    pagination_class = LimitOffsetCursorPagination
     permission_classes = (permissions.IsAuthenticatedOrReadOnly,)
+    sparse_actions = ('list', 'retrieve', 'get_me', 'list_subscriptions')
 
     @action(detail=False, methods=['get'],
             permission_classes=[IsAuthenticated],
@@ -52,26 +95,46 @@ class ProfileViewSet(djoser.views.UserViewSet):
         request.user.save()
         return Response(status=status.HTTP_204_NO_CONTENT)
 
-    @action(detail=False, methods=['get'], url_path='subscriptions')
+    def get_subscriptions_preview(self, authors):
+        recipes = Recipe.objects.only('id', 'name', 'image',
+                                      'image_renditions', 'cooking_time',
+                                      'author_id')
+        recipes_limit = self.request.query_params.get('recipes_limit')
+        if recipes_limit is not None:
+            try:
+                recipes_limit = int(recipes_limit)
+            except ValueError:
+                raise ValidationError(
+                    {'recipes_limit': 'Ожидается целое число.'}
+                )
+            # Окно нумерует только рецепты авторов этой страницы, а не всю
+            # таблицу.
+            recipes = recipes.filter(
+                author_id__in=[author.pk for author in authors]
+            ).limited_per_author(recipes_limit)
+        prefetch_related_objects(authors, Prefetch(
+            'recipes', queryset=recipes, to_attr='recipes_preview'
+        ))
+        return authors
+
+    @action(detail=False, methods=['get'], url_path='subscriptions',
+            permission_classes=[IsAuthenticated])
     def list_subscriptions(self, request):
         subscriptions = User.objects.filter(
-            id__in=Subscription.objects.filter(user=request.user)
-            .values_list('author_id', flat=True)
+            authors__user=request.user
+        ).annotate(
+            is_subscribed=Value(True, output_field=BooleanField())
         )
         page = self.paginate_queryset(subscriptions)
-        if page is not None:
-            serializer = SubscriptionSerializer(
-                page,
-                many=True,
-                context={'request': request}
-            )
-            return self.get_paginated_response(serializer.data)
-
+        authors = list(subscriptions) if page is None else page
+        if self.includes('recipes'):
+            self.get_subscriptions_preview(authors)
         serializer = SubscriptionSerializer(
-            subscriptions,
-            many=True,
-            context={'request': request}
+            authors, many=True, context=self.get_serializer_context(),
+            **self.get_sparse_kwargs()
         )
+        if page is not None:
+            return self.get_paginated_response(serializer.data)
         return Response(serializer.data)
 
     @action(detail=True, methods=['post', 'delete'], url_path='subscribe')
@@ -97,17 +160,51 @@ class ProfileViewSet(djoser.views.UserViewSet):
         return Response(status=status.HTTP_204_NO_CONTENT)
 
 
-class RecipeViewSet(viewsets.ModelViewSet):
+class RecipeViewSet(AnonymousResponseCacheMixin, SparseFieldsViewMixin,
+                    viewsets.ModelViewSet):
     queryset = Recipe.objects.all()
     serializer_class = RecipeSerializer
     permission_classes = (IsOwnerOrReadOnly, IsAuthenticatedOrReadOnly)
-    filter_backends = (DjangoFilterBackend, OrderingFilter)
+    filter_backends = (DjangoFilterBackend, RecipeOrderingFilter)
     filterset_class = RecipeFilter
-    pagination_class = LimitOffsetPagination
+    pagination_class = LimitOffsetCursorPagination
     ordering_fields = ('name', 'cooking_time', 'author')
     ordering = ('name',)
     filterset_fields = ('tags__slug', 'author__username',
                         'is_favorited', 'is_in_shopping_cart')
+    sparse_actions = ('list', 'retrieve', 'pantry', 'feed', 'popular',
+                      'similar')
+    response_version_name = RECIPE_LISTS
+    response_object_version_name = RECIPE_VERSION
+
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        if self.action in self.sparse_actions:
+            flags = [flag for flag in ('is_favorited', 'is_in_shopping_cart')
+                     if self.includes(flag)]
+            if self.includes('author', 'is_subscribed'):
+                flags.append('author_is_subscribed')
+            queryset = queryset.with_related(
+                author=self.includes('author'),
+                tags=self.includes('tags'),
+                ingredients=self.includes('ingredients')
+            ).with_user_flags(self.request.user, flags)
+            if not self.includes('text'):
+                queryset = queryset.defer('description')
+        return queryset
+
+    def reload_for_response(self, serializer):
+        serializer.instance = Recipe.objects.with_related().with_user_flags(
+            self.request.user
+        ).get(pk=serializer.instance.pk)
+
+    def perform_create(self, serializer):
+        super().perform_create(serializer)
+        self.reload_for_response(serializer)
+
+    def perform_update(self, serializer):
+        super().perform_update(serializer)
+        self.reload_for_response(serializer)
 
     def add_remove_recipe_to_list(self, request, pk, model):
         recipe = get_object_or_404(Recipe, pk=pk)
@@ -141,19 +238,20 @@ class RecipeViewSet(viewsets.ModelViewSet):
         return self.add_remove_recipe_to_list(request, pk, ShoppingCart)
 
     def generate_shopping_list(self, user):
-        shopping_cart = ShoppingCart.objects.filter(user=user).all()
-
         ingredient_quantities = RecipeIngredient.objects.filter(
-            recipe__in=[cart.recipe for cart in shopping_cart]
+            recipe__shoppingcarts__user=user
         ).values(
             'ingredient__name', 'ingredient__measurement_unit'
         ).annotate(
             total_amount=Sum('amount')
         ).order_by('ingredient__name')
+        recipe_names = Recipe.objects.filter(
+            shoppingcarts__user=user
+        ).values_list('name', flat=True)
 
-        return generate_shopping_list_text(
-            ingredient_quantities,
-            shopping_cart
+        return generate_shopping_list_lines(
+            ingredient_quantities.iterator(),
+            recipe_names.iterator()
         )
 
     @action(detail=False, methods=['get'],
@@ -161,34 +259,158 @@ class RecipeViewSet(viewsets.ModelViewSet):
             url_path='download_shopping_cart',
             url_name='download_shopping_cart')
     def download_shopping_cart(self, request):
-        return FileResponse(
+        response = StreamingHttpResponse(
             self.generate_shopping_list(request.user),
-            as_attachment=True,
-            filename='shopping_list.txt'
+            content_type='text/plain; charset=utf-8'
+        )
+        response['Content-Disposition'] = (
+            'attachment; filename="shopping_list.txt"'
+        )
+        return response
+
+    def get_int_param(self, name, many=False):
+        values = self.request.query_params.getlist(name)
+        if many:
+            values = [value for item in values for value in item.split(',')
+                      if value.strip()]
+        try:
+            values = [int(value) for value in values]
+        except ValueError:
+            raise ValidationError({name: 'Ожидается целое число.'})
+        if many:
+            return values
+        return values[0] if values else None
+
+    @action(detail=False, methods=['get'], permission_classes=[AllowAny],
+            url_path='pantry')
+    def pantry(self, request):
+        ingredient_ids = self.get_int_param('ingredients', many=True)
+        if not ingredient_ids:
+            raise ValidationError({'ingredients': 'Обязательное поле.'})
+        ranked = pantry_index.search(ingredient_ids,
+                                     self.get_int_param('max_missing'))
+        paginator = LimitOffsetPagination()
+        page = paginator.paginate_queryset(ranked, request, view=self)
+        recipes = self.get_queryset().in_bulk(
+            [recipe_id for recipe_id, _, _ in page]
+        )
+        matches = [(recipes[recipe_id], matched, missing)
+                   for recipe_id, matched, missing in page
+                   if recipe_id in recipes]
+        data = self.get_serializer(
+            [recipe for recipe, _, _ in matches], many=True
+        ).data
+        for item, (_, matched, missing) in zip(data, matches):
+            item['matched_ingredients'] = matched
+            item['missing_ingredients'] = missing
+        return paginator.get_paginated_response(data)
+
+    @action(detail=False, methods=['get'],
+            permission_classes=[IsAuthenticated], url_path='feed')
+    def feed(self, request):
+        paginator = FeedPagination()
+        recipe_ids = paginator.paginate_feed(
+            lambda position, limit: get_feed(request.user.pk, position,
+                                             limit),
+            request
+        )
+        recipes = self.get_queryset().in_bulk(recipe_ids)
+        serializer = self.get_serializer(
+            [recipes[pk] for pk in recipe_ids if pk in recipes], many=True
+        )
+        return paginator.get_paginated_response(serializer.data)
+
+    @action(detail=False, methods=['get'], permission_classes=[AllowAny],
+            url_path='popular')
+    def popular(self, request):
+        paginator = LimitOffsetPagination()
+        page = paginator.paginate_queryset(
+            self.get_queryset().filter(popularity__isnull=False).order_by(
+                'popularity__position'
+            ), request, view=self
+        )
+        return paginator.get_paginated_response(
+            self.get_serializer(page, many=True).data
         )
 
+    @action(detail=True, methods=['get'], permission_classes=[AllowAny],
+            url_path='similar')
+    def similar(self, request, pk=None):
+        if not pk.isdigit():
+            raise Http404
+        limit = min(self.get_int_param('limit') or 0,
+                    settings.SIMILAR_RECIPES_LIMIT)
+        recipe_ids = list(SimilarRecipe.objects.filter(
+            recipe_id=pk
+        ).order_by('position').values_list('similar_id', flat=True)[
+            :limit if limit > 0 else settings.SIMILAR_RECIPES_LIMIT
+        ])
+        if not recipe_ids:
+            get_object_or_404(Recipe.objects.only('pk'), pk=pk)
+        recipes = self.get_queryset().in_bulk(recipe_ids)
+        return Response(self.get_serializer(
+            [recipes[recipe_id] for recipe_id in recipe_ids
+             if recipe_id in recipes], many=True
+        ).data)
+
     @action(detail=True, methods=['get'], permission_classes=[AllowAny],
             url_path='get-link')
     def get_link(self, request, pk=None):
-        recipe = get_object_or_404(Recipe, pk=pk)
+        if not pk.isdigit() or not short_link_resolver.exists(int(pk)):
+            raise Http404
         short_link = request.build_absolute_uri(reverse(
             'recipes:short-link-redirect',
-            args=[recipe.pk]
+            args=[int(pk)]
         ))
         return Response({'short-link': short_link})
 
 
-class TagViewSet(viewsets.ReadOnlyModelViewSet):
+class TagViewSet(ReferenceDataCacheMixin, viewsets.ReadOnlyModelViewSet):
     queryset = Tag.objects.all()
     serializer_class = TagSerializer
     permission_classes = (permissions.IsAuthenticatedOrReadOnly,)
     pagination_class = None
+    reference_version = 'tags'
 
 
-class IngredientViewSet(viewsets.ReadOnlyModelViewSet):
+class IngredientViewSet(ReferenceDataCacheMixin,
+                        viewsets.ReadOnlyModelViewSet):
     queryset = Ingredient.objects.all()
     serializer_class = IngredientSerializer
     permission_classes = (permissions.IsAuthenticatedOrReadOnly,)
     pagination_class = None
     filter_backends = (DjangoFilterBackend,)
     filterset_class = IngredientFilter
+    reference_version = 'ingredients'
+
+    def list(self, request, *args, **kwargs):
+        name = request.query_params.get('name')
+        if name is None:
+            return super().list(request, *args, **kwargs)
+        limit = request.query_params.get('limit')
+        if limit is not None:
+            try:
+                limit = int(limit)
+            except ValueError:
+                raise ValidationError({'limit': 'Ожидается целое число.'})
+        return self.cached_response(
+            request,
+            lambda: Response(ingredient_index.search(name, limit)),
+            ('search', name, limit)
+        )
+
+
+class MetricsView(APIView):
+    permission_classes = (permissions.IsAdminUser,)
+
+    def get(self, request):
+        return Response({
+            'endpoints': metrics_store.snapshot(),
+            'db_pools': get_pool_stats(),
+            'response_cache': response_cache_stats.snapshot(),
+        })
+
+    def delete(self, request):
+        metrics_store.clear()
+        response_cache_stats.clear()
+        return Response(status=status.HTTP_204_NO_CONTENT)
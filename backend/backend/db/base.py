@@ -0,0 +1,38 @@
+import psycopg2.extras
+from django.db.backends.postgresql import base
+
+from .pool import get_pool
+
+
+class DatabaseWrapper(base.DatabaseWrapper):
+
+    @property
+    def pool(self):
+        conn_params = self.get_connection_params()
+        return get_pool(
+            self.alias,
+            lambda: base.Database.connect(**conn_params),
+            self.settings_dict.get('POOL', {})
+        )
+
+    def get_new_connection(self, conn_params):
+        connection = self.pool.acquire()
+        options = self.settings_dict['OPTIONS']
+        try:
+            self.isolation_level = options['isolation_level']
+        except KeyError:
+            self.isolation_level = connection.isolation_level
+        else:
+            if self.isolation_level != connection.isolation_level:
+                connection.set_session(isolation_level=self.isolation_level)
+        psycopg2.extras.register_default_jsonb(conn_or_curs=connection,
+                                               loads=lambda x: x)
+        return connection
+
+    def _close(self):
+        if self.connection is not None:
+            with self.wrap_database_errors:
+                self.pool.release(
+                    self.connection,
+                    discard=self.errors_occurred and not self.is_usable()
+                )
@@ -0,0 +1,139 @@
+import logging
+import threading
+import time
+from collections import deque
+
+from django.db.utils import OperationalError
+
+logger = logging.getLogger('backend.db')
+
+pools = {}
+pools_lock = threading.Lock()
+
+
+class ConnectionPool:
+
+    def __init__(self, connect, max_size, timeout, check_interval,
+                 slow_wait):
+        self.connect = connect
+        self.max_size = max_size
+        self.timeout = timeout
+        self.check_interval = check_interval
+        self.slow_wait = slow_wait
+        self._idle = deque()
+        self._slots = threading.BoundedSemaphore(max_size)
+        self._lock = threading.Lock()
+        self.stats = {
+            'acquired': 0, 'created': 0, 'reused': 0, 'discarded': 0,
+            'waits': 0, 'wait_time': 0.0, 'max_wait_time': 0.0,
+            'timeouts': 0, 'in_use': 0,
+        }
+
+    def is_alive(self, connection, idle_since):
+        if connection.closed:
+            return False
+        if time.monotonic() - idle_since < self.check_interval:
+            return True
+        try:
+            with connection.cursor() as cursor:
+                cursor.execute('SELECT 1')
+        except Exception:
+            return False
+        return True
+
+    def acquire(self):
+        started = time.monotonic()
+        if not self._slots.acquire(blocking=False):
+            with self._lock:
+                self.stats['waits'] += 1
+            if not self._slots.acquire(timeout=self.timeout):
+                with self._lock:
+                    self.stats['timeouts'] += 1
+                raise OperationalError(
+                    f'Пул соединений исчерпан: {self.max_size} соединений'
+                    f' заняты дольше {self.timeout} с.'
+                )
+        waited = time.monotonic() - started
+        if waited >= self.slow_wait:
+            logger.warning('Ожидание соединения из пула: %.3f с', waited)
+        with self._lock:
+            self.stats['acquired'] += 1
+            self.stats['in_use'] += 1
+            self.stats['wait_time'] += waited
+            self.stats['max_wait_time'] = max(self.stats['max_wait_time'],
+                                              waited)
+        try:
+            while True:
+                try:
+                    connection, idle_since = self._idle.pop()
+                except IndexError:
+                    break
+                if self.is_alive(connection, idle_since):
+                    with self._lock:
+                        self.stats['reused'] += 1
+                    return connection
+                self.close(connection)
+            connection = self.connect()
+            with self._lock:
+                self.stats['created'] += 1
+            return connection
+        except Exception:
+            self.release_slot()
+            raise
+
+    def release(self, connection, discard=False):
+        if not discard and not connection.closed:
+            try:
+                if (connection.info.transaction_status
+                        != connection.info.TRANSACTION_STATUS_IDLE):
+                    connection.rollback()
+            except Exception:
+                discard = True
+        else:
+            discard = True
+        if discard:
+            self.close(connection)
+        else:
+            self._idle.append((connection, time.monotonic()))
+        self.release_slot()
+
+    def release_slot(self):
+        with self._lock:
+            self.stats['in_use'] -= 1
+        self._slots.release()
+
+    def close(self, connection):
+        with self._lock:
+            self.stats['discarded'] += 1
+        try:
+            connection.close()
+        except Exception:
+            pass
+
+    def snapshot(self):
+        with self._lock:
+            return {**self.stats, 'idle': len(self._idle),
+                    'max_size': self.max_size}
+
+
+def get_pool(alias, connect, options):
+    with pools_lock:
+        if alias not in pools:
+            pools[alias] = ConnectionPool(
+                connect,
+                max_size=options.get('MAX_SIZE', 4),
+                timeout=options.get('TIMEOUT', 10),
+                check_interval=options.get('CHECK_INTERVAL', 30),
+                slow_wait=options.get('SLOW_WAIT', 0.1),
+            )
+        return pools[alias]
+
+
+def get_pool_stats():
+    with pools_lock:
+        return {alias: pool.snapshot() for alias, pool in pools.items()}
+
+
+def reset_pools():
+    with pools_lock:
+        pools.clear()
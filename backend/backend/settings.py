@@ -42,6 +42,7 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'api.middleware.InstrumentationMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -75,14 +76,31 @@ WSGI_APPLICATION = 'backend.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/3.2/ref/settings/#databases
 if os.getenv('DJANGO_DB_ENGINE') == 'postgres':
+    # With the pool enabled connections are returned to a per-process pool
+    # at the end of every request, so CONN_MAX_AGE stays 0. MAX_SIZE should
+    # match GUNICORN_THREADS: workers * MAX_SIZE must fit into Postgres
+    # max_connections.
+    DB_POOL = os.getenv('DJANGO_DB_POOL', 'True') == 'True'
     DATABASES = {
         'default': {
-            'ENGINE': 'django.db.backends.postgresql_psycopg2',
+            'ENGINE': ('backend.db' if DB_POOL
+                       else 'django.db.backends.postgresql_psycopg2'),
             'NAME': os.getenv('POSTGRES_DB', 'postgres'),
             'USER': os.getenv('POSTGRES_USER', 'postgres'),
             'PASSWORD': os.getenv('POSTGRES_PASSWORD', 'postgres'),
             'HOST': os.getenv('POSTGRES_HOST', 'db'),
             'PORT': os.getenv('POSTGRES_PORT', '5432'),
+            'CONN_MAX_AGE': (0 if DB_POOL
+                             else int(os.getenv('DJANGO_DB_CONN_MAX_AGE', 60))),
+            'POOL': {
+                'MAX_SIZE': int(os.getenv('DJANGO_DB_POOL_MAX_SIZE',
+                                          os.getenv('GUNICORN_THREADS', 2))),
+                'TIMEOUT': float(os.getenv('DJANGO_DB_POOL_TIMEOUT', 10)),
+                'CHECK_INTERVAL': float(
+                    os.getenv('DJANGO_DB_POOL_CHECK_INTERVAL', 30)
+                ),
+                'SLOW_WAIT': float(os.getenv('DJANGO_DB_POOL_SLOW_WAIT', 0.1)),
+            },
         }
     }
 elif os.getenv('DJANGO_DB_ENGINE') == 'sqlite':
@@ -93,6 +111,28 @@ elif os.getenv('DJANGO_DB_ENGINE') == 'sqlite':
         }
     }
 
+# Без общего кэша (LocMemCache) версии кэшированных данных живут столько
+# секунд: настолько могут отставать процессы от изменений в других.
+VERSION_LOCAL_TTL = int(os.getenv('VERSION_LOCAL_TTL', 60))
+
+CACHES = {
+    'default': {
+        'BACKEND': os.getenv('DJANGO_CACHE_BACKEND',
+                             'django.core.cache.backends.locmem.LocMemCache'),
+        'LOCATION': os.getenv('DJANGO_CACHE_LOCATION', 'foodgram'),
+    },
+    # Готовые ответы API рецептов для анонимных запросов.
+    'responses': {
+        'BACKEND': os.getenv('RESPONSE_CACHE_BACKEND',
+                             'django.core.cache.backends.locmem.LocMemCache'),
+        'LOCATION': os.getenv('RESPONSE_CACHE_LOCATION', 'foodgram-responses'),
+        'TIMEOUT': int(os.getenv('RESPONSE_CACHE_TTL', 300)),
+        'OPTIONS': {
+            'MAX_ENTRIES': int(os.getenv('RESPONSE_CACHE_MAX_ENTRIES', 1000)),
+        },
+    },
+}
+
 
 # Password validation
 # https://docs.djangoproject.com/en/3.2/ref/settings/#auth-password-validators
@@ -114,7 +154,7 @@ AUTH_PASSWORD_VALIDATORS = [
 
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': (
-        'rest_framework.authentication.TokenAuthentication',
+        'api.authentication.CachedTokenAuthentication',
     ),
     'DEFAULT_PERMISSION_CLASSES': (
         'rest_framework.permissions.IsAuthenticated',
@@ -127,6 +167,61 @@ REST_FRAMEWORK = {
     ),
 }
 
+# Per-endpoint SQL query budgets, keyed by "<METHOD> <view name>".
+# QUERY_BUDGET_MODE=raise turns an exceeded budget into an exception,
+# which is meant for test runs; "log" only writes a warning.
+QUERY_BUDGET_MODE = os.getenv('QUERY_BUDGET_MODE', 'log')
+QUERY_BUDGET_DEFAULT = None
+QUERY_BUDGETS = {
+    'GET api:recipe-list': 6,
+    'GET api:recipe-detail': 5,
+    'GET api:recipe-pantry': 5,
+    'GET api:recipe-feed': 6,
+    'GET api:recipe-popular': 6,
+    'GET api:recipe-similar': 5,
+    'GET api:user-detail-list-subscriptions': 5,
+    'GET api:recipe-download_shopping_cart': 3,
+    'GET api:tag-detail-list': 2,
+    'GET api:ingredient-detail-list': 2,
+}
+
+AUTH_TOKEN_CACHE_SIZE = int(os.getenv('AUTH_TOKEN_CACHE_SIZE', 10000))
+AUTH_TOKEN_CACHE_TTL = int(os.getenv('AUTH_TOKEN_CACHE_TTL', 300))
+
+SHORT_LINK_CACHE_SIZE = int(os.getenv('SHORT_LINK_CACHE_SIZE', 100000))
+SHORT_LINK_CACHE_TTL = int(os.getenv('SHORT_LINK_CACHE_TTL', 3600))
+SHORT_LINK_NEGATIVE_TTL = int(os.getenv('SHORT_LINK_NEGATIVE_TTL', 60))
+FRONTEND_RECIPE_URL = os.getenv('FRONTEND_RECIPE_URL', '/recipes/{}')
+
+# thread — фоновый пул потоков, sync — сразу после коммита транзакции.
+IMAGE_PROCESSING = os.getenv('IMAGE_PROCESSING', 'thread')
+IMAGE_WORKERS = int(os.getenv('IMAGE_WORKERS', 2))
+IMAGE_LIST_FORMAT = os.getenv('IMAGE_LIST_FORMAT', 'webp')
+IMAGE_MAX_UPLOAD_SIZE = int(os.getenv('IMAGE_MAX_UPLOAD_SIZE', 10 * 2 ** 20))
+
+# Сколько изменений рецептов индекс поиска по продуктам догоняет
+# точечно; при большем отставании он перестраивается целиком.
+PANTRY_MAX_CHANGES = int(os.getenv('PANTRY_MAX_CHANGES', 1000))
+PANTRY_CHANGE_TTL = int(os.getenv('PANTRY_CHANGE_TTL', 86400))
+PANTRY_RESULTS_CACHE_SIZE = int(os.getenv('PANTRY_RESULTS_CACHE_SIZE', 256))
+
+# С этого числа подписок лента хранится в таблице и пополняется при
+# публикации; ниже половины порога снова собирается при чтении. Хранятся
+# только FEED_MAX_ENTRIES самых свежих записей, более старые собираются
+# при чтении. Переключает и обрезает ленты команда sync_feeds.
+FEED_MATERIALIZE_THRESHOLD = int(os.getenv('FEED_MATERIALIZE_THRESHOLD', 500))
+FEED_MAX_ENTRIES = int(os.getenv('FEED_MAX_ENTRIES', 1000))
+
+# Рейтинги пересчитывает команда compute_rankings. Похожие рецепты — смесь
+# сходства по избранному и по ингредиентам с долей последнего
+# SIMILAR_INGREDIENT_WEIGHT; популярность — добавления в избранное и списки
+# покупок, которые вдвое теряют вес за POPULAR_HALF_LIFE_DAYS дней.
+SIMILAR_RECIPES_LIMIT = int(os.getenv('SIMILAR_RECIPES_LIMIT', 12))
+SIMILAR_INGREDIENT_WEIGHT = float(os.getenv('SIMILAR_INGREDIENT_WEIGHT', 0.3))
+POPULAR_RECIPES_LIMIT = int(os.getenv('POPULAR_RECIPES_LIMIT', 1000))
+POPULAR_HALF_LIFE_DAYS = float(os.getenv('POPULAR_HALF_LIFE_DAYS', 7))
+POPULAR_CART_WEIGHT = float(os.getenv('POPULAR_CART_WEIGHT', 2))
+
 DJOSER = {
     'HIDE_USERS': False,
     'SERIALIZERS': {
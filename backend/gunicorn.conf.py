@@ -0,0 +1,32 @@
+import multiprocessing
+import os
+
+from recipes.versioning import LOCAL_CACHE_BACKENDS
+
+# Воркеры узнают об изменениях (версии кэшей, отозванные токены) через
+# основной кэш. Пока он в памяти процесса, по умолчанию воркер один.
+shared_cache = os.getenv('DJANGO_CACHE_BACKEND',
+                         LOCAL_CACHE_BACKENDS[0]) not in LOCAL_CACHE_BACKENDS
+
+bind = os.getenv('GUNICORN_BIND', '0.0.0.0:8880')
+workers = int(os.getenv(
+    'GUNICORN_WORKERS',
+    multiprocessing.cpu_count() * 2 + 1 if shared_cache else 1
+))
+threads = int(os.getenv('GUNICORN_THREADS', 2))
+worker_class = 'gthread' if threads > 1 else 'sync'
+timeout = int(os.getenv('GUNICORN_TIMEOUT', 30))
+graceful_timeout = int(os.getenv('GUNICORN_GRACEFUL_TIMEOUT', 30))
+keepalive = int(os.getenv('GUNICORN_KEEPALIVE', 5))
+max_requests = int(os.getenv('GUNICORN_MAX_REQUESTS', 1000))
+max_requests_jitter = int(os.getenv('GUNICORN_MAX_REQUESTS_JITTER', 100))
+preload_app = os.getenv('GUNICORN_PRELOAD', 'True') == 'True'
+accesslog = os.getenv('GUNICORN_ACCESS_LOG', '-')
+errorlog = '-'
+
+
+def post_fork(server, worker):
+    from backend.db.pool import reset_pools
+    from recipes.images import reset_executor
+    reset_pools()
+    reset_executor()
@@ -1,11 +1,92 @@
 from django.contrib import admin
+from django.contrib.admin.views.main import PAGE_VAR
 from django.contrib.auth.models import Group
-from django.db.models import Count
+from django.core.cache import cache
+from django.db.models import Count, Q
 from django.urls import reverse
 from django.utils.safestring import mark_safe
 
 from . import constants
 from . import models
+from .versioning import get_version
+
+COOKING_TIME_COUNTS_KEY = 'admin:cooking_time_counts:{}'
+
+
+class InputFilter(admin.SimpleListFilter):
+    template = 'admin/input_filter.html'
+    placeholder = ''
+
+    def lookups(self, request, model_admin):
+        return ()
+
+    def has_output(self):
+        return True
+
+    def choices(self, changelist):
+        yield {
+            'query_string': changelist.get_query_string(
+                remove=[self.parameter_name]
+            ),
+            'query_parts': [
+                (key, value) for key, value in changelist.params.items()
+                if key not in (self.parameter_name, PAGE_VAR)
+            ],
+        }
+
+    def queryset(self, request, queryset):
+        value = (self.value() or '').strip()
+        if not value:
+            return queryset
+        return self.filter(queryset, value)
+
+
+class RelatedInputFilter(InputFilter):
+    field_name = None
+    search_fields = ('name',)
+    placeholder = 'id или начало названия'
+
+    def filter(self, queryset, value):
+        if value.isdigit():
+            return queryset.filter(**{self.field_name: value})
+        query = Q()
+        for field in self.search_fields:
+            query |= Q(**{f'{self.field_name}__{field}__istartswith': value})
+        return queryset.filter(query)
+
+
+class UserInputFilter(RelatedInputFilter):
+    title = 'Пользователь'
+    parameter_name = 'user_search'
+    field_name = 'user'
+    search_fields = ('username', 'email')
+    placeholder = 'id, юзернейм или email'
+
+
+class AuthorInputFilter(UserInputFilter):
+    title = 'Автор'
+    parameter_name = 'author_search'
+    field_name = 'author'
+
+
+class RecipeInputFilter(RelatedInputFilter):
+    title = 'Рецепт'
+    parameter_name = 'recipe_search'
+    field_name = 'recipe'
+
+
+class IngredientInputFilter(RelatedInputFilter):
+    title = 'Ингредиент'
+    parameter_name = 'ingredient_search'
+    field_name = 'ingredient'
+
+
+class RecipeIngredientInputFilter(IngredientInputFilter):
+
+    def filter(self, queryset, value):
+        return queryset.filter(pk__in=super().filter(
+            models.RecipeIngredient.objects.all(), value
+        ).values('recipe_id'))
 
 
 class HasRecipesFilter(admin.SimpleListFilter):
@@ -20,9 +101,10 @@ class HasRecipesFilter(admin.SimpleListFilter):
 
     def queryset(self, request, queryset):
         value = self.value()
-        if value in ('yes', 'no'):
-            return (queryset.filter(recipes__isnull=value == 'no')
-                    .distinct())
+        if value == 'yes':
+            return queryset.filter(recipes_count__gt=0)
+        if value == 'no':
+            return queryset.filter(recipes_count=0)
         return queryset
 
 
@@ -38,9 +120,10 @@ class HasSubscriptionsFilter(admin.SimpleListFilter):
 
     def queryset(self, request, queryset):
         value = self.value()
-        if value in ('yes', 'no'):
-            return (queryset.filter(followers__isnull=value == 'no')
-                    .distinct())
+        if value == 'yes':
+            return queryset.filter(following_count__gt=0)
+        if value == 'no':
+            return queryset.filter(following_count=0)
         return queryset
 
 
@@ -56,9 +139,10 @@ class HasFollowersFilter(admin.SimpleListFilter):
 
     def queryset(self, request, queryset):
         value = self.value()
-        if value in ('yes', 'no'):
-            return (queryset.filter(authors__isnull=value == 'no')
-                    .distinct())
+        if value == 'yes':
+            return queryset.filter(followers_count__gt=0)
+        if value == 'no':
+            return queryset.filter(followers_count=0)
         return queryset
 
 
@@ -84,30 +168,23 @@ class FoodgramUserAdmin(admin.ModelAdmin):
         }),
     )
 
-    def get_queryset(self, request):
-        return super().get_queryset(request).annotate(
-            recipe_count=Count('recipes'),
-            subscription_count=Count('authors'),
-            follower_count=Count('followers')
-        )
-
     @mark_safe
-    @admin.display(description='Рецепты')
+    @admin.display(description='Рецепты', ordering='recipes_count')
     def get_recipe_count(self, user):
-        count = user.recipe_count
+        count = user.recipes_count
         if count > 0:
             url = (reverse('admin:recipes_recipe_changelist')
-                   + f'?author__id__exact={user.id}')
+                   + f'?author_search={user.id}')
             return f'<a href="{url}">{count}</a>'
         return count
 
-    @admin.display(description='Подписки')
+    @admin.display(description='Подписки', ordering='following_count')
     def get_subscription_count(self, user):
-        return user.subscription_count
+        return user.following_count
 
-    @admin.display(description='Подписчики')
+    @admin.display(description='Подписчики', ordering='followers_count')
     def get_follower_count(self, user):
-        return user.follower_count
+        return user.followers_count
 
 
 @admin.register(models.Tag)
@@ -117,9 +194,9 @@ class TagAdmin(admin.ModelAdmin):
     empty_value_display = '-пусто-'
 
     @mark_safe
-    @admin.display(description='Рецепты')
+    @admin.display(description='Рецепты', ordering='recipes_count')
     def get_recipe_count(self, tag):
-        count = tag.recipes.count()
+        count = tag.recipes_count
         if count == 0:
             return count
         url = (reverse('admin:recipes_recipe_changelist')
@@ -139,10 +216,10 @@ class IsIngredientUsedFilter(admin.SimpleListFilter):
 
     def queryset(self, request, queryset):
         value = self.value()
-        if value in ('yes', 'no'):
-            return queryset.filter(
-                recipe_ingredients__isnull=value == 'no'
-            ).distinct()
+        if value == 'yes':
+            return queryset.filter(recipes_count__gt=0)
+        if value == 'no':
+            return queryset.filter(recipes_count=0)
         return queryset
 
 
@@ -154,13 +231,14 @@ class IngredientAdmin(admin.ModelAdmin):
     empty_value_display = '-пусто-'
 
     @mark_safe
-    @admin.display(description='Количество рецептов')
+    @admin.display(description='Количество рецептов',
+                   ordering='recipes_count')
     def get_recipe_count(self, ingredient):
-        count = ingredient.recipes.count()
+        count = ingredient.recipes_count
         if count == 0:
             return count
         url = (reverse('admin:recipes_recipe_changelist')
-               + f'?ingredients__id__exact={ingredient.id}')
+               + f'?ingredient_search={ingredient.id}')
         return f'<a href="{url}">{count}</a>'
 
 
@@ -184,17 +262,26 @@ class CookingTimeFilter(admin.SimpleListFilter):
     }
 
     def lookups(self, request, model_admin):
-        labels = self.COOKING_TIME_RANGE.keys()
+        counts = self.get_counts()
         return (
-            (
-                label, self.COOKING_TIME_MEANS[label]
-                .format(self.filter_by_cooking_time(
-                    self.queryset(request, models.Recipe.objects.all()),
-                    *self.COOKING_TIME_RANGE[label]
-                ).count())
-            ) for label in labels
+            (label, self.COOKING_TIME_MEANS[label].format(counts[label]))
+            for label in self.COOKING_TIME_RANGE
         )
 
+    def get_counts(self):
+        key = COOKING_TIME_COUNTS_KEY.format(get_version('recipes'))
+        counts = cache.get(key)
+        if counts is None:
+            counts = models.Recipe.objects.aggregate(**{
+                label: Count('pk', filter=Q(
+                    cooking_time__gte=min_time, cooking_time__lt=max_time
+                ))
+                for label, (min_time, max_time)
+                in self.COOKING_TIME_RANGE.items()
+            })
+            cache.set(key, counts)
+        return counts
+
     def queryset(self, request, queryset):
         time_range = self.COOKING_TIME_RANGE.get(self.value())
         if not time_range:
@@ -202,24 +289,31 @@ class CookingTimeFilter(admin.SimpleListFilter):
         return self.filter_by_cooking_time(queryset, *time_range)
 
     def filter_by_cooking_time(self, queryset, min_time, max_time):
-        return queryset.filter(cooking_time__range=(min_time, max_time))
+        return queryset.filter(cooking_time__gte=min_time,
+                               cooking_time__lt=max_time)
 
 
 @admin.register(models.Recipe)
 class RecipeAdmin(admin.ModelAdmin):
     list_display = ('id', 'author', 'name', 'image_tag',
-                    'cooking_time', 'tag_list', 'ingredient_list')
+                    'cooking_time', 'favorites_count', 'tag_list',
+                    'ingredient_list')
     search_fields = ('id', 'author__username', 'name',
                      'cooking_time', 'tags__name')
-    list_filter = (CookingTimeFilter, 'tags', 'author', 'ingredients')
+    list_filter = (CookingTimeFilter, 'tags', AuthorInputFilter,
+                   RecipeIngredientInputFilter)
     empty_value_display = '-пусто-'
     filter_horizontal = ('tags', 'ingredients')
+    autocomplete_fields = ('author',)
+    show_full_result_count = False
+
+    def get_queryset(self, request):
+        return super().get_queryset(request).with_related()
 
     @mark_safe
     @admin.display(description='Ингредиенты')
     def ingredient_list(self, recipe):
-        ingredients = (recipe.recipe_ingredients
-                       .select_related('ingredient').all())
+        ingredients = recipe.recipe_ingredients.all()
         return '<br>'.join(
             f'{ingredient.ingredient.name} {ingredient.amount}'
             f' {ingredient.ingredient.measurement_unit}'
@@ -241,47 +335,24 @@ class RecipeAdmin(admin.ModelAdmin):
         return '-'
 
 
-class UsedIngredientFilter(admin.SimpleListFilter):
-    title = 'Использованные ингредиенты'
-    parameter_name = 'used_in_recipes'
-
-    def lookups(self, request, model_admin):
-        used_ingredients = (
-            models.RecipeIngredient.objects
-            .values('ingredient__id', 'ingredient__name')
-            .annotate(recipe_count=Count('recipe'))
-            .filter(recipe_count__gt=0)
-            .order_by('ingredient__name')
-        )
-
-        return [
-            (
-                ingredient['ingredient__id'],
-                f"{ingredient['ingredient__name']}"
-                f" ({ingredient['recipe_count']})"
-            )
-            for ingredient in used_ingredients
-        ]
-
-    def queryset(self, request, queryset):
-        if not self.value():
-            return queryset
-        return queryset.filter(ingredient=self.value())
-
-
 @admin.register(models.RecipeIngredient)
 class RecipeIngredientAdmin(admin.ModelAdmin):
     list_display = ('id', 'recipe', 'ingredient', 'amount')
     search_fields = ('recipe__name', 'ingredient__name')
-    list_filter = ('recipe', UsedIngredientFilter)
+    list_filter = (RecipeInputFilter, IngredientInputFilter)
+    list_select_related = ('recipe', 'ingredient')
+    autocomplete_fields = ('recipe', 'ingredient')
     empty_value_display = '-пусто-'
+    show_full_result_count = False
 
 
 @admin.register(models.ShoppingCart)
 class ShoppingCartAdmin(admin.ModelAdmin):
     list_display = ('id', 'user', 'recipe')
     search_fields = ('user__username', 'recipe__name')
-    list_filter = ('user',)
+    list_filter = (UserInputFilter, RecipeInputFilter)
+    list_select_related = ('user', 'recipe')
+    autocomplete_fields = ('user', 'recipe')
     empty_value_display = '-пусто-'
 
 
@@ -289,7 +360,9 @@ class ShoppingCartAdmin(admin.ModelAdmin):
 class FavoriteRecipeAdmin(admin.ModelAdmin):
     list_display = ('id', 'user', 'recipe')
     search_fields = ('user__username', 'recipe__name')
-    list_filter = ('user',)
+    list_filter = (UserInputFilter, RecipeInputFilter)
+    list_select_related = ('user', 'recipe')
+    autocomplete_fields = ('user', 'recipe')
     empty_value_display = '-пусто-'
 
 
@@ -297,7 +370,9 @@ class FavoriteRecipeAdmin(admin.ModelAdmin):
 class SubscriptionAdmin(admin.ModelAdmin):
     list_display = ('id', 'user', 'author')
     search_fields = ('user__username', 'author__username')
-    list_filter = ('user', 'author')
+    list_filter = (UserInputFilter, AuthorInputFilter)
+    list_select_related = ('user', 'author')
+    autocomplete_fields = ('user', 'author')
     empty_value_display = '-пусто-'
 
 
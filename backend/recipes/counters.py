@@ -0,0 +1,54 @@
+from collections import Counter, defaultdict
+
+from django.contrib.auth import get_user_model
+from django.db.models import Count, F, OuterRef, Q, Subquery, Value
+from django.db.models.functions import Coalesce, Greatest
+
+from .models import (FavoriteRecipe, Ingredient, Recipe, RecipeIngredient,
+                     ShoppingCart, Subscription, Tag)
+
+User = get_user_model()
+RecipeTag = Recipe.tags.through
+
+# (модель со счётчиком, поле счётчика, модель строк, внешний ключ строк)
+COUNTERS = (
+    (User, 'recipes_count', Recipe, 'author'),
+    (User, 'followers_count', Subscription, 'author'),
+    (User, 'following_count', Subscription, 'user'),
+    (Recipe, 'favorites_count', FavoriteRecipe, 'recipe'),
+    (Recipe, 'shopping_carts_count', ShoppingCart, 'recipe'),
+    (Tag, 'recipes_count', RecipeTag, 'tag'),
+    (Ingredient, 'recipes_count', RecipeIngredient, 'ingredient'),
+)
+
+
+def change_counter(model, field, ids, step=1):
+    ids_by_delta = defaultdict(list)
+    for pk, count in Counter(ids).items():
+        ids_by_delta[count * step].append(pk)
+    for delta, pks in ids_by_delta.items():
+        model.objects.filter(pk__in=pks).update(**{
+            field: Greatest(F(field) + delta, Value(0))
+        })
+
+
+def count_subquery(child, foreign_key):
+    return Coalesce(Subquery(
+        child.objects.filter(**{foreign_key: OuterRef('pk')}).order_by()
+        .values(foreign_key).annotate(total=Count('pk')).values('total')
+    ), Value(0))
+
+
+def recount(model, field, child, foreign_key):
+    actual = count_subquery(child, foreign_key)
+    return model.objects.annotate(actual=actual).filter(
+        ~Q(**{field: F('actual')})
+    ).update(**{field: count_subquery(child, foreign_key)})
+
+
+def recount_all():
+    return {
+        f'{model._meta.model_name}.{field}': recount(model, field, child,
+                                                     foreign_key)
+        for model, field, child, foreign_key in COUNTERS
+    }
@@ -0,0 +1,181 @@
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import Count, Q
+
+from .models import FeedEntry, FoodgramUser, Recipe, Subscription
+
+# Лента подписок строится двумя способами. Пока подписок немного, она
+# собирается при чтении слиянием свежих рецептов каждого автора. Для тех,
+# кто подписан на FEED_MATERIALIZE_THRESHOLD авторов и больше, в FeedEntry
+# хранятся FEED_MAX_ENTRIES самых свежих рецептов ленты; они пополняются
+# при публикации, а хвост старше них снова собирается слиянием. Хранимые
+# записи всегда образуют начало ленты без пропусков. Включает и выключает
+# хранение и обрезает лишнее команда sync_feeds, а не запрос на чтение.
+
+FEED_TABLE = FeedEntry._meta.db_table
+RECIPE_TABLE = Recipe._meta.db_table
+SUBSCRIPTION_TABLE = Subscription._meta.db_table
+
+MERGE_SQL = f"""
+SELECT recent.created_at, recent.id
+FROM {SUBSCRIPTION_TABLE} subscription
+CROSS JOIN LATERAL (
+    SELECT recipe.created_at, recipe.id
+    FROM {RECIPE_TABLE} recipe
+    WHERE recipe.author_id = subscription.author_id {{position}}
+    ORDER BY recipe.created_at DESC, recipe.id DESC
+    LIMIT %s
+) recent
+WHERE subscription.user_id = %s
+ORDER BY recent.created_at DESC, recent.id DESC
+LIMIT %s
+"""
+MERGE_POSITION = 'AND (recipe.created_at, recipe.id) < (%s, %s)'
+
+
+def before(position, created_at='created_at', pk='id'):
+    if position is None:
+        return Q()
+    value, pk_value = position
+    return (Q(**{f'{created_at}__lt': value})
+            | Q(**{created_at: value, f'{pk}__lt': pk_value}))
+
+
+def merge_feed(user_id, position, limit):
+    """Слияние при чтении: не больше limit свежих рецептов на автора."""
+    if connection.vendor == 'postgresql':
+        params = [*(position or ()), limit, user_id, limit]
+        sql = MERGE_SQL.format(position=MERGE_POSITION if position else '')
+        with connection.cursor() as cursor:
+            cursor.execute(sql, params)
+            return cursor.fetchall()
+    return list(Recipe.objects.filter(
+        before(position), author__authors__user_id=user_id
+    ).order_by('-created_at', '-id').values_list('created_at', 'id')[:limit])
+
+
+def stored_feed(user_id, position, limit):
+    return list(FeedEntry.objects.filter(
+        before(position, pk='recipe_id'), user_id=user_id
+    ).order_by('-created_at', '-recipe_id').values_list(
+        'created_at', 'recipe_id'
+    )[:limit])
+
+
+def oldest_entry(user_id):
+    return FeedEntry.objects.filter(user_id=user_id).order_by(
+        'created_at', 'recipe_id'
+    ).values_list('created_at', 'recipe_id').first()
+
+
+def store(user_id, rows):
+    FeedEntry.objects.bulk_create(
+        (FeedEntry(user_id=user_id, recipe_id=recipe_id, created_at=created_at)
+         for created_at, recipe_id in rows),
+        batch_size=1000, ignore_conflicts=True
+    )
+
+
+@transaction.atomic
+def set_materialized(user_id, materialized):
+    FeedEntry.objects.filter(user_id=user_id).delete()
+    if materialized:
+        store(user_id, merge_feed(user_id, None,
+                                  settings.FEED_MAX_ENTRIES))
+    FoodgramUser.objects.filter(pk=user_id).update(
+        feed_materialized=materialized
+    )
+
+
+def trim(user_id):
+    """Удаляет записи старше FEED_MAX_ENTRIES самых свежих."""
+    entries = FeedEntry.objects.filter(user_id=user_id).order_by(
+        '-created_at', '-recipe_id'
+    ).values_list('created_at', 'recipe_id')
+    try:
+        boundary = entries[settings.FEED_MAX_ENTRIES - 1]
+    except IndexError:
+        return 0
+    deleted, _ = FeedEntry.objects.filter(
+        before(boundary, pk='recipe_id'), user_id=user_id
+    ).delete()
+    return deleted
+
+
+def sync_feeds():
+    """Переключает способ построения лент по числу подписок и обрезает
+    хранимые ленты. Возвращает (включено, выключено, удалено записей)."""
+    threshold = settings.FEED_MATERIALIZE_THRESHOLD
+    # Обратно к слиянию — только при вдвое меньшем числе подписок, чтобы
+    # лента не пересобиралась при подписке и отписке около порога.
+    enabled = FoodgramUser.objects.filter(
+        feed_materialized=False, following_count__gte=threshold
+    ).values_list('pk', flat=True)
+    disabled = FoodgramUser.objects.filter(
+        feed_materialized=True, following_count__lt=threshold // 2
+    ).values_list('pk', flat=True)
+    enabled, disabled = list(enabled), list(disabled)
+    for user_id in enabled:
+        set_materialized(user_id, True)
+    for user_id in disabled:
+        set_materialized(user_id, False)
+    overflowing = FeedEntry.objects.values('user_id').annotate(
+        entries=Count('pk')
+    ).filter(entries__gt=settings.FEED_MAX_ENTRIES).values_list(
+        'user_id', flat=True
+    )
+    trimmed = sum(trim(user_id) for user_id in list(overflowing))
+    return len(enabled), len(disabled), trimmed
+
+
+def get_feed(user_id, position=None, limit=10):
+    """(created_at, id) рецептов ленты строго раньше position."""
+    # Пользователь из кэша аутентификации может быть устаревшим, поэтому
+    # состояние ленты читается заново.
+    materialized = FoodgramUser.objects.values_list(
+        'feed_materialized', flat=True
+    ).get(pk=user_id)
+    if not materialized:
+        return merge_feed(user_id, position, limit)
+    rows = stored_feed(user_id, position, limit)
+    if len(rows) < limit:
+        # Хранимое начало ленты кончилось: остальное старше его последней
+        # записи и собирается слиянием.
+        rows += merge_feed(user_id, rows[-1] if rows else position,
+                           limit - len(rows))
+    return rows
+
+
+def recipe_published(recipe):
+    followers = Subscription.objects.filter(
+        author_id=recipe.author_id, user__feed_materialized=True
+    ).values_list('user_id', flat=True)
+    FeedEntry.objects.bulk_create(
+        (FeedEntry(user_id=user_id, recipe_id=recipe.pk,
+                   created_at=recipe.created_at)
+         for user_id in followers.iterator()),
+        batch_size=1000, ignore_conflicts=True
+    )
+
+
+def subscribed(subscription):
+    user_id = subscription.user_id
+    if not FoodgramUser.objects.filter(pk=user_id,
+                                       feed_materialized=True).exists():
+        return
+    # Рецепты старше последней хранимой записи лента возьмёт слиянием,
+    # а вставка их сюда оставила бы пропуски среди рецептов других авторов.
+    oldest = oldest_entry(user_id)
+    recipes = Recipe.objects.filter(author_id=subscription.author_id)
+    if oldest is not None:
+        recipes = recipes.exclude(before(oldest))
+    store(user_id, recipes.order_by('-created_at', '-id').values_list(
+        'created_at', 'id'
+    )[:settings.FEED_MAX_ENTRIES])
+
+
+def unsubscribed(subscription):
+    FeedEntry.objects.filter(
+        user_id=subscription.user_id,
+        recipe__author_id=subscription.author_id
+    ).delete()
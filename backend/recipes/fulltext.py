@@ -0,0 +1,140 @@
+import re
+
+from django.db import connections
+from django.db.models import BooleanField, FloatField, Q, Value
+from django.db.models.expressions import RawSQL
+
+from .stemmer import stem
+
+SEARCH_CONFIG = 'russian'
+FTS_TABLE = 'recipes_recipe_fts'
+# Вес совпадения в названии относительно описания для bm25 в SQLite.
+NAME_WEIGHT = 10.0
+MIN_TERM_LENGTH = 2
+
+POSTGRES_INSTALL = (
+    "ALTER TABLE recipes_recipe ADD COLUMN IF NOT EXISTS search_vector"
+    " tsvector GENERATED ALWAYS AS ("
+    f"setweight(to_tsvector('{SEARCH_CONFIG}', coalesce(name, '')), 'A')"
+    f" || setweight(to_tsvector('{SEARCH_CONFIG}',"
+    " coalesce(description, '')), 'B')) STORED",
+    'CREATE INDEX IF NOT EXISTS recipe_search_vector_idx'
+    ' ON recipes_recipe USING gin (search_vector)',
+)
+POSTGRES_UNINSTALL = (
+    'DROP INDEX IF EXISTS recipe_search_vector_idx',
+    'ALTER TABLE recipes_recipe DROP COLUMN IF EXISTS search_vector',
+)
+
+
+def folded(column):
+    # FTS5 не приравнивает «ё» к «е», поэтому в индекс пишется текст с «е».
+    return f"replace(replace({column}, 'ё', 'е'), 'Ё', 'Е')"
+
+
+SQLITE_INSERT = (
+    f'INSERT INTO {FTS_TABLE}(rowid, name, description)'
+    f" VALUES (new.id, {folded('new.name')},"
+    f" {folded('new.description')});"
+)
+SQLITE_DELETE = (
+    f'INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, name, description)'
+    f" VALUES ('delete', old.id, {folded('old.name')},"
+    f" {folded('old.description')});"
+)
+SQLITE_TRIGGERS = {
+    f'{FTS_TABLE}_insert':
+        f'AFTER INSERT ON recipes_recipe BEGIN {SQLITE_INSERT} END',
+    f'{FTS_TABLE}_delete':
+        f'AFTER DELETE ON recipes_recipe BEGIN {SQLITE_DELETE} END',
+    f'{FTS_TABLE}_update':
+        'AFTER UPDATE OF name, description ON recipes_recipe'
+        f' BEGIN {SQLITE_DELETE} {SQLITE_INSERT} END',
+}
+SQLITE_REBUILD = (
+    f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('delete-all')",
+    f'INSERT INTO {FTS_TABLE}(rowid, name, description)'
+    f" SELECT id, {folded('name')}, {folded('description')}"
+    ' FROM recipes_recipe',
+)
+
+
+def install(connection):
+    """Создаёт полнотекстовый индекс рецептов; повторный вызов безопасен.
+
+    В SQLite пересоздание таблицы рецептов при миграциях удаляет её
+    триггеры, поэтому недостающие триггеры создаются заново, а индекс
+    заполняется с нуля.
+    """
+    with connection.cursor() as cursor:
+        if connection.vendor == 'postgresql':
+            for statement in POSTGRES_INSTALL:
+                cursor.execute(statement)
+        elif connection.vendor == 'sqlite':
+            cursor.execute(
+                f'CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} USING fts5('
+                "name, description, content='',"
+                " tokenize='unicode61 remove_diacritics 2')"
+            )
+            cursor.execute(
+                "SELECT name FROM sqlite_master WHERE type = 'trigger'"
+                ' AND tbl_name = %s', ('recipes_recipe',)
+            )
+            existing = {name for name, in cursor.fetchall()}
+            if existing >= SQLITE_TRIGGERS.keys():
+                return
+            for name, body in SQLITE_TRIGGERS.items():
+                cursor.execute(f'DROP TRIGGER IF EXISTS {name}')
+                cursor.execute(f'CREATE TRIGGER {name} {body}')
+            for statement in SQLITE_REBUILD:
+                cursor.execute(statement)
+
+
+def uninstall(connection):
+    with connection.cursor() as cursor:
+        if connection.vendor == 'postgresql':
+            for statement in POSTGRES_UNINSTALL:
+                cursor.execute(statement)
+        elif connection.vendor == 'sqlite':
+            for name in SQLITE_TRIGGERS:
+                cursor.execute(f'DROP TRIGGER IF EXISTS {name}')
+            cursor.execute(f'DROP TABLE IF EXISTS {FTS_TABLE}')
+
+
+def fts5_query(text):
+    """Запрос FTS5: основа каждого слова как префикс, слова через AND."""
+    terms = {stem(word) for word in re.findall(r'\w+', text.lower())}
+    return ' '.join(f'"{term}"*' for term in sorted(terms)
+                    if len(term) >= MIN_TERM_LENGTH)
+
+
+def search_recipes(queryset, text):
+    """Фильтрует рецепты по тексту и добавляет релевантность search_rank."""
+    table = queryset.model._meta.db_table
+    vendor = connections[queryset.db].vendor
+    if vendor == 'postgresql':
+        query = f"websearch_to_tsquery('{SEARCH_CONFIG}', %s)"
+        return queryset.filter(RawSQL(
+            f'{table}.search_vector @@ {query}', (text,),
+            output_field=BooleanField()
+        )).annotate(search_rank=RawSQL(
+            f'ts_rank({table}.search_vector, {query})', (text,),
+            output_field=FloatField()
+        ))
+    if vendor == 'sqlite':
+        query = fts5_query(text)
+        if not query:
+            return queryset.none()
+        return queryset.filter(RawSQL(
+            f'{table}.id IN (SELECT rowid FROM {FTS_TABLE}'
+            f' WHERE {FTS_TABLE} MATCH %s)', (query,),
+            output_field=BooleanField()
+        )).annotate(search_rank=RawSQL(
+            f'(SELECT -bm25({FTS_TABLE}, {NAME_WEIGHT}, 1.0)'
+            f' FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s'
+            f' AND rowid = {table}.id)', (query,),
+            output_field=FloatField()
+        ))
+    return queryset.filter(
+        Q(name__icontains=text) | Q(description__icontains=text)
+    ).annotate(search_rank=Value(0.0, output_field=FloatField()))
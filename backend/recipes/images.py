@@ -0,0 +1,175 @@
+import hashlib
+import io
+import logging
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from django.apps import apps
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import connections, transaction
+from PIL import Image, ImageOps
+
+from .invalidation import invalidate_related
+
+logger = logging.getLogger('recipes.images')
+
+RENDITIONS = (
+    ('thumbnail', 320),
+    ('medium', 960),
+)
+FORMATS = (
+    ('webp', 'WEBP', {'quality': 80, 'method': 4}),
+    ('jpeg', 'JPEG', {'quality': 82, 'optimize': True,
+                      'progressive': True}),
+)
+# Сигнатуры принимаемых форматов: на потоке запроса файл не открывается
+# Pillow, полностью его читает фоновая обработка.
+SIGNATURES = (
+    (b'\xff\xd8\xff', 'jpg'),
+    (b'\x89PNG\r\n\x1a\n', 'png'),
+    (b'GIF87a', 'gif'),
+    (b'GIF89a', 'gif'),
+)
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def get_executor():
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=settings.IMAGE_WORKERS,
+                thread_name_prefix='images'
+            )
+        return _executor
+
+
+def reset_executor():
+    global _executor
+    with _executor_lock:
+        _executor = None
+
+
+class InvalidImage(Exception):
+    pass
+
+
+def detect_format(content):
+    for signature, extension in SIGNATURES:
+        if content.startswith(signature):
+            return extension
+    if content[:4] == b'RIFF' and content[8:12] == b'WEBP':
+        return 'webp'
+    return None
+
+
+def renditions_field(field_name):
+    return f'{field_name}_renditions'
+
+
+def get_rendition(instance, field_name, rendition, image_format):
+    renditions = getattr(instance, renditions_field(field_name), None) or {}
+    if renditions.get('source') != getattr(instance, field_name).name:
+        return None
+    return renditions.get(rendition, {}).get(image_format)
+
+
+def flatten(image):
+    if image.mode in ('RGBA', 'LA', 'P'):
+        image = image.convert('RGBA')
+        background = Image.new('RGB', image.size, 'white')
+        background.paste(image, mask=image.getchannel('A'))
+        return background
+    return image.convert('RGB')
+
+
+def save_rendition(image, folder, image_format, pil_format, options):
+    buffer = io.BytesIO()
+    image.save(buffer, pil_format, **options)
+    content = buffer.getvalue()
+    digest = hashlib.sha256(content).hexdigest()[:20]
+    path = f'{folder}/renditions/{digest}.{image_format}'
+    if not default_storage.exists(path):
+        path = default_storage.save(path, ContentFile(content))
+    return path
+
+
+def render(field_file):
+    folder = os.path.dirname(field_file.name) or 'images'
+    with field_file.open('rb') as file:
+        content = file.read()
+    try:
+        with Image.open(io.BytesIO(content)) as original:
+            image = flatten(ImageOps.exif_transpose(original))
+    except (OSError, SyntaxError, ValueError,
+            Image.DecompressionBombError) as error:
+        raise InvalidImage(error) from error
+    renditions = {'source': field_file.name}
+    for name, size in RENDITIONS:
+        resized = image.copy()
+        resized.thumbnail((size, size), Image.LANCZOS)
+        renditions[name] = {
+            image_format: save_rendition(resized, folder, image_format,
+                                         pil_format, options)
+            for image_format, pil_format, options in FORMATS
+        }
+    return renditions
+
+
+def process_image(model_label, pk, field_name):
+    model = apps.get_model(model_label)
+    try:
+        instance = model.objects.filter(pk=pk).only(field_name).first()
+        field_file = instance and getattr(instance, field_name)
+        if not field_file:
+            return None
+        renditions = render(field_file)
+        updated = model.objects.filter(
+            pk=pk, **{field_name: field_file.name}
+        ).update(**{renditions_field(field_name): renditions})
+        if updated:
+            # update() не отправляет сигналы, а ссылки на копии есть в
+            # закэшированных ответах API.
+            invalidate_related(model_label, pk)
+        return renditions
+    except InvalidImage as error:
+        # Отметка с тем же source, чтобы файл не обрабатывался повторно;
+        # копий у него нет, и API продолжает отдавать исходный файл.
+        logger.warning('Файл не является изображением %s %s.%s: %s',
+                       model_label, pk, field_name, error)
+        model.objects.filter(pk=pk, **{field_name: field_file.name}).update(
+            **{renditions_field(field_name): {'source': field_file.name,
+                                              'invalid': True}}
+        )
+    except OSError as error:
+        logger.warning('Не удалось прочитать изображение %s %s.%s: %s',
+                       model_label, pk, field_name, error)
+    except Exception:
+        logger.exception('Не удалось обработать изображение %s %s.%s',
+                         model_label, pk, field_name)
+
+
+def process_in_background(*task):
+    try:
+        return process_image(*task)
+    finally:
+        connections.close_all()
+
+
+def schedule_processing(instance, field_name):
+    field_file = getattr(instance, field_name)
+    renditions = getattr(instance, renditions_field(field_name)) or {}
+    if not field_file or renditions.get('source') == field_file.name:
+        return
+    task = (instance._meta.label, instance.pk, field_name)
+    if settings.IMAGE_PROCESSING == 'sync':
+        transaction.on_commit(lambda: process_image(*task))
+    else:
+        transaction.on_commit(
+            lambda: get_executor().submit(process_in_background, *task)
+        )
@@ -0,0 +1,205 @@
+import csv
+import json
+import os
+from itertools import islice
+
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+READ_CHUNK_SIZE = 64 * 1024
+
+
+class ImportFormatError(ValueError):
+    pass
+
+
+def iter_json_array(file, chunk_size=READ_CHUNK_SIZE):
+    """Поэлементно читает JSON-массив, не загружая файл целиком."""
+    decoder = json.JSONDecoder()
+    buffer, position, eof = '', 0, False
+
+    def skip(chars):
+        nonlocal buffer, position, eof
+        while True:
+            while position < len(buffer) and buffer[position] in chars:
+                position += 1
+            if position < len(buffer) or eof:
+                return
+            buffer, position = file.read(chunk_size), 0
+            eof = not buffer
+
+    skip(' \t\r\n')
+    if buffer[position:position + 1] != '[':
+        raise ImportFormatError('Ожидается JSON-массив.')
+    position += 1
+    while True:
+        skip(' \t\r\n,')
+        if buffer[position:position + 1] == ']':
+            return
+        if eof:
+            raise ImportFormatError('Неожиданный конец JSON-файла.')
+        try:
+            item, position = decoder.raw_decode(buffer, position)
+        except json.JSONDecodeError:
+            chunk = file.read(chunk_size)
+            if not chunk:
+                raise ImportFormatError('Некорректный JSON.')
+            buffer, position = buffer[position:] + chunk, 0
+            continue
+        if isinstance(item, dict) and 'fields' in item:
+            item = item['fields']
+        yield item
+        if position > chunk_size:
+            buffer, position = buffer[position:], 0
+
+
+def iter_csv(file, fieldnames):
+    reader = csv.reader(file)
+    header = next(reader, None)
+    if header is None:
+        return
+    if set(header) == set(fieldnames):
+        fieldnames = header
+    else:
+        yield dict(zip(fieldnames, header))
+    for row in reader:
+        yield dict(zip(fieldnames, row))
+
+
+def iter_rows(path, fieldnames, file_format=None):
+    if file_format is None:
+        file_format = os.path.splitext(path)[1].lstrip('.').lower()
+    with open(path, encoding='utf-8-sig', newline='') as file:
+        if file_format == 'json':
+            yield from iter_json_array(file)
+        elif file_format == 'csv':
+            yield from iter_csv(file, fieldnames)
+        else:
+            raise ImportFormatError(
+                f'Неподдерживаемый формат: {file_format}.'
+            )
+
+
+def batched(iterable, size):
+    iterator = iter(iterable)
+    while True:
+        batch = list(islice(iterator, size))
+        if not batch:
+            return
+        yield batch
+
+
+class Upserter:
+
+    def __init__(self, model, key_fields, update_fields=(), batch_size=1000):
+        self.model = model
+        self.key_fields = tuple(key_fields)
+        self.update_fields = tuple(update_fields)
+        self.batch_size = batch_size
+        self.counts = {'inserted': 0, 'updated': 0, 'skipped': 0}
+
+    def clean(self, row):
+        fields = self.key_fields + self.update_fields
+        if not isinstance(row, dict):
+            return None
+        values = {}
+        for field in fields:
+            value = row.get(field)
+            if not isinstance(value, str):
+                return None
+            value = ' '.join(value.split())
+            try:
+                values[field] = self.model._meta.get_field(field).clean(
+                    value, None
+                )
+            except ValidationError:
+                return None
+        return values
+
+    def key(self, values):
+        return tuple(values[field] for field in self.key_fields)
+
+    def existing(self, keys):
+        first = self.key_fields[0]
+        queryset = self.model.objects.filter(**{
+            f'{first}__in': {key[0] for key in keys}
+        }).only('pk', *self.key_fields, *self.update_fields)
+        return {self.key(vars(obj)): obj for obj in queryset
+                if self.key(vars(obj)) in keys}
+
+    @transaction.atomic
+    def upsert_batch(self, rows):
+        batch = {}
+        for row in rows:
+            values = self.clean(row)
+            if values is None or self.key(values) in batch:
+                self.counts['skipped'] += 1
+                continue
+            batch[self.key(values)] = values
+        existing = self.existing(batch.keys())
+        created, changed = [], []
+        for key, values in batch.items():
+            obj = existing.get(key)
+            if obj is None:
+                created.append(self.model(**values))
+                continue
+            if all(getattr(obj, field) == values[field]
+                   for field in self.update_fields):
+                self.counts['skipped'] += 1
+                continue
+            for field in self.update_fields:
+                setattr(obj, field, values[field])
+            changed.append(obj)
+        self.model.objects.bulk_create(created, ignore_conflicts=True)
+        if changed:
+            self.model.objects.bulk_update(changed, self.update_fields)
+        self.counts['inserted'] += len(created)
+        self.counts['updated'] += len(changed)
+
+    def run(self, rows):
+        for batch in batched(rows, self.batch_size):
+            self.upsert_batch(batch)
+        return self.counts
+
+
+class ImportCommand(BaseCommand):
+    model = None
+    default_path = None
+    key_fields = ()
+    update_fields = ()
+    csv_fields = ()
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', nargs='?',
+                            default=os.path.join(settings.BASE_DIR.parent,
+                                                 self.default_path),
+                            help='Путь к JSON- или CSV-файлу')
+        parser.add_argument('--format', dest='file_format',
+                            choices=('json', 'csv'),
+                            help='Формат файла, по умолчанию по расширению')
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def imported(self):
+        pass
+
+    def handle(self, *args, **options):
+        path = options['path']
+        if not os.path.exists(path):
+            raise CommandError(f'Файл {path} не найден')
+        upserter = Upserter(self.model, self.key_fields, self.update_fields,
+                            options['batch_size'])
+        try:
+            counts = upserter.run(iter_rows(path, self.csv_fields,
+                                            options['file_format']))
+        except ImportFormatError as error:
+            raise CommandError(f'{path}: {error}')
+        finally:
+            if upserter.counts['inserted'] or upserter.counts['updated']:
+                self.imported()
+        self.stdout.write(self.style.SUCCESS(
+            f'{self.model._meta.verbose_name_plural}: добавлено'
+            f' {counts["inserted"]}, обновлено {counts["updated"]},'
+            f' пропущено {counts["skipped"]}'
+        ))
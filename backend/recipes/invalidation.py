@@ -0,0 +1,43 @@
+from django.db import transaction
+
+from .models import Recipe
+from .versioning import bump_version
+
+RECIPE_LISTS = 'recipe_lists'
+RECIPE_VERSION = 'recipe:{}'
+
+# Как найти рецепты, в ответах API о которых показан объект модели.
+RECIPE_LOOKUPS = {
+    'recipes.Recipe': 'pk',
+    'recipes.FoodgramUser': 'author_id',
+    'recipes.Tag': 'tags',
+    'recipes.Ingredient': 'ingredients',
+}
+
+
+def recipe_version(recipe_id):
+    return RECIPE_VERSION.format(recipe_id)
+
+
+def invalidate_recipes(recipe_ids):
+    # Версии меняются после коммита: иначе параллельный запрос успел бы
+    # закэшировать старые данные уже под новой версией.
+    recipe_ids = set(recipe_ids)
+
+    def bump():
+        bump_version(RECIPE_LISTS)
+        for recipe_id in recipe_ids:
+            bump_version(recipe_version(recipe_id))
+
+    transaction.on_commit(bump)
+
+
+def invalidate_related(model_label, pk):
+    """Сбрасывает кэш ответов с рецептами, где показан этот объект."""
+    lookup = RECIPE_LOOKUPS.get(model_label)
+    if lookup == 'pk':
+        invalidate_recipes([pk])
+    elif lookup is not None:
+        invalidate_recipes(Recipe.objects.filter(
+            **{lookup: pk}
+        ).values_list('pk', flat=True))
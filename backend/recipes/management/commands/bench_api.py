@@ -0,0 +1,263 @@
+import json
+import re
+import threading
+import time
+from itertools import count
+from urllib.error import HTTPError, URLError
+from urllib.parse import quote
+from urllib.request import HTTPRedirectHandler, Request, build_opener
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models import Count
+from rest_framework.authtoken.models import Token
+
+from recipes.models import Ingredient, Recipe, Tag
+from recipes.shortlinks import encode
+
+User = get_user_model()
+
+QUERIES_PATTERN = re.compile(r'db;[^,]*desc="(\d+) queries"')
+INGREDIENT_PREFIXES = ('мо', 'сыр', 'масло', 'ябл', 'кар', 'соль')
+SEARCH_QUERIES = ('суп', 'блины', 'куриный суп', 'салат с сыром')
+
+
+class NoRedirectHandler(HTTPRedirectHandler):
+
+    def redirect_request(self, *args, **kwargs):
+        return None
+
+
+opener = build_opener(NoRedirectHandler)
+
+
+def percentile(values, share):
+    if not values:
+        return None
+    return values[min(len(values) - 1, max(int(len(values) * share) - 1, 0))]
+
+
+class Command(BaseCommand):
+    help = ('Нагрузочный прогон основных сценариев API против запущенного'
+            ' сервера: RPS, p50/p95/p99 и число SQL-запросов на запрос')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--url', default='http://127.0.0.1:8000',
+                            help='Адрес запущенного сервера')
+        parser.add_argument('--requests', type=int, default=200,
+                            help='Запросов на сценарий')
+        parser.add_argument('--concurrency', type=int, default=8)
+        parser.add_argument('--warmup', type=int, default=5,
+                            help='Прогревочных запросов на сценарий')
+        parser.add_argument('--timeout', type=float, default=30)
+        parser.add_argument('--flows', nargs='*',
+                            help='Запускать только указанные сценарии')
+        parser.add_argument('--email',
+                            help='Пользователь, от имени которого'
+                                 ' выполняются запросы')
+        parser.add_argument('--json', dest='json_path',
+                            help='Сохранить результаты в JSON-файл')
+        parser.add_argument('--baseline',
+                            help='JSON-файл предыдущего прогона для'
+                                 ' сравнения')
+
+    def get_user(self, email):
+        users = User.objects.filter(is_active=True)
+        if email:
+            return users.filter(email=email).first()
+        return users.annotate(
+            subscriptions=Count('followers', distinct=True),
+            carts=Count('shoppingcarts', distinct=True),
+        ).order_by('-subscriptions', '-carts', 'pk').first()
+
+    def get_flows(self):
+        recipes = list(Recipe.objects.order_by('?').values_list(
+            'pk', flat=True
+        )[:50])
+        tags = list(Tag.objects.values_list('slug', flat=True))
+        authors = list(Recipe.objects.order_by().values_list(
+            'author_id', flat=True
+        ).distinct()[:20])
+        ingredient = Ingredient.objects.order_by('pk').first()
+        pantry = ','.join(map(str, Ingredient.objects.order_by(
+            '-recipes_count'
+        ).values_list('pk', flat=True)[:10]))
+        flows = {
+            'recipes': ['/api/recipes/?limit=6'],
+            'recipes_compact': [
+                '/api/recipes/?limit=6&fields=id,name,image,cooking_time,'
+                'tags,author.id,author.username,author.first_name,'
+                'author.last_name'
+            ],
+            'recipes_paged': [f'/api/recipes/?limit=6&offset={offset}'
+                              for offset in (6, 60, 600)],
+            'recipes_filtered': (
+                [f'/api/recipes/?limit=6&tags={slug}' for slug in tags]
+                + [f'/api/recipes/?limit=6&author={author}'
+                   for author in authors]
+                + ['/api/recipes/?limit=6&is_favorited=1',
+                   '/api/recipes/?limit=6&is_in_shopping_cart=1']
+            ),
+            'pantry': [f'/api/recipes/pantry/?limit=6&ingredients={pantry}']
+            if pantry else [],
+            'recipes_search': [f'/api/recipes/?limit=6&search={quote(text)}'
+                               for text in SEARCH_QUERIES],
+            'recipe_detail': [f'/api/recipes/{pk}/' for pk in recipes],
+            'short_link': [f'/s/{encode(pk)}/' for pk in recipes],
+            'subscriptions': [
+                '/api/users/subscriptions/?limit=6&recipes_limit=3'
+            ],
+            'feed': ['/api/recipes/feed/?limit=6'],
+            'popular': ['/api/recipes/popular/?limit=6'],
+            'similar': [f'/api/recipes/{pk}/similar/' for pk in recipes],
+            'shopping_cart': ['/api/recipes/download_shopping_cart/'],
+            'ingredient_search': [f'/api/ingredients/?name={quote(prefix)}'
+                                  for prefix in INGREDIENT_PREFIXES],
+        }
+        if ingredient is not None:
+            flows['ingredient_search'].append(
+                f'/api/ingredients/{ingredient.pk}/'
+            )
+        return {name: paths for name, paths in flows.items() if paths}
+
+    def fetch(self, url, headers, timeout):
+        started = time.perf_counter()
+        try:
+            with opener.open(Request(url, headers=headers),
+                             timeout=timeout) as response:
+                response.read()
+                status = response.status
+                timing = response.headers.get('Server-Timing', '')
+        except HTTPError as error:
+            status = error.code
+            timing = error.headers.get('Server-Timing', '')
+        except URLError:
+            status, timing = None, ''
+        elapsed = time.perf_counter() - started
+        match = QUERIES_PATTERN.search(timing)
+        return status, elapsed, int(match.group(1)) if match else None
+
+    def run_flow(self, base_url, paths, headers, options):
+        urls = [f'{base_url}{path}' for path in paths]
+        for number in range(options['warmup']):
+            self.fetch(urls[number % len(urls)], headers, options['timeout'])
+
+        counter = count()
+        total = options['requests']
+        latencies, queries, errors = [], [], []
+        lock = threading.Lock()
+
+        def worker():
+            while True:
+                number = next(counter)
+                if number >= total:
+                    return
+                status, elapsed, query_count = self.fetch(
+                    urls[number % len(urls)], headers, options['timeout']
+                )
+                with lock:
+                    if status is None or status >= 400:
+                        errors.append(status)
+                        continue
+                    latencies.append(elapsed)
+                    if query_count is not None:
+                        queries.append(query_count)
+
+        threads = [threading.Thread(target=worker)
+                   for _ in range(options['concurrency'])]
+        started = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        duration = time.perf_counter() - started
+
+        latencies.sort()
+        return {
+            'requests': total,
+            'errors': len(errors),
+            'rps': len(latencies) / duration if duration else 0.0,
+            'p50': percentile(latencies, 0.5),
+            'p95': percentile(latencies, 0.95),
+            'p99': percentile(latencies, 0.99),
+            'queries_avg': sum(queries) / len(queries) if queries else None,
+            'queries_max': max(queries) if queries else None,
+        }
+
+    def format_ms(self, value):
+        return '-' if value is None else f'{value * 1000:.1f}'
+
+    def compare(self, name, result, baseline):
+        previous = baseline.get(name)
+        if previous is None:
+            return
+        changes = []
+        for key, title in (('rps', 'RPS'), ('p95', 'p95')):
+            if previous.get(key) and result[key] is not None:
+                change = (result[key] / previous[key] - 1) * 100
+                changes.append(f'{title} {change:+.0f}%')
+        before, after = previous.get('queries_max'), result['queries_max']
+        if before is not None and after is not None:
+            changes.append(f'SQL {after} (было {before})')
+        line = f'{"":<20}{", ".join(changes)}'
+        if before is not None and after is not None and after > before:
+            line = self.style.ERROR(line)
+        self.stdout.write(line)
+
+    def handle(self, *args, **options):
+        user = self.get_user(options['email'])
+        if user is None:
+            raise CommandError('Нет активного пользователя, сначала'
+                               ' выполните seed_data.')
+        token, _ = Token.objects.get_or_create(user=user)
+        headers = {'Authorization': f'Token {token.key}',
+                   'Accept': 'application/json'}
+        flows = self.get_flows()
+        if options['flows']:
+            unknown = set(options['flows']) - flows.keys()
+            if unknown:
+                raise CommandError(
+                    f'Неизвестные сценарии: {", ".join(sorted(unknown))}.'
+                    f' Доступны: {", ".join(flows)}.'
+                )
+            flows = {name: flows[name] for name in options['flows']}
+
+        baseline = {}
+        if options['baseline']:
+            with open(options['baseline'], encoding='utf-8') as file:
+                baseline = json.load(file)['results']
+
+        base_url = options['url'].rstrip('/')
+        self.stdout.write(
+            f'{base_url}, пользователь {user.email},'
+            f' {options["requests"]} запросов на сценарий,'
+            f' {options["concurrency"]} потоков'
+        )
+        self.stdout.write(
+            f'{"сценарий":<20}{"RPS":>8}{"p50, мс":>10}{"p95, мс":>10}'
+            f'{"p99, мс":>10}{"SQL ср.":>9}{"SQL макс.":>11}{"ошибки":>8}'
+        )
+        results = {}
+        for name, paths in flows.items():
+            result = results[name] = self.run_flow(base_url, paths,
+                                                   headers, options)
+            queries_avg = ('-' if result['queries_avg'] is None
+                           else f'{result["queries_avg"]:.1f}')
+            queries_max = ('-' if result['queries_max'] is None
+                           else result['queries_max'])
+            line = (
+                f'{name:<20}{result["rps"]:>8.1f}'
+                f'{self.format_ms(result["p50"]):>10}'
+                f'{self.format_ms(result["p95"]):>10}'
+                f'{self.format_ms(result["p99"]):>10}'
+                f'{queries_avg:>9}{queries_max:>11}{result["errors"]:>8}'
+            )
+            self.stdout.write(self.style.ERROR(line) if result['errors']
+                              else line)
+            self.compare(name, result, baseline)
+
+        if options['json_path']:
+            with open(options['json_path'], 'w', encoding='utf-8') as file:
+                json.dump({'url': base_url, 'requests': options['requests'],
+                           'concurrency': options['concurrency'],
+                           'results': results}, file, indent=2)
@@ -0,0 +1,35 @@
+import timeit
+
+from django.core.management.base import BaseCommand
+
+from api.serializers import IngredientSerializer
+from recipes.models import Ingredient
+from recipes.search import ingredient_index
+
+DEFAULT_QUERIES = ('а', 'мо', 'сыр', 'молоко', 'масло слив', 'овощ', 'ябл')
+
+
+class Command(BaseCommand):
+    help = 'Сравнение поиска ингредиентов через ORM и через индекс'
+
+    def add_arguments(self, parser):
+        parser.add_argument('queries', nargs='*', default=DEFAULT_QUERIES)
+        parser.add_argument('--repeat', type=int, default=200)
+
+    def orm_search(self, query):
+        return IngredientSerializer(
+            Ingredient.objects.filter(name__icontains=query), many=True
+        ).data
+
+    def handle(self, *args, **options):
+        repeat = options['repeat']
+        ingredient_index.ensure_fresh()
+        self.stdout.write(f'{"запрос":<16}{"ORM, мкс":>12}'
+                          f'{"индекс, мкс":>14}{"ускорение":>12}')
+        for query in options['queries']:
+            orm = timeit.timeit(lambda: self.orm_search(query),
+                                number=repeat) / repeat * 10 ** 6
+            index = timeit.timeit(lambda: ingredient_index.search(query),
+                                  number=repeat) / repeat * 10 ** 6
+            self.stdout.write(f'{query:<16}{orm:>12.1f}{index:>14.1f}'
+                              f'{orm / index:>11.1f}x')
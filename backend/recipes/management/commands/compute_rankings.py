@@ -0,0 +1,31 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from recipes.rankings import update_rankings
+
+
+class Command(BaseCommand):
+    help = 'Пересчёт похожих и популярных рецептов'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--interval', type=int, default=0,
+            help='Пересчитывать каждые N секунд, пока процесс не остановят'
+        )
+
+    def handle(self, *args, **options):
+        while True:
+            started = time.monotonic()
+            similar, popular = update_rankings()
+            self.stdout.write(self.style.SUCCESS(
+                f'Рейтинги пересчитаны за'
+                f' {time.monotonic() - started:.1f} с: похожие для'
+                f' {similar} рецептов, популярных {popular}'
+            ))
+            if not options['interval']:
+                return
+            close_old_connections()
+            time.sleep(max(options['interval']
+                           - (time.monotonic() - started), 0))
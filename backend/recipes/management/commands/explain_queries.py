@@ -0,0 +1,97 @@
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIClient
+
+from recipes.models import Ingredient, Recipe, Tag
+
+User = get_user_model()
+
+
+class Command(BaseCommand):
+    help = 'Планы выполнения (EXPLAIN) запросов основных эндпоинтов API'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--email',
+                            help='Пользователь, от имени которого'
+                                 ' выполняются запросы')
+        parser.add_argument('--analyze', action='store_true',
+                            help='EXPLAIN ANALYZE (только PostgreSQL)')
+
+    def get_endpoints(self):
+        recipe = Recipe.objects.order_by('pk').first()
+        tag = Tag.objects.order_by('pk').first()
+        author = Recipe.objects.values_list('author_id', flat=True).first()
+        ingredient = Ingredient.objects.order_by('pk').values_list(
+            'pk', flat=True
+        ).first()
+        endpoints = [
+            '/api/recipes/',
+            '/api/recipes/?ordering=-cooking_time',
+            '/api/recipes/?is_favorited=1',
+            '/api/recipes/?is_in_shopping_cart=1',
+            '/api/users/subscriptions/?recipes_limit=3',
+            '/api/recipes/download_shopping_cart/',
+        ]
+        if ingredient is not None:
+            endpoints.append(f'/api/ingredients/{ingredient}/')
+        if tag is not None:
+            endpoints.append(f'/api/recipes/?tags={tag.slug}')
+        if author is not None:
+            endpoints.append(f'/api/recipes/?author={author}')
+        if recipe is not None:
+            endpoints.append(f'/api/recipes/{recipe.pk}/')
+        return endpoints
+
+    def explain(self, sql, analyze, params=None):
+        if connection.vendor == 'postgresql':
+            prefix = 'EXPLAIN ANALYZE' if analyze else 'EXPLAIN'
+        elif connection.vendor == 'sqlite':
+            prefix = 'EXPLAIN QUERY PLAN'
+        else:
+            prefix = 'EXPLAIN'
+        with connection.cursor() as cursor:
+            cursor.execute(f'{prefix} {sql}', params)
+            return [' '.join(str(column) for column in row)
+                    for row in cursor.fetchall()]
+
+    def print_plan(self, title, sql, analyze, params=None):
+        self.stdout.write(self.style.SQL_KEYWORD(title))
+        self.stdout.write(sql if params is None else f'{sql} {params}')
+        for line in self.explain(sql, analyze, params):
+            self.stdout.write(f'    {line}')
+        self.stdout.write('')
+
+    def handle(self, *args, **options):
+        users = User.objects.filter(is_active=True).order_by('pk')
+        if options['email']:
+            users = users.filter(email=options['email'])
+        user = users.first()
+        if user is None:
+            raise CommandError('Нет активного пользователя.')
+        # Без токена: диагностика не должна оставлять следов в базе.
+        client = APIClient(HTTP_HOST=settings.ALLOWED_HOSTS[0])
+        client.force_authenticate(user)
+
+        for endpoint in self.get_endpoints():
+            with CaptureQueriesContext(connection) as queries:
+                response = client.get(endpoint)
+                if response.streaming:
+                    b''.join(response.streaming_content)
+            self.stdout.write(self.style.SUCCESS(
+                f'GET {endpoint} -> {response.status_code},'
+                f' запросов: {len(queries)}'
+            ))
+            for number, query in enumerate(queries.captured_queries, 1):
+                if not query['sql'].startswith('SELECT'):
+                    continue
+                self.print_plan(f'#{number}', query['sql'],
+                                options['analyze'])
+
+        sql, params = Ingredient.objects.filter(
+            name__icontains='сыр'
+        ).query.sql_with_params()
+        self.print_plan('Поиск ингредиентов через ORM (icontains)',
+                        sql, options['analyze'], params)
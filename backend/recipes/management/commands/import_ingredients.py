@@ -1,28 +1,22 @@
-import json
-import os
-
 from django.conf import settings
-from django.core.management.base import BaseCommand
 
+from recipes.importers import ImportCommand
 from recipes.models import Ingredient
-
-
-class Command(BaseCommand):
-    help = 'Импорт ингредиентов из data/ingredients.json'
-
-    def handle(self, *args, **kwargs):
-        file_path = os.path.join(settings.BASE_DIR.parent,
-                                 'data/ingredients.json')
-
-        if not os.path.exists(file_path):
-            self.stdout.write(self.style.ERROR(f'Файл {file_path} не найден'))
-            return
-
-        with open(file_path, 'r', encoding='utf-8') as file:
-            data = json.load(file)
-            Ingredient.objects.bulk_create([
-                Ingredient(**item) for item in data
-            ])
-
-        self.stdout.write(self.style
-                          .SUCCESS('Ингредиенты успешно импортированы'))
+from recipes.search import invalidate_ingredient_index
+from recipes.versioning import cache_is_shared
+
+
+class Command(ImportCommand):
+    help = 'Импорт ингредиентов из data/ingredients.json или CSV-файла'
+    model = Ingredient
+    default_path = 'data/ingredients.json'
+    key_fields = ('name', 'measurement_unit')
+    csv_fields = ('name', 'measurement_unit')
+
+    def imported(self):
+        invalidate_ingredient_index()
+        if not cache_is_shared():
+            self.stdout.write(self.style.WARNING(
+                'Кэш не общий: запущенный сервер увидит новые ингредиенты'
+                f' не позже чем через {settings.VERSION_LOCAL_TTL} с'
+            ))
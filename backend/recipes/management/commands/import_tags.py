@@ -1,13 +1,15 @@
-import os
+from recipes.importers import ImportCommand
+from recipes.models import Tag
+from recipes.versioning import bump_version
 
-from django.conf import settings
-from django.core.management import call_command
-from django.core.management.base import BaseCommand
 
+class Command(ImportCommand):
+    help = 'Импорт тегов из data/tags.json или CSV-файла'
+    model = Tag
+    default_path = 'data/tags.json'
+    key_fields = ('slug',)
+    update_fields = ('name',)
+    csv_fields = ('name', 'slug')
 
-class Command(BaseCommand):
-    help = 'Импорт тегов из data/tags.json'
-
-    def handle(self, *args, **kwargs):
-        file_path = os.path.join(settings.BASE_DIR.parent, 'data/tags.json')
-        call_command('loaddata', file_path)
+    def imported(self):
+        bump_version('tags')
@@ -0,0 +1,40 @@
+from django.core.management.base import BaseCommand
+from django.db.models import Q
+
+from recipes.images import process_image, renditions_field
+from recipes.models import FoodgramUser, Recipe
+
+IMAGE_FIELDS = (
+    (Recipe, 'image'),
+    (FoodgramUser, 'avatar'),
+)
+
+
+class Command(BaseCommand):
+    help = ('Создание уменьшенных копий фото рецептов и аватаров,'
+            ' которых ещё нет или которые устарели')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--all', action='store_true',
+                            help='Пересоздать копии для всех изображений')
+
+    def handle(self, *args, **options):
+        for model, field_name in IMAGE_FIELDS:
+            queryset = model.objects.exclude(
+                Q(**{f'{field_name}__isnull': True}) | Q(**{field_name: ''})
+            ).only('pk', field_name, renditions_field(field_name))
+            processed = failed = 0
+            for instance in queryset.iterator():
+                renditions = getattr(instance, renditions_field(field_name))
+                source = getattr(instance, field_name).name
+                if not options['all'] and renditions.get('source') == source:
+                    continue
+                if process_image(model._meta.label, instance.pk, field_name):
+                    processed += 1
+                else:
+                    failed += 1
+            self.stdout.write(
+                f'{model._meta.verbose_name_plural}: обработано {processed},'
+                f' ошибок {failed}'
+            )
+        self.stdout.write(self.style.SUCCESS('Изображения обработаны'))
@@ -0,0 +1,19 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from recipes.counters import recount_all
+
+
+class Command(BaseCommand):
+    help = ('Пересчёт счётчиков рецептов, избранного, списков покупок'
+            ' и подписок')
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            fixed = recount_all()
+        for counter, count in fixed.items():
+            self.stdout.write(f'{counter}: исправлено {count}')
+        self.stdout.write(self.style.SUCCESS(
+            f'Счётчики пересчитаны, исправлено записей:'
+            f' {sum(fixed.values())}'
+        ))
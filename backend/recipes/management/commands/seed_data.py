@@ -0,0 +1,191 @@
+import base64
+import random
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.db.models import Max
+
+from recipes.counters import recount_all
+from recipes.importers import batched
+from recipes.models import (FavoriteRecipe, Ingredient, Recipe,
+                            RecipeIngredient, ShoppingCart, Subscription, Tag)
+
+User = get_user_model()
+
+SEED_PREFIX = 'seed'
+SEED_PASSWORD = 'seed-password'
+SEED_IMAGE = 'recipes/seed.png'
+PIXEL_PNG = base64.b64decode(
+    'iVBORw0KGgoAAAANSUhEUgAAAAEAAAABCAYAAAAfFcSJAAAADUlEQVR42mP8z8BQ'
+    'DwAEhQGAhKmMIQAAAABJRU5ErkJggg=='
+)
+RECIPE_WORDS = ('Суп', 'Салат', 'Пирог', 'Рагу', 'Каша', 'Запеканка',
+                'Омлет', 'Паста', 'Плов', 'Котлеты', 'Блины', 'Борщ')
+RECIPE_ADJECTIVES = ('домашний', 'быстрый', 'летний', 'острый', 'сытный',
+                     'овощной', 'праздничный', 'постный', 'бабушкин')
+
+
+class Command(BaseCommand):
+    help = ('Наполнение базы тестовыми пользователями, рецептами,'
+            ' избранным, списками покупок и подписками')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=100)
+        parser.add_argument('--recipes', type=int, default=1000)
+        parser.add_argument('--ingredients-per-recipe', type=int, default=8)
+        parser.add_argument('--tags-per-recipe', type=int, default=2)
+        parser.add_argument('--favorites', type=int, default=20,
+                            help='Избранных рецептов на пользователя')
+        parser.add_argument('--carts', type=int, default=5,
+                            help='Рецептов в списке покупок на пользователя')
+        parser.add_argument('--subscriptions', type=int, default=10,
+                            help='Подписок на пользователя')
+        parser.add_argument('--batch-size', type=int, default=1000)
+        parser.add_argument('--seed', type=int, default=None,
+                            help='Зерно генератора случайных чисел')
+
+    def weighted(self, population, count):
+        """Выборка без повторов с перекосом к началу списка (закон Ципфа)."""
+        count = min(count, len(population))
+        chosen = set()
+        while len(chosen) < count:
+            chosen.update(self.random.choices(
+                population, cum_weights=self.cum_weights(len(population)),
+                k=count - len(chosen)
+            ))
+        return chosen
+
+    def cum_weights(self, size):
+        if size not in self.weights:
+            weights, total = [], 0.0
+            for rank in range(size):
+                total += 1 / (rank + 1)
+                weights.append(total)
+            self.weights[size] = weights
+        return self.weights[size]
+
+    def create_users(self, count, batch_size):
+        start = User.objects.filter(
+            username__startswith=SEED_PREFIX
+        ).count()
+        password = make_password(SEED_PASSWORD)
+        last_pk = User.objects.aggregate(last=Max('pk'))['last'] or 0
+        users = (
+            User(username=f'{SEED_PREFIX}{number}',
+                 email=f'{SEED_PREFIX}{number}@example.com',
+                 first_name='Тест', last_name=f'Пользователь {number}',
+                 password=password)
+            for number in range(start, start + count)
+        )
+        for batch in batched(users, batch_size):
+            User.objects.bulk_create(batch)
+        return list(User.objects.filter(pk__gt=last_pk)
+                    .order_by('pk').values_list('pk', flat=True))
+
+    def recipe_name(self, number):
+        return (f'{self.random.choice(RECIPE_WORDS)}'
+                f' {self.random.choice(RECIPE_ADJECTIVES)} №{number}')
+
+    def create_recipes(self, authors, count, batch_size):
+        if not default_storage.exists(SEED_IMAGE):
+            default_storage.save(SEED_IMAGE, ContentFile(PIXEL_PNG))
+        last_pk = Recipe.objects.aggregate(last=Max('pk'))['last'] or 0
+        recipes = (
+            Recipe(
+                author_id=self.random.choices(
+                    authors, cum_weights=self.cum_weights(len(authors))
+                )[0],
+                name=self.recipe_name(number),
+                description='Описание тестового рецепта.',
+                cooking_time=self.random.randint(5, 120),
+                image=SEED_IMAGE,
+            )
+            for number in range(last_pk + 1, last_pk + count + 1)
+        )
+        for batch in batched(recipes, batch_size):
+            Recipe.objects.bulk_create(batch)
+        return list(Recipe.objects.filter(pk__gt=last_pk)
+                    .order_by('pk').values_list('pk', flat=True))
+
+    def create_recipe_relations(self, recipes, options):
+        ingredients = list(Ingredient.objects.values_list('pk', flat=True))
+        tags = list(Tag.objects.values_list('pk', flat=True))
+        per_recipe = min(options['ingredients_per_recipe'], len(ingredients))
+        tags_per_recipe = min(options['tags_per_recipe'], len(tags))
+        recipe_ingredients = (
+            RecipeIngredient(recipe_id=recipe, ingredient_id=ingredient,
+                             amount=self.random.randint(1, 500))
+            for recipe in recipes
+            for ingredient in self.random.sample(ingredients, per_recipe)
+        )
+        for batch in batched(recipe_ingredients, options['batch_size']):
+            RecipeIngredient.objects.bulk_create(batch)
+        RecipeTag = Recipe.tags.through
+        recipe_tags = (
+            RecipeTag(recipe_id=recipe, tag_id=tag)
+            for recipe in recipes
+            for tag in self.random.sample(tags, tags_per_recipe)
+        )
+        for batch in batched(recipe_tags, options['batch_size']):
+            RecipeTag.objects.bulk_create(batch, ignore_conflicts=True)
+
+    def create_user_relations(self, model, users, targets, per_user,
+                              batch_size, target_field='recipe_id'):
+        before = model.objects.count()
+        relations = (
+            model(user_id=user, **{target_field: target})
+            for user in users
+            for target in self.weighted(targets, per_user)
+            if target_field != 'author_id' or target != user
+        )
+        for batch in batched(relations, batch_size):
+            model.objects.bulk_create(batch, ignore_conflicts=True)
+        return model.objects.count() - before
+
+    def handle(self, *args, **options):
+        if not Ingredient.objects.exists():
+            raise CommandError('Нет ингредиентов, сначала выполните'
+                               ' import_ingredients.')
+        if not Tag.objects.exists():
+            raise CommandError('Нет тегов, сначала выполните import_tags.')
+        self.random = random.Random(options['seed'])
+        self.weights = {}
+        batch_size = options['batch_size']
+
+        with transaction.atomic():
+            users = self.create_users(options['users'], batch_size)
+            authors = users or list(
+                User.objects.values_list('pk', flat=True)
+            )
+            if not authors:
+                raise CommandError('Нет пользователей для авторства.')
+            recipes = self.create_recipes(authors, options['recipes'],
+                                          batch_size)
+            self.create_recipe_relations(recipes, options)
+            recipe_pool = recipes or list(
+                Recipe.objects.values_list('pk', flat=True)
+            )
+            favorites = self.create_user_relations(
+                FavoriteRecipe, users, recipe_pool, options['favorites'],
+                batch_size
+            )
+            carts = self.create_user_relations(
+                ShoppingCart, users, recipe_pool, options['carts'],
+                batch_size
+            )
+            subscriptions = self.create_user_relations(
+                Subscription, users, authors, options['subscriptions'],
+                batch_size, target_field='author_id'
+            )
+            recount_all()
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Создано: пользователей {len(users)}, рецептов {len(recipes)},'
+            f' избранного {favorites}, в списках покупок {carts},'
+            f' подписок {subscriptions}. Пароль пользователей:'
+            f' {SEED_PASSWORD}'
+        ))
@@ -0,0 +1,31 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from recipes.feed import sync_feeds
+
+
+class Command(BaseCommand):
+    help = ('Переключение лент подписок между хранением и сборкой при'
+            ' чтении и удаление записей сверх FEED_MAX_ENTRIES')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--interval', type=int, default=0,
+            help='Повторять каждые N секунд, пока процесс не остановят'
+        )
+
+    def handle(self, *args, **options):
+        while True:
+            started = time.monotonic()
+            enabled, disabled, trimmed = sync_feeds()
+            self.stdout.write(self.style.SUCCESS(
+                f'Ленты синхронизированы: хранение включено у {enabled},'
+                f' выключено у {disabled}, удалено записей {trimmed}'
+            ))
+            if not options['interval']:
+                return
+            close_old_connections()
+            time.sleep(max(options['interval']
+                           - (time.monotonic() - started), 0))
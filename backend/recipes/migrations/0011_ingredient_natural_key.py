@@ -0,0 +1,56 @@
+# Generated by Django 3.2.3 on 2026-10-17 04:12
+
+from django.db import migrations, models, transaction
+from django.db.models import Count, Min, Sum
+
+
+def merge_duplicate_ingredients(apps, schema_editor):
+    Ingredient = apps.get_model('recipes', 'Ingredient')
+    RecipeIngredient = apps.get_model('recipes', 'RecipeIngredient')
+    duplicates = Ingredient.objects.values(
+        'name', 'measurement_unit'
+    ).annotate(kept=Min('pk'), total=Count('pk')).filter(total__gt=1)
+    for duplicate in duplicates.iterator():
+        # Каждая группа сливается целиком или не сливается вовсе.
+        with transaction.atomic():
+            group = Ingredient.objects.filter(
+                name=duplicate['name'],
+                measurement_unit=duplicate['measurement_unit']
+            )
+            entries = RecipeIngredient.objects.filter(ingredient__in=group)
+            # Если в рецепте есть несколько копий ингредиента, количества
+            # складываются в одну строку, остальные удаляются.
+            collisions = entries.values('recipe').annotate(
+                rows=Count('pk'), amount=Sum('amount'), first=Min('pk')
+            ).filter(rows__gt=1)
+            for collision in collisions:
+                RecipeIngredient.objects.filter(pk=collision['first']).update(
+                    amount=collision['amount']
+                )
+                entries.filter(recipe=collision['recipe']).exclude(
+                    pk=collision['first']
+                ).delete()
+            entries.update(ingredient_id=duplicate['kept'])
+            group.exclude(pk=duplicate['kept']).delete()
+
+
+class Migration(migrations.Migration):
+
+    atomic = False
+
+    dependencies = [
+        ('recipes', '0010_hot_path_indexes'),
+    ]
+
+    operations = [
+        migrations.RunPython(merge_duplicate_ingredients,
+                             migrations.RunPython.noop),
+        migrations.RemoveIndex(
+            model_name='ingredient',
+            name='ingredient_name_unit_idx',
+        ),
+        migrations.AddConstraint(
+            model_name='ingredient',
+            constraint=models.UniqueConstraint(fields=('name', 'measurement_unit'), name='unique_ingredient'),
+        ),
+    ]
@@ -0,0 +1,77 @@
+# Generated by Django 3.2.3 on 2026-10-17 04:15
+
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce
+
+
+def fill_counters(apps, schema_editor):
+    User = apps.get_model('recipes', 'FoodgramUser')
+    Recipe = apps.get_model('recipes', 'Recipe')
+    counters = (
+        (User, 'recipes_count', Recipe, 'author'),
+        (User, 'followers_count',
+         apps.get_model('recipes', 'Subscription'), 'author'),
+        (User, 'following_count',
+         apps.get_model('recipes', 'Subscription'), 'user'),
+        (Recipe, 'favorites_count',
+         apps.get_model('recipes', 'FavoriteRecipe'), 'recipe'),
+        (Recipe, 'shopping_carts_count',
+         apps.get_model('recipes', 'ShoppingCart'), 'recipe'),
+        (apps.get_model('recipes', 'Tag'), 'recipes_count',
+         Recipe.tags.through, 'tag'),
+        (apps.get_model('recipes', 'Ingredient'), 'recipes_count',
+         apps.get_model('recipes', 'RecipeIngredient'), 'ingredient'),
+    )
+    for model, field, child, foreign_key in counters:
+        model.objects.update(**{field: Coalesce(Subquery(
+            child.objects.filter(**{foreign_key: OuterRef('pk')})
+            .order_by().values(foreign_key).annotate(total=Count('pk'))
+            .values('total')
+        ), Value(0))})
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0011_ingredient_natural_key'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='foodgramuser',
+            name='followers_count',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Число подписчиков'),
+        ),
+        migrations.AddField(
+            model_name='foodgramuser',
+            name='following_count',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Число подписок'),
+        ),
+        migrations.AddField(
+            model_name='foodgramuser',
+            name='recipes_count',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Число рецептов'),
+        ),
+        migrations.AddField(
+            model_name='ingredient',
+            name='recipes_count',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Число рецептов'),
+        ),
+        migrations.AddField(
+            model_name='recipe',
+            name='favorites_count',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='В избранном'),
+        ),
+        migrations.AddField(
+            model_name='recipe',
+            name='shopping_carts_count',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='В списках покупок'),
+        ),
+        migrations.AddField(
+            model_name='tag',
+            name='recipes_count',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Число рецептов'),
+        ),
+        migrations.RunPython(fill_counters, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,24 @@
+# Generated by Django 3.2.3 on 2026-10-17 06:10
+
+from django.db import migrations
+
+from recipes import fulltext
+
+
+def install_fulltext(apps, schema_editor):
+    fulltext.install(schema_editor.connection)
+
+
+def uninstall_fulltext(apps, schema_editor):
+    fulltext.uninstall(schema_editor.connection)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0013_image_renditions'),
+    ]
+
+    operations = [
+        migrations.RunPython(install_fulltext, uninstall_fulltext),
+    ]
@@ -1,7 +1,11 @@
 from django.conf import settings
 from django.contrib.auth.models import AbstractUser
+from django.core.exceptions import EmptyResultSet
 from django.core.validators import MinValueValidator
 from django.db import models
+from django.db.models.expressions import RawSQL, Window
+from django.db.models.functions import RowNumber
+from django.utils import timezone
 
 from . import constants
 from . import validators
@@ -36,6 +40,32 @@ class FoodgramUser(AbstractUser):
         upload_to='avatars/',
         verbose_name='Аватар'
     )
+    avatar_renditions = models.JSONField(
+        default=dict,
+        blank=True,
+        editable=False,
+        verbose_name='Уменьшенные копии аватара'
+    )
+    recipes_count = models.PositiveIntegerField(
+        default=0,
+        editable=False,
+        verbose_name='Число рецептов'
+    )
+    followers_count = models.PositiveIntegerField(
+        default=0,
+        editable=False,
+        verbose_name='Число подписчиков'
+    )
+    following_count = models.PositiveIntegerField(
+        default=0,
+        editable=False,
+        verbose_name='Число подписок'
+    )
+    feed_materialized = models.BooleanField(
+        default=False,
+        editable=False,
+        verbose_name='Лента хранится в таблице'
+    )
 
     class Meta(AbstractUser.Meta):
         verbose_name = 'Пользователь'
@@ -69,6 +99,10 @@ class Subscription(models.Model):
                 name='unique_subscription'
             )
         ]
+        indexes = [
+            models.Index(fields=['author', 'user'],
+                         name='subscription_author_user_idx'),
+        ]
 
     def __str__(self):
         return f'{self.user} подписан на {self.author}'
@@ -83,9 +117,20 @@ class Ingredient(models.Model):
         max_length=64,
         verbose_name='Единица измерения',
     )
+    recipes_count = models.PositiveIntegerField(
+        default=0,
+        editable=False,
+        verbose_name='Число рецептов'
+    )
 
     class Meta:
         ordering = ('name',)
+        constraints = [
+            models.UniqueConstraint(
+                fields=['name', 'measurement_unit'],
+                name='unique_ingredient'
+            )
+        ]
         verbose_name = 'Ингредиент'
         verbose_name_plural = 'Ингредиенты'
 
@@ -103,6 +148,11 @@ class Tag(models.Model):
         unique=True,
         verbose_name='Ярлык'
     )
+    recipes_count = models.PositiveIntegerField(
+        default=0,
+        editable=False,
+        verbose_name='Число рецептов'
+    )
 
     class Meta:
         ordering = ('name',)
@@ -113,6 +163,64 @@ class Tag(models.Model):
         return self.name
 
 
+class RecipeQuerySet(models.QuerySet):
+
+    USER_FLAGS = ('is_favorited', 'is_in_shopping_cart',
+                  'author_is_subscribed')
+
+    def with_user_flags(self, user, flags=USER_FLAGS):
+        if not user.is_authenticated:
+            return self.annotate(**{
+                flag: models.Value(False, output_field=models.BooleanField())
+                for flag in flags
+            })
+        subqueries = {
+            'is_favorited': FavoriteRecipe.objects.filter(
+                user=user, recipe=models.OuterRef('pk')
+            ),
+            'is_in_shopping_cart': ShoppingCart.objects.filter(
+                user=user, recipe=models.OuterRef('pk')
+            ),
+            'author_is_subscribed': Subscription.objects.filter(
+                user=user, author=models.OuterRef('author')
+            ),
+        }
+        return self.annotate(**{
+            flag: models.Exists(subqueries[flag]) for flag in flags
+        })
+
+    def limited_per_author(self, limit):
+        ranked = self.annotate(row_number=Window(
+            RowNumber(),
+            partition_by=models.F('author_id'),
+            order_by=(models.F('name').asc(), models.F('id').asc())
+        )).values('id', 'row_number')
+        try:
+            sql, params = ranked.query.sql_with_params()
+        except EmptyResultSet:
+            # Например, author_id__in=[] — нумеровать нечего.
+            return self.none()
+        return self.filter(pk__in=RawSQL(
+            f'SELECT id FROM ({sql}) ranked WHERE row_number <= %s',
+            (*params, limit)
+        ))
+
+    def with_related(self, author=True, tags=True, ingredients=True):
+        queryset = self
+        if author:
+            queryset = queryset.select_related('author')
+        if tags:
+            queryset = queryset.prefetch_related('tags')
+        if ingredients:
+            queryset = queryset.prefetch_related(models.Prefetch(
+                'recipe_ingredients',
+                queryset=RecipeIngredient.objects.select_related(
+                    'ingredient'
+                ).order_by('id')
+            ))
+        return queryset
+
+
 class Recipe(models.Model):
     author = models.ForeignKey(
         settings.AUTH_USER_MODEL,
@@ -128,6 +236,12 @@ class Recipe(models.Model):
         upload_to='recipes/',
         verbose_name='Фото блюда'
     )
+    image_renditions = models.JSONField(
+        default=dict,
+        blank=True,
+        editable=False,
+        verbose_name='Уменьшенные копии фото'
+    )
     description = models.TextField(
         verbose_name='Описание',
     )
@@ -146,9 +260,37 @@ class Recipe(models.Model):
         verbose_name='Время (мин)',
         validators=[MinValueValidator(constants.MIN_COOKING_TIME)]
     )
+    favorites_count = models.PositiveIntegerField(
+        default=0,
+        editable=False,
+        verbose_name='В избранном'
+    )
+    shopping_carts_count = models.PositiveIntegerField(
+        default=0,
+        editable=False,
+        verbose_name='В списках покупок'
+    )
+    created_at = models.DateTimeField(
+        default=timezone.now,
+        editable=False,
+        verbose_name='Дата публикации'
+    )
+
+    objects = RecipeQuerySet.as_manager()
 
     class Meta:
         ordering = ('name',)
+        indexes = [
+            models.Index(fields=['name', 'id'], name='recipe_name_id_idx'),
+            models.Index(fields=['cooking_time', 'id'],
+                         name='recipe_cooking_time_id_idx'),
+            models.Index(fields=['author', 'name', 'id'],
+                         name='recipe_author_name_id_idx'),
+            models.Index(fields=['author', '-created_at', '-id'],
+                         name='recipe_author_created_idx'),
+            models.Index(fields=['-created_at', '-id'],
+                         name='recipe_created_idx'),
+        ]
         verbose_name = 'Рецепт'
         verbose_name_plural = 'Рецепты'
 
@@ -176,6 +318,10 @@ class RecipeIngredient(models.Model):
 
     class Meta:
         ordering = ('recipe__name',)
+        indexes = [
+            models.Index(fields=['ingredient', 'recipe'],
+                         name='recipeingredient_ingr_rec_idx'),
+        ]
         verbose_name = 'Ингредиент рецепта'
         verbose_name_plural = 'Ингредиенты рецепта'
 
@@ -194,6 +340,11 @@ class UserRecipeRelation(models.Model):
         on_delete=models.CASCADE,
         verbose_name='Рецепт'
     )
+    created_at = models.DateTimeField(
+        default=timezone.now,
+        editable=False,
+        verbose_name='Дата добавления'
+    )
 
     class Meta:
         abstract = True
@@ -204,6 +355,10 @@ class UserRecipeRelation(models.Model):
                 name='%(class)s_unique_user_recipe'
             )
         ]
+        indexes = [
+            models.Index(fields=['recipe', 'user'],
+                         name='%(class)s_recipe_user_idx'),
+        ]
 
     def __str__(self):
         return (f'{self.user} добавил рецепт "{self.recipe}" в'
@@ -220,3 +375,82 @@ class ShoppingCart(UserRecipeRelation):
     class Meta(UserRecipeRelation.Meta):
         verbose_name = 'Список покупок'
         verbose_name_plural = 'Списки покупок'
+
+
+class FeedEntry(models.Model):
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        related_name='feed_entries',
+        verbose_name='Подписчик'
+    )
+    recipe = models.ForeignKey(
+        Recipe,
+        on_delete=models.CASCADE,
+        related_name='feed_entries',
+        verbose_name='Рецепт'
+    )
+    created_at = models.DateTimeField(verbose_name='Дата публикации')
+
+    class Meta:
+        verbose_name = 'Запись ленты'
+        verbose_name_plural = 'Записи лент'
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'recipe'],
+                                    name='unique_feed_entry')
+        ]
+        indexes = [
+            models.Index(fields=['user', '-created_at', '-recipe'],
+                         name='feedentry_user_created_idx'),
+        ]
+
+    def __str__(self):
+        return f'{self.recipe} в ленте {self.user}'
+
+
+class SimilarRecipe(models.Model):
+    recipe = models.ForeignKey(
+        Recipe,
+        on_delete=models.CASCADE,
+        related_name='similar_recipes',
+        verbose_name='Рецепт'
+    )
+    similar = models.ForeignKey(
+        Recipe,
+        on_delete=models.CASCADE,
+        related_name='+',
+        verbose_name='Похожий рецепт'
+    )
+    position = models.PositiveSmallIntegerField(verbose_name='Место')
+    score = models.FloatField(verbose_name='Сходство')
+
+    class Meta:
+        verbose_name = 'Похожий рецепт'
+        verbose_name_plural = 'Похожие рецепты'
+        constraints = [
+            models.UniqueConstraint(fields=['recipe', 'position'],
+                                    name='unique_similar_position')
+        ]
+
+    def __str__(self):
+        return f'{self.similar} похож на {self.recipe}'
+
+
+class PopularRecipe(models.Model):
+    recipe = models.OneToOneField(
+        Recipe,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='popularity',
+        verbose_name='Рецепт'
+    )
+    position = models.PositiveIntegerField(unique=True,
+                                           verbose_name='Место')
+    score = models.FloatField(verbose_name='Популярность')
+
+    class Meta:
+        verbose_name = 'Популярный рецепт'
+        verbose_name_plural = 'Популярные рецепты'
+
+    def __str__(self):
+        return f'{self.position + 1}. {self.recipe}'
@@ -0,0 +1,158 @@
+import heapq
+import threading
+from array import array
+from bisect import bisect_left, insort
+from collections import Counter, OrderedDict
+from itertools import chain, compress, repeat
+from operator import le, neg, sub
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+
+from .models import RecipeIngredient
+from .versioning import bump_version, get_version
+
+CHANGE_KEY = 'pantry:change:{}'
+
+
+def record_recipe_change(recipe_id):
+    # Каждое изменение получает номер версии 'pantry', поэтому процессы
+    # догоняют друг друга, перечитывая только изменённые рецепты.
+    def record():
+        version = bump_version('pantry')
+        cache.set(CHANGE_KEY.format(version), recipe_id,
+                  settings.PANTRY_CHANGE_TTL)
+
+    transaction.on_commit(record)
+
+
+def load_recipes(recipe_ids=None):
+    rows = RecipeIngredient.objects.order_by()
+    if recipe_ids is not None:
+        rows = rows.filter(recipe_id__in=recipe_ids)
+    recipes = {}
+    for recipe_id, ingredient_id in rows.values_list(
+            'recipe_id', 'ingredient_id').iterator():
+        recipes.setdefault(recipe_id, set()).add(ingredient_id)
+    return recipes
+
+
+class RankedRecipes:
+    """Ленивый список результатов: сортирует только запрошенную страницу."""
+
+    def __init__(self, recipe_ids, matched, missing):
+        self.recipe_ids = recipe_ids
+        self.matched = matched
+        self.missing = missing
+
+    def __len__(self):
+        return len(self.recipe_ids)
+
+    def __getitem__(self, page):
+        start, stop, _ = page.indices(len(self.recipe_ids))
+        ranked = heapq.nsmallest(stop, zip(
+            self.missing, map(neg, self.matched), self.recipe_ids
+        ))
+        return [(recipe_id, -matched, missing)
+                for missing, matched, recipe_id in ranked[start:]]
+
+
+class PantryIndex:
+    """Обратный индекс «ингредиент → отсортированные id рецептов»."""
+
+    def __init__(self, max_changes, max_results):
+        self.max_changes = max_changes
+        self.max_results = max_results
+        self._lock = threading.Lock()
+        self._version = None
+        self._postings = {}
+        self._recipes = {}
+        self._results = OrderedDict()
+
+    def build(self):
+        postings, recipes = {}, {}
+        for recipe_id, ingredient_ids in load_recipes().items():
+            recipes[recipe_id] = array('I', sorted(ingredient_ids))
+            for ingredient_id in ingredient_ids:
+                postings.setdefault(ingredient_id, []).append(recipe_id)
+        self._postings = {ingredient_id: array('I', sorted(recipe_ids))
+                          for ingredient_id, recipe_ids in postings.items()}
+        self._recipes = recipes
+
+    def update(self, recipe_ids):
+        fresh = load_recipes(recipe_ids)
+        for recipe_id in recipe_ids:
+            for ingredient_id in self._recipes.pop(recipe_id, ()):
+                posting = self._postings[ingredient_id]
+                position = bisect_left(posting, recipe_id)
+                if (position < len(posting)
+                        and posting[position] == recipe_id):
+                    del posting[position]
+            ingredient_ids = fresh.get(recipe_id)
+            if not ingredient_ids:
+                continue
+            self._recipes[recipe_id] = array('I', sorted(ingredient_ids))
+            for ingredient_id in ingredient_ids:
+                insort(self._postings.setdefault(ingredient_id, array('I')),
+                       recipe_id)
+
+    def ensure_fresh(self):
+        version = get_version('pantry')
+        if self._version == version:
+            return
+        with self._lock:
+            if self._version == version:
+                return
+            if (self._version is None
+                    or not 0 < version - self._version <= self.max_changes):
+                self.build()
+            else:
+                keys = [CHANGE_KEY.format(number) for number in
+                        range(self._version + 1, version + 1)]
+                changes = cache.get_many(keys)
+                if len(changes) < len(keys):
+                    self.build()
+                else:
+                    self.update(set(changes.values()))
+            self._version = version
+            self._results.clear()
+
+    def rank(self, ingredient_ids, max_missing):
+        matched = Counter(chain.from_iterable(
+            self._postings.get(ingredient_id, ())
+            for ingredient_id in ingredient_ids
+        ))
+        recipe_ids = list(matched)
+        counts = list(matched.values())
+        missing = list(map(sub, map(len, map(self._recipes.__getitem__,
+                                             recipe_ids)), counts))
+        if max_missing is not None:
+            selected = list(map(le, missing, repeat(max_missing)))
+            recipe_ids, counts, missing = (
+                list(compress(values, selected))
+                for values in (recipe_ids, counts, missing)
+            )
+        return RankedRecipes(recipe_ids, counts, missing)
+
+    def search(self, ingredient_ids, max_missing=None):
+        """Рецепты, где есть хотя бы один из ингредиентов.
+
+        Элементы — (id рецепта, найдено, не хватает): сначала рецепты,
+        которые можно приготовить целиком, затем по числу недостающих.
+        """
+        self.ensure_fresh()
+        key = (frozenset(ingredient_ids), max_missing)
+        with self._lock:
+            ranked = self._results.get(key)
+            if ranked is None:
+                ranked = self.rank(key[0], max_missing)
+                self._results[key] = ranked
+            self._results.move_to_end(key)
+            while len(self._results) > self.max_results:
+                self._results.popitem(last=False)
+        return ranked
+
+
+pantry_index = PantryIndex(settings.PANTRY_MAX_CHANGES,
+                           settings.PANTRY_RESULTS_CACHE_SIZE)
@@ -0,0 +1,150 @@
+import numpy as np
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+from scipy import sparse
+
+from .models import (FavoriteRecipe, PopularRecipe, Recipe, RecipeIngredient,
+                     ShoppingCart, SimilarRecipe)
+
+# Признаки из большей доли рецептов — соль, вода, пользователи, добавившие
+# в избранное почти всё, — почти ничего не говорят о сходстве, а их
+# рецепты дали бы плотный блок пар в произведении матриц.
+COMMON_FEATURE_SHARE = 0.2
+
+
+def load_pairs(queryset, item, feature):
+    pairs = np.array(queryset.order_by().values_list(item, feature),
+                     dtype=np.int64)
+    return pairs.reshape(-1, 2)
+
+
+def incidence(pairs, item_ids):
+    """Разреженная матрица «рецепт × признак» из пар (id рецепта, признак)."""
+    features, columns = np.unique(pairs[:, 1], return_inverse=True)
+    return sparse.csr_matrix(
+        (np.ones(len(pairs)), (np.searchsorted(item_ids, pairs[:, 0]),
+                               columns)),
+        shape=(len(item_ids), len(features))
+    )
+
+
+def cosine(matrix, max_share=None):
+    """Косинусы строк матрицы с весом признаков idf."""
+    counts = np.asarray(matrix.sum(axis=0)).ravel()
+    total = np.count_nonzero(matrix.getnnz(axis=1))
+    weights = np.log1p(total / np.maximum(counts, 1))
+    if max_share is not None:
+        weights[counts > max(max_share * total, 2)] = 0
+    weighted = matrix @ sparse.diags(weights)
+    norms = np.sqrt(np.asarray(weighted.multiply(weighted).sum(axis=1)))
+    normalized = sparse.diags(
+        np.divide(1, norms.ravel(), out=np.zeros(len(norms)),
+                  where=norms.ravel() > 0)
+    ) @ weighted
+    return (normalized @ normalized.T).tocsr()
+
+
+def top_rows(matrix, item_ids, limit):
+    matrix = (matrix - sparse.diags(matrix.diagonal())).tocsr()
+    matrix.eliminate_zeros()
+    ranked = {}
+    for row in range(matrix.shape[0]):
+        start, stop = matrix.indptr[row], matrix.indptr[row + 1]
+        if start == stop:
+            continue
+        others = item_ids[matrix.indices[start:stop]]
+        scores = matrix.data[start:stop]
+        # По убыванию сходства, при равенстве — по id.
+        order = np.lexsort((others, -scores))[:limit]
+        ranked[int(item_ids[row])] = list(zip(others[order].tolist(),
+                                              scores[order].tolist()))
+    return ranked
+
+
+def compute_similar(limit, ingredient_weight):
+    """{id рецепта: [(id похожего, сходство), ...]} по убыванию сходства.
+
+    Сходство — взвешенная сумма косинусов по совместному добавлению в
+    избранное и по общим ингредиентам.
+    """
+    favorites = load_pairs(FavoriteRecipe.objects.all(),
+                           'recipe_id', 'user_id')
+    ingredients = load_pairs(RecipeIngredient.objects.all(),
+                             'recipe_id', 'ingredient_id')
+    item_ids = np.union1d(favorites[:, 0], ingredients[:, 0])
+    if not len(item_ids):
+        return {}
+    similarity = (
+        (1 - ingredient_weight)
+        * cosine(incidence(favorites, item_ids), COMMON_FEATURE_SHARE)
+        + ingredient_weight
+        * cosine(incidence(ingredients, item_ids), COMMON_FEATURE_SHARE)
+    )
+    return top_rows(similarity, item_ids, limit)
+
+
+def load_events(model, now):
+    rows = model.objects.order_by().values_list('recipe_id', 'created_at')
+    recipe_ids, ages = [], []
+    for recipe_id, created_at in rows.iterator():
+        recipe_ids.append(recipe_id)
+        ages.append((now - created_at).total_seconds())
+    return (np.array(recipe_ids, dtype=np.int64),
+            np.maximum(np.array(ages, dtype=float), 0))
+
+
+def compute_popular(limit, half_life_days, cart_weight, now=None):
+    """[(id рецепта, популярность), ...] по убыванию популярности.
+
+    Каждое добавление в избранное или список покупок теряет половину веса
+    за half_life_days дней.
+    """
+    now = now or timezone.now()
+    recipe_ids, scores = [], []
+    for model, weight in ((FavoriteRecipe, 1.0), (ShoppingCart, cart_weight)):
+        ids, ages = load_events(model, now)
+        recipe_ids.append(ids)
+        scores.append(weight * 0.5 ** (ages / (half_life_days * 86400)))
+    item_ids, index = np.unique(np.concatenate(recipe_ids),
+                                return_inverse=True)
+    totals = np.bincount(index, weights=np.concatenate(scores),
+                         minlength=len(item_ids))
+    order = np.lexsort((item_ids, -totals))[:limit]
+    return list(zip(item_ids[order].tolist(), totals[order].tolist()))
+
+
+def similar_rows(similar, existing):
+    for recipe_id, ranked in similar.items():
+        if recipe_id not in existing:
+            continue
+        ranked = (item for item in ranked if item[0] in existing)
+        for position, (similar_id, score) in enumerate(ranked):
+            yield SimilarRecipe(recipe_id=recipe_id, similar_id=similar_id,
+                                position=position, score=score)
+
+
+@transaction.atomic
+def store_rankings(similar, popular):
+    # Рецепты могли удалить, пока шёл расчёт.
+    existing = set(Recipe.objects.values_list('pk', flat=True))
+    SimilarRecipe.objects.all().delete()
+    SimilarRecipe.objects.bulk_create(similar_rows(similar, existing),
+                                      batch_size=1000)
+    PopularRecipe.objects.all().delete()
+    popular = (item for item in popular if item[0] in existing)
+    PopularRecipe.objects.bulk_create(
+        (PopularRecipe(recipe_id=recipe_id, position=position, score=score)
+         for position, (recipe_id, score) in enumerate(popular)),
+        batch_size=1000
+    )
+
+
+def update_rankings():
+    similar = compute_similar(settings.SIMILAR_RECIPES_LIMIT,
+                              settings.SIMILAR_INGREDIENT_WEIGHT)
+    popular = compute_popular(settings.POPULAR_RECIPES_LIMIT,
+                              settings.POPULAR_HALF_LIFE_DAYS,
+                              settings.POPULAR_CART_WEIGHT)
+    store_rankings(similar, popular)
+    return len(similar), len(popular)
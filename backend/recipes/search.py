@@ -0,0 +1,93 @@
+import threading
+from bisect import bisect_left
+
+from .models import Ingredient
+from .versioning import bump_version, get_version
+
+TRIGRAM_LENGTH = 3
+
+
+def normalize(text):
+    return ' '.join(text.casefold().split())
+
+
+def trigrams(text):
+    return {text[i:i + TRIGRAM_LENGTH]
+            for i in range(len(text) - TRIGRAM_LENGTH + 1)}
+
+
+def invalidate_ingredient_index():
+    bump_version('ingredients')
+
+
+class IngredientIndex:
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._version = None
+        self._names = []
+        self._items = []
+        self._trigrams = {}
+
+    def build(self):
+        names, items, index = [], [], {}
+        ingredients = Ingredient.objects.values_list(
+            'id', 'name', 'measurement_unit'
+        )
+        for position, (pk, name, unit) in enumerate(
+                sorted(ingredients, key=lambda row: (normalize(row[1]),
+                                                     row[0]))):
+            normalized = normalize(name)
+            names.append(normalized)
+            items.append({'id': pk, 'name': name,
+                          'measurement_unit': unit})
+            for trigram in trigrams(normalized):
+                index.setdefault(trigram, []).append(position)
+        self._names, self._items, self._trigrams = names, items, index
+
+    def ensure_fresh(self):
+        version = get_version('ingredients')
+        if self._version == version:
+            return
+        with self._lock:
+            if self._version != version:
+                self.build()
+                self._version = version
+
+    def prefix_positions(self, query):
+        start = bisect_left(self._names, query)
+        end = start
+        while end < len(self._names) and self._names[end].startswith(query):
+            end += 1
+        return range(start, end)
+
+    def substring_positions(self, query):
+        if len(query) < TRIGRAM_LENGTH:
+            candidates = range(len(self._names))
+        else:
+            postings = sorted(
+                (self._trigrams.get(trigram, ()) for trigram in
+                 trigrams(query)),
+                key=len
+            )
+            candidates = set(postings[0]).intersection(*postings[1:])
+            candidates = sorted(candidates)
+        return [position for position in candidates
+                if query in self._names[position]]
+
+    def search(self, query, limit=None):
+        self.ensure_fresh()
+        query = normalize(query)
+        if not query:
+            return self._items[:limit]
+        prefix = self.prefix_positions(query)
+        positions = list(prefix)
+        if limit is None or len(positions) < limit:
+            positions.extend(
+                position for position in self.substring_positions(query)
+                if position not in prefix
+            )
+        return [self._items[position] for position in positions[:limit]]
+
+
+ingredient_index = IngredientIndex()
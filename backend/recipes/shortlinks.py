@@ -0,0 +1,94 @@
+import string
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+
+from .models import Recipe
+from .versioning import bump_version, get_version
+
+# Первый символ кода — всегда буква, поэтому коды не пересекаются со
+# старыми ссылками вида /s/<id>/.
+LEADING_ALPHABET = string.ascii_letters
+ALPHABET = LEADING_ALPHABET + string.digits
+CODE_PATTERN = f'[{LEADING_ALPHABET}][{ALPHABET}]*'
+INDEX = {char: index for index, char in enumerate(ALPHABET)}
+
+
+def encode(pk):
+    digits = []
+    while pk >= len(LEADING_ALPHABET):
+        pk, digit = divmod(pk, len(ALPHABET))
+        digits.append(ALPHABET[digit])
+    digits.append(LEADING_ALPHABET[pk])
+    return ''.join(reversed(digits))
+
+
+def decode(code):
+    if not code or code[0] not in LEADING_ALPHABET:
+        raise ValueError(code)
+    pk = INDEX[code[0]]
+    for char in code[1:]:
+        pk = pk * len(ALPHABET) + INDEX[char]
+    if encode(pk) != code:
+        raise ValueError(code)
+    return pk
+
+
+MISSING_VERSION = 'short_links:missing'
+
+
+def recipe_version(pk):
+    return f'short_link:{pk}'
+
+
+def invalidate_short_links(pk, created):
+    # Новый рецепт делает неверными только закэшированные промахи, а
+    # удалённый — только запись о своём id.
+    bump_version(MISSING_VERSION if created else recipe_version(pk))
+
+
+class ShortLinkResolver:
+
+    def __init__(self, max_size, ttl, negative_ttl):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def exists(self, pk):
+        with self._lock:
+            entry = self._entries.get(pk)
+        if entry is not None:
+            found, entry_version, expires_at = entry
+            version = get_version(recipe_version(pk) if found
+                                  else MISSING_VERSION)
+            if entry_version == version and expires_at >= time.monotonic():
+                with self._lock:
+                    if pk in self._entries:
+                        self._entries.move_to_end(pk)
+                return found
+        # Версии читаются до запроса к базе, чтобы изменение во время
+        # запроса не закэшировалось под новой версией.
+        versions = (get_version(recipe_version(pk)),
+                    get_version(MISSING_VERSION))
+        found = Recipe.objects.filter(pk=pk).exists()
+        version = versions[0] if found else versions[1]
+        ttl = self.ttl if found else self.negative_ttl
+        with self._lock:
+            self._entries[pk] = (found, version, time.monotonic() + ttl)
+            self._entries.move_to_end(pk)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+        return found
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+short_link_resolver = ShortLinkResolver(settings.SHORT_LINK_CACHE_SIZE,
+                                        settings.SHORT_LINK_CACHE_TTL,
+                                        settings.SHORT_LINK_NEGATIVE_TTL)
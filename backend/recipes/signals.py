@@ -0,0 +1,152 @@
+from django.db import connections
+from django.db.migrations.recorder import MigrationRecorder
+from django.db.models.signals import (m2m_changed, post_delete, post_migrate,
+                                      post_save, pre_delete)
+from django.dispatch import receiver
+
+from . import feed, fulltext
+from .counters import COUNTERS, RecipeTag, change_counter
+from .images import schedule_processing
+from .invalidation import invalidate_recipes, invalidate_related
+from .models import (FoodgramUser, Ingredient, Recipe, RecipeIngredient,
+                     Subscription, Tag)
+from .pantry import record_recipe_change
+from .search import invalidate_ingredient_index
+from .shortlinks import invalidate_short_links
+from .versioning import bump_version
+
+
+@receiver((post_save, post_delete), sender=Ingredient)
+def ingredient_changed(**kwargs):
+    invalidate_ingredient_index()
+
+
+@receiver((post_save, post_delete), sender=Tag)
+def tag_changed(**kwargs):
+    bump_version('tags')
+
+
+def connect_counter(model, field, child, foreign_key):
+    attname = child._meta.get_field(foreign_key).attname
+
+    def row_saved(instance, created, raw=False, **kwargs):
+        if created and not raw:
+            change_counter(model, field, [getattr(instance, attname)])
+
+    def row_deleted(instance, **kwargs):
+        change_counter(model, field, [getattr(instance, attname)], -1)
+
+    uid = f'{model._meta.label}.{field}'
+    post_save.connect(row_saved, sender=child, weak=False,
+                      dispatch_uid=f'{uid}:saved')
+    post_delete.connect(row_deleted, sender=child, weak=False,
+                        dispatch_uid=f'{uid}:deleted')
+
+
+for model, field, child, foreign_key in COUNTERS:
+    if not child._meta.auto_created:
+        connect_counter(model, field, child, foreign_key)
+
+
+@receiver((post_save, post_delete), sender=Recipe)
+def recipe_changed(signal, instance, created=False, **kwargs):
+    bump_version('recipes')
+    invalidate_recipes([instance.pk])
+    if created or signal is post_delete:
+        invalidate_short_links(instance.pk, created)
+
+
+@receiver((post_save, post_delete), sender=Recipe)
+def recipe_ingredients_changed(instance, **kwargs):
+    record_recipe_change(instance.pk)
+
+
+@receiver((post_save, post_delete), sender=RecipeIngredient)
+def recipe_ingredient_changed(instance, **kwargs):
+    record_recipe_change(instance.recipe_id)
+    invalidate_recipes([instance.recipe_id])
+
+
+@receiver((post_save, pre_delete), sender=Tag)
+@receiver((post_save, pre_delete), sender=Ingredient)
+@receiver(post_save, sender=FoodgramUser)
+def shown_in_recipes_changed(sender, instance, created=False,
+                             update_fields=None, **kwargs):
+    # Новый объект ещё не показан ни в одном рецепте, а вход пользователя
+    # меняет только last_login, которого нет в ответах.
+    if created or update_fields and set(update_fields) <= {'last_login'}:
+        return
+    invalidate_related(sender._meta.label, instance.pk)
+
+
+@receiver(post_save, sender=Recipe)
+def recipe_saved(instance, created, raw=False, **kwargs):
+    if not raw:
+        schedule_processing(instance, 'image')
+    if created:
+        feed.recipe_published(instance)
+
+
+@receiver(post_save, sender=Subscription)
+def subscription_saved(instance, created, **kwargs):
+    if created:
+        feed.subscribed(instance)
+
+
+@receiver(post_delete, sender=Subscription)
+def subscription_deleted(instance, **kwargs):
+    feed.unsubscribed(instance)
+
+
+@receiver(post_save, sender=FoodgramUser)
+def user_saved(instance, raw=False, **kwargs):
+    if not raw:
+        schedule_processing(instance, 'avatar')
+
+
+@receiver(m2m_changed, sender=RecipeTag)
+def recipe_tags_changed(instance, action, reverse, pk_set, **kwargs):
+    if action == 'post_add':
+        tag_ids = [instance.pk] * len(pk_set) if reverse else pk_set
+        change_counter(Tag, 'recipes_count', tag_ids)
+    elif action in ('pre_remove', 'pre_clear'):
+        links = RecipeTag.objects.filter(
+            **{'tag' if reverse else 'recipe': instance}
+        )
+        if action == 'pre_remove':
+            links = links.filter(
+                **{'recipe__in' if reverse else 'tag__in': pk_set}
+            )
+        change_counter(Tag, 'recipes_count',
+                       list(links.values_list('tag_id', flat=True)), -1)
+
+
+@receiver(m2m_changed, sender=RecipeTag)
+def recipe_tags_relinked(instance, action, reverse, pk_set, **kwargs):
+    if not reverse:
+        if action.startswith('post_'):
+            invalidate_recipes([instance.pk])
+    elif action in ('post_add', 'post_remove'):
+        invalidate_recipes(pk_set)
+    elif action == 'pre_clear':
+        invalidate_related(Tag._meta.label, instance.pk)
+
+
+@receiver(pre_delete, sender=Recipe)
+def recipe_deleted(instance, **kwargs):
+    change_counter(Tag, 'recipes_count', list(
+        RecipeTag.objects.filter(recipe=instance)
+        .values_list('tag_id', flat=True)
+    ), -1)
+
+
+@receiver(post_migrate)
+def fulltext_repaired(sender, using, **kwargs):
+    # Миграции SQLite пересоздают таблицу рецептов вместе с триггерами
+    # полнотекстового индекса; install() восстанавливает недостающие.
+    if sender.name != 'recipes':
+        return
+    connection = connections[using]
+    applied = MigrationRecorder(connection).applied_migrations()
+    if ('recipes', '0014_recipe_fulltext') in applied:
+        fulltext.install(connection)
@@ -0,0 +1,108 @@
+"""Стеммер Snowball для русского языка.
+
+Нужен там, где база не умеет русскую морфологию сама (SQLite FTS5):
+слова запроса приводятся к основе так же, как это делает словарь
+russian в PostgreSQL.
+"""
+VOWELS = 'аеиоуыэюя'
+
+PERFECTIVE_GERUND = (
+    ('в', 'вши', 'вшись'),
+    ('ив', 'ивши', 'ившись', 'ыв', 'ывши', 'ывшись'),
+)
+REFLEXIVE = ('ся', 'сь')
+ADJECTIVE = (
+    'ее', 'ие', 'ые', 'ое', 'ими', 'ыми', 'ей', 'ий', 'ый', 'ой', 'ем',
+    'им', 'ым', 'ом', 'его', 'ого', 'ему', 'ому', 'их', 'ых', 'ую', 'юю',
+    'ая', 'яя', 'ою', 'ею',
+)
+PARTICIPLE = (
+    ('ем', 'нн', 'вш', 'ющ', 'щ'),
+    ('ивш', 'ывш', 'ующ'),
+)
+VERB = (
+    ('ла', 'на', 'ете', 'йте', 'ли', 'й', 'л', 'ем', 'н', 'ло', 'но', 'ет',
+     'ют', 'ны', 'ть', 'ешь', 'нно'),
+    ('ила', 'ыла', 'ена', 'ейте', 'уйте', 'ите', 'или', 'ыли', 'ей', 'уй',
+     'ил', 'ыл', 'им', 'ым', 'ен', 'ило', 'ыло', 'ено', 'ят', 'ует', 'уют',
+     'ит', 'ыт', 'ены', 'ить', 'ыть', 'ишь', 'ую', 'ю'),
+)
+NOUN = (
+    'а', 'ев', 'ов', 'ие', 'ье', 'е', 'иями', 'ями', 'ами', 'еи', 'ии', 'и',
+    'ией', 'ей', 'ой', 'ий', 'й', 'иям', 'ям', 'ием', 'ем', 'ам', 'ом', 'о',
+    'у', 'ах', 'иях', 'ях', 'ы', 'ь', 'ию', 'ью', 'ю', 'ия', 'ья', 'я',
+)
+SUPERLATIVE = ('ейше', 'ейш')
+DERIVATIONAL = ('ость', 'ост')
+
+
+def region(word, start=0):
+    for position in range(start + 1, len(word)):
+        if word[position] not in VOWELS and word[position - 1] in VOWELS:
+            return position + 1
+    return len(word)
+
+
+def strip_suffix(word, start, suffixes, preceded_by=None):
+    """Снимает самое длинное окончание, целиком лежащее в word[start:].
+
+    Как и among в Snowball, более короткие окончания не пробуются, если
+    самое длинное не подошло по предыдущей букве.
+    """
+    for suffix in sorted(suffixes, key=len, reverse=True):
+        if word.endswith(suffix) and len(word) - len(suffix) >= start:
+            stem = word[:-len(suffix)]
+            if preceded_by is None or stem[-1:] in preceded_by:
+                return stem
+            return None
+    return None
+
+
+def strip_grouped(word, start, groups):
+    """Окончания группы 1 снимаются только после а/я, группы 2 — всегда."""
+    first, second = groups
+    suffix = next((suffix for suffix in sorted(first + second, key=len,
+                                               reverse=True)
+                   if word.endswith(suffix)
+                   and len(word) - len(suffix) >= start), None)
+    if suffix is None:
+        return None
+    if suffix in second:
+        return word[:-len(suffix)]
+    return strip_suffix(word, start, (suffix,), 'ая')
+
+
+def strip_adjectival(word, start):
+    stem = strip_suffix(word, start, ADJECTIVE)
+    if stem is None:
+        return None
+    return strip_grouped(stem, start, PARTICIPLE) or stem
+
+
+def stem(word):
+    word = word.lower().replace('ё', 'е')
+    rv = next((position + 1 for position, char in enumerate(word)
+               if char in VOWELS), len(word))
+    r2 = region(word, region(word))
+
+    stemmed = strip_grouped(word, rv, PERFECTIVE_GERUND)
+    if stemmed is None:
+        word = strip_suffix(word, rv, REFLEXIVE) or word
+        stemmed = (strip_adjectival(word, rv)
+                   or strip_grouped(word, rv, VERB)
+                   or strip_suffix(word, rv, NOUN))
+    word = stemmed if stemmed is not None else word
+
+    if word.endswith('и') and len(word) - 1 >= rv:
+        word = word[:-1]
+    word = strip_suffix(word, r2, DERIVATIONAL) or word
+
+    if word.endswith('нн') and len(word) - 2 >= rv:
+        return word[:-1]
+    superlative = strip_suffix(word, rv, SUPERLATIVE)
+    if superlative is not None:
+        word = superlative
+        return word[:-1] if word.endswith('нн') else word
+    if word.endswith('ь') and len(word) - 1 >= rv:
+        return word[:-1]
+    return word
@@ -1,9 +1,24 @@
-from django.urls import path
+from django.urls import path, register_converter
 
+from .shortlinks import CODE_PATTERN, decode, encode
 from .views import short_url_redirect
 
 app_name = 'recipes'
 
+
+class ShortCodeConverter:
+    regex = CODE_PATTERN
+
+    def to_python(self, value):
+        return decode(value)
+
+    def to_url(self, value):
+        return encode(value)
+
+
+register_converter(ShortCodeConverter, 'short_code')
+
 urlpatterns = [
-    path('<int:pk>/', short_url_redirect, name='short-link-redirect'),
+    path('<short_code:pk>/', short_url_redirect, name='short-link-redirect'),
+    path('<int:pk>/', short_url_redirect, name='legacy-short-link-redirect'),
 ]
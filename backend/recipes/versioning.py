@@ -0,0 +1,47 @@
+import time
+
+from django.conf import settings
+from django.core.cache import DEFAULT_CACHE_ALIAS, cache
+
+VERSION_KEY = 'version:{}'
+LOCAL_CACHE_BACKENDS = (
+    'django.core.cache.backends.locmem.LocMemCache',
+    'django.core.cache.backends.dummy.DummyCache',
+)
+
+
+def cache_is_shared(alias=DEFAULT_CACHE_ALIAS):
+    # Кэш в памяти процесса не видит изменений из других процессов.
+    return settings.CACHES[alias]['BACKEND'] not in LOCAL_CACHE_BACKENDS
+
+
+def initial_version():
+    # Версии отсчитываются от текущего времени, чтобы после очистки кэша
+    # или перезапуска не выдать уже использованный номер версии.
+    return time.time_ns() // 1000
+
+
+def version_timeout():
+    # В кэше процесса версии не видят изменений из других процессов
+    # (воркеры, manage.py), поэтому живут VERSION_LOCAL_TTL секунд: потом
+    # процесс получает новую версию и перечитывает данные из базы.
+    return None if cache_is_shared() else settings.VERSION_LOCAL_TTL
+
+
+def get_version(name):
+    key = VERSION_KEY.format(name)
+    version = cache.get(key)
+    if version is None:
+        cache.add(key, initial_version(), timeout=version_timeout())
+        version = cache.get(key)
+    return version
+
+
+def bump_version(name):
+    key = VERSION_KEY.format(name)
+    try:
+        return cache.incr(key)
+    except ValueError:
+        version = initial_version()
+        cache.set(key, version, timeout=version_timeout())
+        return version
@@ -1,10 +1,11 @@
+from django.conf import settings
 from django.http import Http404
 from django.shortcuts import redirect
 
-from .models import Recipe
+from .shortlinks import short_link_resolver
 
 
 def short_url_redirect(request, pk):
-    if not Recipe.objects.filter(pk=pk).exists():
+    if not short_link_resolver.exists(pk):
         raise Http404(f'Рецепт с id {pk} не найден.')
-    return redirect('api:recipe-detail', pk=pk)
+    return redirect(settings.FRONTEND_RECIPE_URL.format(pk))
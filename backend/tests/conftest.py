@@ -0,0 +1,82 @@
+import pytest
+from django.core.cache import caches
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from recipes.models import Ingredient, Recipe, RecipeIngredient, Tag
+
+
+@pytest.fixture(autouse=True)
+def media(settings, tmp_path):
+    # Загруженные в тестах файлы и их копии не попадают в backend/media.
+    settings.MEDIA_ROOT = str(tmp_path / 'media')
+    return tmp_path / 'media'
+
+
+@pytest.fixture(autouse=True)
+def clear_caches():
+    for cache in caches.all():
+        cache.clear()
+
+
+@pytest.fixture
+def client():
+    return APIClient()
+
+
+@pytest.fixture
+def user(django_user_model):
+    return django_user_model.objects.create_user(
+        username='user', email='user@example.com', password='password',
+        first_name='Имя', last_name='Фамилия'
+    )
+
+
+@pytest.fixture
+def user_client(user):
+    client = APIClient()
+    token, _ = Token.objects.get_or_create(user=user)
+    client.credentials(HTTP_AUTHORIZATION=f'Token {token.key}')
+    return client
+
+
+@pytest.fixture
+def make_user(django_user_model):
+    def make(username, **fields):
+        return django_user_model.objects.create_user(
+            username=username, email=f'{username}@example.com',
+            password='password', first_name='Имя', last_name='Фамилия',
+            **fields
+        )
+    return make
+
+
+@pytest.fixture
+def tag():
+    return Tag.objects.create(name='Завтрак', slug='breakfast')
+
+
+@pytest.fixture
+def make_ingredients():
+    def make(*names):
+        return [Ingredient.objects.create(name=name, measurement_unit='г')
+                for name in names]
+    return make
+
+
+@pytest.fixture
+def make_recipe(user):
+    def make(name='Рецепт', author=None, ingredients=(), tags=(), **fields):
+        recipe = Recipe.objects.create(
+            author=author or user, name=name,
+            description=fields.pop('description', f'Описание {name}'),
+            cooking_time=fields.pop('cooking_time', 10),
+            image='recipes/test.png', **fields
+        )
+        RecipeIngredient.objects.bulk_create(
+            RecipeIngredient(recipe=recipe, ingredient=ingredient, amount=1)
+            for ingredient in ingredients
+        )
+        recipe.tags.set(tags)
+        return recipe
+    return make
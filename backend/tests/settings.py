@@ -0,0 +1,10 @@
+import os
+
+os.environ.setdefault('DJANGO_SECRET_KEY', 'test')
+os.environ.setdefault('DJANGO_ALLOWED_HOSTS', 'testserver,localhost')
+os.environ.setdefault('DJANGO_DB_ENGINE', 'sqlite')
+
+from backend.settings import *  # noqa: E402,F401,F403
+
+IMAGE_PROCESSING = 'sync'
+QUERY_BUDGET_MODE = 'raise'
@@ -0,0 +1,64 @@
+import pytest
+from django.test import override_settings
+from rest_framework.authtoken.models import Token
+
+from api.authentication import TokenCache, get_auth_version
+
+SHARED_CACHE = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': None,
+    },
+}
+
+
+@pytest.fixture
+def shared_cache(tmp_path):
+    caches = {'default': {**SHARED_CACHE['default'],
+                          'LOCATION': str(tmp_path)}}
+    with override_settings(CACHES=caches):
+        yield
+
+
+def cache_token(token_cache, token):
+    token_cache.set(token.key, token.user, token,
+                    get_auth_version(token.user_id))
+
+
+@pytest.mark.django_db
+def test_revocation_reaches_other_process_cache(user, shared_cache):
+    token = Token.objects.create(user=user)
+    worker = TokenCache(max_size=10, ttl=300)
+    cache_token(worker, token)
+    assert worker.get(token.key) is not None
+
+    token.delete()
+
+    assert worker.get(token.key) is None
+
+
+@pytest.mark.django_db
+def test_deactivation_reaches_other_process_cache(user, shared_cache):
+    token = Token.objects.create(user=user)
+    worker = TokenCache(max_size=10, ttl=300)
+    cache_token(worker, token)
+
+    user.is_active = False
+    user.save()
+
+    assert worker.get(token.key) is None
+
+
+@pytest.mark.django_db
+def test_tokens_not_cached_without_shared_cache(user):
+    token = Token.objects.create(user=user)
+    worker = TokenCache(max_size=10, ttl=300)
+    cache_token(worker, token)
+    assert worker.get(token.key) is None
+
+
+@pytest.mark.django_db
+def test_deleted_token_rejected(user, user_client):
+    assert user_client.get('/api/users/me/').status_code == 200
+    Token.objects.filter(user=user).delete()
+    assert user_client.get('/api/users/me/').status_code == 401
@@ -0,0 +1,21 @@
+import io
+
+import pytest
+from django.core.management import call_command
+from rest_framework.authtoken.models import Token
+
+
+@pytest.mark.django_db
+def test_explain_queries_leaves_no_token(user, make_recipe,
+                                         make_ingredients, tag):
+    # Первичные ключи не начинаются с 1: адрес ингредиента берётся из базы.
+    make_ingredients('Лишний')[0].delete()
+    ingredient, = make_ingredients('Мука')
+    make_recipe(ingredients=[ingredient], tags=[tag])
+    stdout = io.StringIO()
+    call_command('explain_queries', stdout=stdout)
+    output = stdout.getvalue()
+    assert f'GET /api/ingredients/{ingredient.pk}/ -> 200' in output
+    assert 'GET /api/users/subscriptions/?recipes_limit=3 -> 200' in output
+    assert ' -> 40' not in output
+    assert not Token.objects.exists()
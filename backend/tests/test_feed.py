@@ -0,0 +1,146 @@
+from datetime import timedelta
+
+import pytest
+from django.utils import timezone
+
+from recipes.feed import get_feed, sync_feeds
+from recipes.models import FeedEntry, Recipe, Subscription
+
+FEED_URL = '/api/recipes/feed/'
+
+
+@pytest.fixture
+def small_feed(settings):
+    settings.FEED_MATERIALIZE_THRESHOLD = 2
+    settings.FEED_MAX_ENTRIES = 4
+
+
+@pytest.fixture
+def authors(make_user, make_recipe):
+    # Рецепты авторов чередуются по времени, у части совпадает дата.
+    now = timezone.now()
+    authors = [make_user(f'author{index}') for index in range(3)]
+    for index in range(12):
+        recipe = make_recipe(f'Рецепт {index}', author=authors[index % 3])
+        Recipe.objects.filter(pk=recipe.pk).update(
+            created_at=now - timedelta(minutes=index // 2 * 5)
+        )
+    return authors
+
+
+def subscribe(user, *authors):
+    for author in authors:
+        Subscription.objects.create(user=user, author=author)
+    user.refresh_from_db()
+
+
+def expected(user):
+    return list(Recipe.objects.filter(
+        author__authors__user=user
+    ).order_by('-created_at', '-id').values_list('id', flat=True))
+
+
+def walk(user, limit=3):
+    ids, position = [], None
+    while True:
+        rows = get_feed(user.pk, position, limit)
+        ids += [pk for _, pk in rows]
+        if len(rows) < limit:
+            return ids
+        position = rows[-1]
+
+
+@pytest.mark.django_db
+def test_merge_feed_matches_brute_force(small_feed, user, authors):
+    subscribe(user, *authors[:1])
+    assert walk(user) == expected(user)
+
+
+@pytest.mark.django_db
+def test_feed_read_does_not_materialize(small_feed, user, user_client,
+                                        authors):
+    subscribe(user, *authors)
+    ids, url = [], f'{FEED_URL}?limit=5'
+    while url:
+        data = user_client.get(url).json()
+        ids += [recipe['id'] for recipe in data['results']]
+        url = data['next']
+    assert ids == expected(user)
+    user.refresh_from_db()
+    assert not user.feed_materialized
+    assert not FeedEntry.objects.exists()
+
+
+@pytest.mark.django_db
+def test_sync_stores_newest_entries_and_merges_the_rest(small_feed, user,
+                                                        authors):
+    subscribe(user, *authors)
+    assert sync_feeds() == (1, 0, 0)
+    user.refresh_from_db()
+    assert user.feed_materialized
+    stored = list(FeedEntry.objects.filter(user=user).order_by(
+        '-created_at', '-recipe_id'
+    ).values_list('recipe_id', flat=True))
+    assert stored == expected(user)[:4]
+    assert walk(user) == expected(user)
+    assert walk(user, limit=1) == expected(user)
+
+
+@pytest.mark.django_db
+def test_published_recipes_are_fanned_out_and_trimmed(small_feed, user,
+                                                      authors, make_recipe):
+    subscribe(user, *authors)
+    sync_feeds()
+    new = [make_recipe(f'Новый {index}', author=authors[index % 3])
+           for index in range(3)]
+    assert FeedEntry.objects.filter(user=user).count() == 7
+    assert sync_feeds() == (0, 0, 3)
+    stored = list(FeedEntry.objects.filter(user=user).order_by(
+        '-created_at', '-recipe_id'
+    ).values_list('recipe_id', flat=True))
+    assert stored == expected(user)[:4]
+    assert stored[:3] == [recipe.pk for recipe in reversed(new)]
+    assert walk(user) == expected(user)
+
+
+@pytest.mark.django_db
+def test_subscriptions_keep_stored_prefix(small_feed, user, authors,
+                                          make_user, make_recipe):
+    subscribe(user, *authors[:2])
+    sync_feeds()
+    # Рецепты нового автора старше хранимого начала ленты и моложе его.
+    late = make_user('late')
+    old = make_recipe('Старый', author=late)
+    Recipe.objects.filter(pk=old.pk).update(
+        created_at=timezone.now() - timedelta(days=1)
+    )
+    fresh = make_recipe('Свежий', author=late)
+    subscribe(user, late)
+    stored = set(FeedEntry.objects.filter(user=user).values_list(
+        'recipe_id', flat=True
+    ))
+    assert fresh.pk in stored
+    assert old.pk not in stored
+    assert walk(user) == expected(user)
+    Subscription.objects.get(user=user, author=authors[0]).delete()
+    assert not FeedEntry.objects.filter(
+        user=user, recipe__author=authors[0]
+    ).exists()
+    assert walk(user) == expected(user)
+
+
+@pytest.mark.django_db
+def test_sync_returns_to_merge_below_half_threshold(settings, user, authors):
+    settings.FEED_MATERIALIZE_THRESHOLD = 4
+    subscribe(user, *authors)
+    user.feed_materialized = True
+    user.save(update_fields=['feed_materialized'])
+    assert sync_feeds() == (0, 0, 0)
+    Subscription.objects.filter(user=user).exclude(
+        author=authors[0]
+    ).delete()
+    assert sync_feeds() == (0, 1, 0)
+    user.refresh_from_db()
+    assert not user.feed_materialized
+    assert not FeedEntry.objects.filter(user=user).exists()
+    assert walk(user) == expected(user)
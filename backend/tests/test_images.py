@@ -0,0 +1,80 @@
+import base64
+import io
+
+import pytest
+from PIL import Image
+
+from recipes.images import detect_format, get_rendition, process_image
+
+AVATAR_URL = '/api/users/me/avatar/'
+
+
+def encode(content):
+    return 'data:image/png;base64,' + base64.b64encode(content).decode()
+
+
+def png():
+    buffer = io.BytesIO()
+    Image.new('RGBA', (400, 300), (255, 0, 0, 128)).save(buffer, 'PNG')
+    return buffer.getvalue()
+
+
+@pytest.mark.parametrize('content, expected', [
+    (b'\xff\xd8\xff\xe0rest', 'jpg'),
+    (b'\x89PNG\r\n\x1a\nrest', 'png'),
+    (b'GIF89arest', 'gif'),
+    (b'RIFF\x00\x00\x00\x00WEBPVP8 ', 'webp'),
+    (b'RIFF\x00\x00\x00\x00WAVEfmt ', None),
+    (b'<svg></svg>', None),
+])
+def test_detect_format(content, expected):
+    assert detect_format(content) == expected
+
+
+@pytest.mark.django_db
+def test_valid_image_is_processed_after_commit(
+        media, user, user_client, django_capture_on_commit_callbacks):
+    with django_capture_on_commit_callbacks(execute=True):
+        response = user_client.put(AVATAR_URL, {'avatar': encode(png())},
+                                   format='json')
+    assert response.status_code == 200
+    user.refresh_from_db()
+    assert user.avatar.name.endswith('.png')
+    path = get_rendition(user, 'avatar', 'thumbnail', 'webp')
+    assert path is not None
+    assert (media / path).exists()
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize('value', ['не base64!', encode(b'<svg></svg>')])
+def test_invalid_upload_is_rejected(media, user_client, value):
+    response = user_client.put(AVATAR_URL, {'avatar': value}, format='json')
+    assert response.status_code == 400
+    assert 'avatar' in response.json()
+
+
+@pytest.mark.django_db
+def test_oversized_upload_is_rejected_before_decoding(
+        settings, media, user_client):
+    settings.IMAGE_MAX_UPLOAD_SIZE = 1024
+    response = user_client.put(AVATAR_URL, {'avatar': encode(png() * 10)},
+                               format='json')
+    assert response.status_code == 400
+    assert 'МБ' in response.json()['avatar'][0]
+
+
+@pytest.mark.django_db
+def test_broken_image_is_marked_in_background(
+        media, user, user_client, django_capture_on_commit_callbacks):
+    # Сигнатура PNG верна, но изображение не читается: запрос проходит,
+    # а фоновая обработка отмечает файл и больше к нему не возвращается.
+    broken = png()[:40]
+    with django_capture_on_commit_callbacks(execute=True):
+        response = user_client.put(AVATAR_URL, {'avatar': encode(broken)},
+                                   format='json')
+    assert response.status_code == 200
+    user.refresh_from_db()
+    assert user.avatar_renditions == {'source': user.avatar.name,
+                                      'invalid': True}
+    assert get_rendition(user, 'avatar', 'thumbnail', 'webp') is None
+    assert process_image('recipes.FoodgramUser', user.pk, 'avatar') is None
@@ -0,0 +1,65 @@
+import time
+
+import pytest
+
+from recipes.models import Ingredient
+from recipes.search import IngredientIndex, invalidate_ingredient_index
+
+
+@pytest.fixture
+def short_version_ttl(settings):
+    settings.VERSION_LOCAL_TTL = 1
+
+
+def names(results):
+    return [item['name'] for item in results]
+
+
+@pytest.mark.django_db
+def test_prefix_matches_come_first(make_ingredients):
+    make_ingredients('сахарная пудра', 'ванильный сахар', 'сахар')
+    assert names(IngredientIndex().search('сах')) == [
+        'сахар', 'сахарная пудра', 'ванильный сахар'
+    ]
+
+
+@pytest.mark.django_db
+def test_saved_ingredient_is_found(make_ingredients):
+    index = IngredientIndex()
+    make_ingredients('соль')
+    assert names(index.search('сол')) == ['соль']
+    make_ingredients('солод')
+    assert names(index.search('сол')) == ['солод', 'соль']
+
+
+@pytest.mark.django_db
+def test_import_from_other_process_found_after_bump(make_ingredients):
+    index = IngredientIndex()
+    make_ingredients('соль')
+    assert names(index.search('сол')) == ['соль']
+    Ingredient.objects.bulk_create(
+        [Ingredient(name='солод', measurement_unit='г')]
+    )
+    assert names(index.search('сол')) == ['соль']
+    invalidate_ingredient_index()
+    assert names(index.search('сол')) == ['солод', 'соль']
+
+
+@pytest.mark.django_db
+def test_local_cache_staleness_is_bounded(short_version_ttl,
+                                          make_ingredients):
+    index = IngredientIndex()
+    make_ingredients('соль')
+    assert names(index.search('сол')) == ['соль']
+    # Импорт в другом процессе поднял версию только в своём кэше.
+    Ingredient.objects.bulk_create(
+        [Ingredient(name='солод', measurement_unit='г')]
+    )
+    time.sleep(1.1)
+    assert names(index.search('сол')) == ['солод', 'соль']
+
+
+@pytest.mark.django_db
+def test_search_endpoint_validates_limit(client):
+    response = client.get('/api/ingredients/?name=с&limit=x')
+    assert response.status_code == 400
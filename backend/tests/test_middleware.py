@@ -0,0 +1,118 @@
+import logging
+import re
+import time
+
+import pytest
+from rest_framework.serializers import Serializer
+
+from api.middleware import QueryBudgetExceeded, metrics_store
+from recipes.models import ShoppingCart
+
+SERVER_TIMING = re.compile(
+    r'db;dur=\d+\.\d{2};desc="(\d+) queries", app;dur=\d+\.\d{2},'
+    r' serialize;dur=(\d+\.\d{2}), render;dur=\d+\.\d{2},'
+    r' total;dur=\d+\.\d{2}'
+)
+ENDPOINT = 'GET api:tag-detail-list'
+CART_ENDPOINT = 'GET api:recipe-download_shopping_cart'
+CART_URL = '/api/recipes/download_shopping_cart/'
+
+
+@pytest.fixture
+def budget(settings):
+    def set_budget(queries, mode):
+        settings.QUERY_BUDGETS = {ENDPOINT: queries}
+        settings.QUERY_BUDGET_MODE = mode
+    return set_budget
+
+
+@pytest.mark.django_db
+def test_server_timing_header(client, tag):
+    response = client.get('/api/tags/')
+    match = SERVER_TIMING.fullmatch(response['Server-Timing'])
+    assert match is not None, response['Server-Timing']
+    assert int(match.group(1)) >= 1
+
+
+@pytest.mark.django_db
+def test_metrics_recorded_per_endpoint(client, tag):
+    metrics_store.clear()
+    client.get('/api/tags/')
+    client.get('/api/tags/')
+    stats = metrics_store.snapshot()[ENDPOINT]
+    assert stats['count'] == 2
+    assert set(stats) >= {'queries_avg', 'serialize_max', 'render_max',
+                          'total_avg'}
+
+
+@pytest.mark.django_db
+def test_serialization_is_timed_separately(client, tag, monkeypatch):
+    to_representation = Serializer.to_representation
+
+    def slow(self, instance):
+        time.sleep(0.05)
+        return to_representation(self, instance)
+
+    monkeypatch.setattr(Serializer, 'to_representation', slow)
+    metrics_store.clear()
+    response = client.get('/api/tags/')
+    match = SERVER_TIMING.fullmatch(response['Server-Timing'])
+    assert float(match.group(2)) >= 50
+    stats = metrics_store.snapshot()[ENDPOINT]
+    assert stats['serialize_max'] >= 0.05
+    assert stats['app_max'] < 0.05
+
+
+@pytest.fixture
+def cart(user, make_recipe, make_ingredients):
+    recipe = make_recipe(ingredients=make_ingredients('Мука', 'Соль'))
+    ShoppingCart.objects.create(user=user, recipe=recipe)
+    return recipe
+
+
+@pytest.mark.django_db
+def test_streamed_queries_are_counted(user_client, cart, settings):
+    metrics_store.clear()
+    response = user_client.get(CART_URL)
+    assert CART_ENDPOINT not in metrics_store.snapshot()
+    content = b''.join(response.streaming_content).decode()
+    assert 'Мука' in content
+    stats = metrics_store.snapshot()[CART_ENDPOINT]
+    assert stats['queries_max'] <= settings.QUERY_BUDGETS[CART_ENDPOINT]
+    assert stats['queries_max'] >= 3
+
+
+@pytest.mark.django_db
+def test_streamed_queries_over_budget_raise(user_client, cart, settings):
+    settings.QUERY_BUDGETS = {CART_ENDPOINT: 1}
+    response = user_client.get(CART_URL)
+    with pytest.raises(QueryBudgetExceeded, match=CART_ENDPOINT):
+        b''.join(response.streaming_content)
+
+
+@pytest.mark.django_db
+def test_over_budget_raises(client, tag, budget):
+    budget(0, 'raise')
+    with pytest.raises(QueryBudgetExceeded, match=ENDPOINT):
+        client.get('/api/tags/')
+
+
+@pytest.mark.django_db
+def test_over_budget_logs(client, tag, budget, caplog):
+    budget(0, 'log')
+    with caplog.at_level(logging.WARNING, logger='api.metrics'):
+        response = client.get('/api/tags/')
+    assert response.status_code == 200
+    assert [record.getMessage() for record in caplog.records
+            if record.name == 'api.metrics'] == [
+        f'{ENDPOINT}: 1 SQL-запросов при бюджете 0'
+    ]
+
+
+@pytest.mark.django_db
+def test_within_budget_is_silent(client, tag, budget, caplog):
+    budget(10, 'raise')
+    with caplog.at_level(logging.WARNING, logger='api.metrics'):
+        assert client.get('/api/tags/').status_code == 200
+    assert not [record for record in caplog.records
+                if record.name == 'api.metrics']
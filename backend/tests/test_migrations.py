@@ -0,0 +1,54 @@
+import pytest
+from django.db import connection
+from django.db.migrations.executor import MigrationExecutor
+
+BEFORE = [('recipes', '0010_hot_path_indexes')]
+AFTER = [('recipes', '0011_ingredient_natural_key')]
+
+
+def migrate(targets):
+    executor = MigrationExecutor(connection)
+    executor.loader.build_graph()
+    executor.migrate(targets)
+    return executor.loader.project_state(targets).apps
+
+
+@pytest.fixture
+def latest_after():
+    yield
+    migrate(MigrationExecutor(connection).loader.graph.leaf_nodes())
+
+
+@pytest.mark.django_db(transaction=True)
+def test_duplicate_ingredients_are_merged(latest_after):
+    apps = migrate(BEFORE)
+    User = apps.get_model('recipes', 'FoodgramUser')
+    Ingredient = apps.get_model('recipes', 'Ingredient')
+    Recipe = apps.get_model('recipes', 'Recipe')
+    RecipeIngredient = apps.get_model('recipes', 'RecipeIngredient')
+    author = User.objects.create(username='author', email='a@example.com')
+    salt, copy, other_copy = (
+        Ingredient.objects.create(name='Соль', measurement_unit='г')
+        for _ in range(3)
+    )
+    sugar = Ingredient.objects.create(name='Сахар', measurement_unit='г')
+    soup, cake = (
+        Recipe.objects.create(author=author, name=name, description='Текст',
+                              cooking_time=10, image='recipes/test.png')
+        for name in ('Суп', 'Торт')
+    )
+    for recipe, ingredient, amount in ((soup, salt, 5), (soup, copy, 3),
+                                       (soup, other_copy, 2), (soup, sugar, 1),
+                                       (cake, copy, 7)):
+        RecipeIngredient.objects.create(recipe=recipe, ingredient=ingredient,
+                                        amount=amount)
+    apps = migrate(AFTER)
+    Ingredient = apps.get_model('recipes', 'Ingredient')
+    RecipeIngredient = apps.get_model('recipes', 'RecipeIngredient')
+    assert list(Ingredient.objects.filter(name='Соль').values_list(
+        'pk', flat=True
+    )) == [salt.pk]
+    assert sorted(RecipeIngredient.objects.values_list(
+        'recipe_id', 'ingredient_id', 'amount'
+    )) == sorted([(soup.pk, salt.pk, 10), (soup.pk, sugar.pk, 1),
+                  (cake.pk, salt.pk, 7)])
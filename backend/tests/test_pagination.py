@@ -0,0 +1,113 @@
+import base64
+import json
+
+import pytest
+
+from recipes.models import Recipe
+
+ORDERINGS = (None, 'name', '-name', 'cooking_time', '-cooking_time',
+             'author', '-author')
+
+
+@pytest.fixture
+def recipes(make_user, make_recipe):
+    # Имена и почты авторов идут в обратном порядке их id, а названия и
+    # время приготовления повторяются.
+    authors = [make_user(username) for username in ('zed', 'yan', 'xia')]
+    return [
+        make_recipe(name=f'Рецепт {number % 4}', author=authors[number % 3],
+                    cooking_time=number % 5 + 1)
+        for number in range(23)
+    ]
+
+
+def walk(client, ordering):
+    url = '/api/recipes/?cursor=&limit=4'
+    if ordering:
+        url += f'&ordering={ordering}'
+    ids = []
+    while url:
+        response = client.get(url)
+        assert response.status_code == 200, response.content
+        page = response.json()
+        ids += [recipe['id'] for recipe in page['results']]
+        url = page['next']
+    return ids
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize('ordering', ORDERINGS)
+def test_cursor_walk_returns_every_recipe_once(client, recipes, ordering):
+    ids = walk(client, ordering)
+    assert len(ids) == len(set(ids))
+    assert set(ids) == set(Recipe.objects.values_list('id', flat=True))
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize('ordering', ORDERINGS)
+def test_cursor_walk_matches_offset_order_of_sort_key(client, recipes,
+                                                      ordering):
+    field = (ordering or 'name').lstrip('-')
+    attname = Recipe._meta.get_field(field).attname
+    values = [getattr(Recipe.objects.get(pk=pk), attname)
+              for pk in walk(client, ordering)]
+    assert values == sorted(values,
+                            reverse=bool(ordering)
+                            and ordering.startswith('-'))
+
+
+@pytest.mark.django_db
+def test_cursor_rejected_for_relevance_ordering(client, recipes):
+    response = client.get('/api/recipes/?cursor=&search=рецепт')
+    assert response.status_code == 400
+    assert 'cursor' in response.json()
+
+
+@pytest.mark.django_db
+def test_broken_cursor_is_not_found(client, recipes):
+    assert client.get('/api/recipes/?cursor=abc').status_code == 404
+
+
+def cursor(position):
+    return base64.urlsafe_b64encode(json.dumps(position).encode()).decode()
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize('ordering, position', [
+    ('name', 'ab'),
+    ('name', {'a': 1}),
+    ('name', [1]),
+    ('name', [1, 2, 3]),
+    ('name', [None, None]),
+    ('name', ['a', 'b']),
+    ('name', ['a', True]),
+    ('name', [None, 1]),
+    ('cooking_time', ['a', 1]),
+    ('cooking_time', [[1], 1]),
+    ('author', ['b', 1]),
+])
+def test_malformed_cursor_is_not_found(client, recipes, ordering, position):
+    response = client.get('/api/recipes/',
+                          {'cursor': cursor(position), 'ordering': ordering})
+    assert response.status_code == 404
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize('position', [
+    'ab', [None, None], ['a', 'b'], ['вчера', 1], [1, 1],
+    ['2024-13-45T00:00:00', 1],
+])
+def test_malformed_feed_cursor_is_not_found(user_client, position):
+    response = user_client.get('/api/recipes/feed/',
+                               {'cursor': cursor(position)})
+    assert response.status_code == 404
+
+
+@pytest.mark.django_db
+def test_well_formed_cursor_is_accepted(client, recipes):
+    response = client.get('/api/recipes/', {
+        'cursor': cursor(['3', 0]), 'ordering': 'cooking_time'
+    })
+    assert response.status_code == 200
+    assert {recipe['cooking_time'] for recipe in response.json()['results']
+            } <= {3, 4, 5}
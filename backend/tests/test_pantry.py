@@ -0,0 +1,121 @@
+import pytest
+from django.conf import settings
+
+from api import views
+from recipes.models import RecipeIngredient
+from recipes.pantry import PantryIndex
+
+PANTRY_URL = '/api/recipes/pantry/'
+
+
+@pytest.fixture
+def index(monkeypatch):
+    # Индекс модуля переживает тесты, а id рецептов в новой базе
+    # повторяются, поэтому каждый тест получает свой.
+    index = PantryIndex(settings.PANTRY_MAX_CHANGES, 8)
+    monkeypatch.setattr(views, 'pantry_index', index)
+    return index
+
+
+@pytest.fixture
+def ingredients(make_ingredients):
+    return make_ingredients('Мука', 'Яйца', 'Молоко', 'Сахар', 'Соль',
+                            'Масло')
+
+
+@pytest.fixture
+def recipes(ingredients, make_recipe):
+    compositions = ((0, 1, 2), (0, 1), (1,), (2, 3, 4, 5), (0, 3),
+                    (4,), (0, 1, 2, 3), (5, 1), (3,))
+    return [make_recipe(f'Рецепт {index}',
+                        ingredients=[ingredients[i] for i in composition])
+            for index, composition in enumerate(compositions)]
+
+
+def brute_force(ingredient_ids, max_missing=None):
+    recipes = {}
+    for recipe_id, ingredient_id in RecipeIngredient.objects.values_list(
+            'recipe_id', 'ingredient_id'):
+        recipes.setdefault(recipe_id, set()).add(ingredient_id)
+    ranked = []
+    for recipe_id, ingredients in recipes.items():
+        matched = len(ingredients & set(ingredient_ids))
+        missing = len(ingredients) - matched
+        if matched and (max_missing is None or missing <= max_missing):
+            ranked.append((missing, -matched, recipe_id))
+    return [(recipe_id, -matched, missing)
+            for missing, matched, recipe_id in sorted(ranked)]
+
+
+def fetch_all(client, query, limit=2):
+    results, url = [], f'{PANTRY_URL}?{query}&limit={limit}'
+    while url:
+        response = client.get(url)
+        assert response.status_code == 200
+        data = response.json()
+        results += [(item['id'], item['matched_ingredients'],
+                     item['missing_ingredients'])
+                    for item in data['results']]
+        url = data['next']
+    return results
+
+
+def ids(ingredients, *positions):
+    return [ingredients[position].pk for position in positions]
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize('positions, max_missing', [
+    ((0, 1), None),
+    ((0, 1, 2), 0),
+    ((3, 4, 5), 1),
+    ((1,), 2),
+])
+def test_pantry_matches_brute_force(client, index, ingredients, recipes,
+                                    positions, max_missing):
+    ingredient_ids = ids(ingredients, *positions)
+    query = 'ingredients=' + ','.join(map(str, ingredient_ids))
+    if max_missing is not None:
+        query += f'&max_missing={max_missing}'
+    assert fetch_all(client, query) == brute_force(ingredient_ids,
+                                                   max_missing)
+
+
+@pytest.mark.django_db
+def test_pantry_index_updates_incrementally(
+        monkeypatch, index, ingredients, recipes,
+        django_capture_on_commit_callbacks):
+    ingredient_ids = ids(ingredients, 0, 1)
+    assert list(index.search(ingredient_ids)[:]) == brute_force(
+        ingredient_ids
+    )
+
+    def fail():
+        raise AssertionError('Индекс перестроен целиком.')
+
+    monkeypatch.setattr(index, 'build', fail)
+    with django_capture_on_commit_callbacks(execute=True):
+        RecipeIngredient.objects.create(recipe=recipes[5],
+                                        ingredient=ingredients[0], amount=1)
+        RecipeIngredient.objects.get(recipe=recipes[2]).delete()
+    assert list(index.search(ingredient_ids)[:]) == brute_force(
+        ingredient_ids
+    )
+    with django_capture_on_commit_callbacks(execute=True):
+        recipes[1].delete()
+    assert list(index.search(ingredient_ids, 0)[:]) == brute_force(
+        ingredient_ids, 0
+    )
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize('query, field', [
+    ('', 'ingredients'),
+    ('ingredients=', 'ingredients'),
+    ('ingredients=1,мука', 'ingredients'),
+    ('ingredients=1&max_missing=много', 'max_missing'),
+])
+def test_pantry_invalid_parameters(client, index, query, field):
+    response = client.get(f'{PANTRY_URL}?{query}')
+    assert response.status_code == 400
+    assert field in response.json()
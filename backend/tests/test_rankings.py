@@ -0,0 +1,155 @@
+from datetime import timedelta
+
+import pytest
+from django.utils import timezone
+
+from recipes.models import (FavoriteRecipe, PopularRecipe, ShoppingCart,
+                            SimilarRecipe)
+from recipes.rankings import (compute_popular, compute_similar, store_rankings,
+                              update_rankings)
+
+
+@pytest.fixture
+def recipes(make_recipe, make_ingredients):
+    # У A с B два общих редких ингредиента, у A с C — один; остальные
+    # рецепты с A не пересекаются. Соль есть почти везде.
+    ingredients = make_ingredients(*(f'Продукт {index}'
+                                     for index in range(12)), 'Соль')
+    salt = ingredients[-1]
+    compositions = {'A': (0, 1, 2), 'B': (0, 1), 'C': (2, 3), 'D': (4,)}
+    recipes = {
+        name: make_recipe(name, ingredients=[ingredients[index]
+                                             for index in composition]
+                          + [salt])
+        for name, composition in compositions.items()
+    }
+    for index in range(5, 12):
+        recipes[f'filler{index}'] = make_recipe(
+            f'Рецепт {index}', ingredients=[ingredients[index], salt]
+        )
+    return recipes
+
+
+def favorite(users, recipe, days_ago=0):
+    for user in users:
+        entry = FavoriteRecipe.objects.create(user=user, recipe=recipe)
+        FavoriteRecipe.objects.filter(pk=entry.pk).update(
+            created_at=timezone.now() - timedelta(days=days_ago)
+        )
+
+
+def similar_ids(similar, recipe):
+    return [other_id for other_id, _ in similar.get(recipe.pk, ())]
+
+
+@pytest.mark.django_db
+def test_similar_by_shared_ingredients(recipes):
+    similar = compute_similar(limit=5, ingredient_weight=1.0)
+    assert similar_ids(similar, recipes['A']) == [recipes['B'].pk,
+                                                  recipes['C'].pk]
+    assert similar_ids(similar, recipes['D']) == []
+    scores = [score for _, score in similar[recipes['A'].pk]]
+    assert 1 >= scores[0] > scores[1] > 0
+
+
+@pytest.mark.django_db
+def test_similar_by_co_favorites(recipes, make_user):
+    users = [make_user(f'fan{index}') for index in range(4)]
+    favorite(users[:3], recipes['D'])
+    favorite(users[:2], recipes['filler5'])
+    favorite(users[2:3], recipes['filler6'])
+    favorite(users[3:], recipes['filler7'])
+    similar = compute_similar(limit=5, ingredient_weight=0.0)
+    assert similar_ids(similar, recipes['D']) == [recipes['filler5'].pk,
+                                                  recipes['filler6'].pk]
+    assert similar_ids(similar, recipes['filler7']) == []
+
+
+@pytest.mark.django_db
+def test_heavy_favoriting_user_is_ignored(recipes, make_user):
+    heavy, fan = make_user('heavy'), make_user('fan')
+    for recipe in recipes.values():
+        favorite([heavy], recipe)
+    favorite([fan], recipes['D'])
+    favorite([fan], recipes['filler5'])
+    similar = compute_similar(limit=20, ingredient_weight=0.0)
+    assert similar_ids(similar, recipes['D']) == [recipes['filler5'].pk]
+
+
+@pytest.mark.django_db
+def test_similar_limit(recipes):
+    similar = compute_similar(limit=1, ingredient_weight=1.0)
+    assert similar_ids(similar, recipes['A']) == [recipes['B'].pk]
+
+
+@pytest.mark.django_db
+def test_popular_decays_with_age(recipes, user, make_user):
+    fans = [make_user(f'fan{index}') for index in range(3)]
+    favorite(fans, recipes['A'], days_ago=21)
+    favorite(fans[:1], recipes['B'], days_ago=0)
+    ShoppingCart.objects.create(user=user, recipe=recipes['C'])
+    now = timezone.now()
+    popular = compute_popular(limit=10, half_life_days=7, cart_weight=2,
+                              now=now)
+    assert [recipe_id for recipe_id, _ in popular] == [
+        recipes['C'].pk, recipes['B'].pk, recipes['A'].pk
+    ]
+    scores = dict(popular)
+    assert scores[recipes['C'].pk] == pytest.approx(2, rel=1e-3)
+    assert scores[recipes['A'].pk] == pytest.approx(3 / 8, rel=1e-3)
+    assert compute_popular(limit=1, half_life_days=7, cart_weight=2,
+                           now=now) == popular[:1]
+
+
+@pytest.mark.django_db
+def test_nothing_to_rank():
+    assert compute_similar(limit=5, ingredient_weight=0.5) == {}
+    assert compute_popular(limit=5, half_life_days=7, cart_weight=2) == []
+
+
+@pytest.mark.django_db
+def test_rebuild_replaces_rows(recipes, make_user):
+    fan = make_user('fan')
+    favorite([fan], recipes['D'])
+    update_rankings()
+    assert list(PopularRecipe.objects.values_list('recipe_id', flat=True)) == [
+        recipes['D'].pk
+    ]
+    FavoriteRecipe.objects.all().delete()
+    favorite([fan], recipes['B'])
+    deleted = recipes['C'].pk
+    similar = compute_similar(limit=5, ingredient_weight=1.0)
+    recipes['C'].delete()
+    store_rankings(similar, compute_popular(10, 7, 2))
+    assert list(PopularRecipe.objects.values_list('recipe_id', flat=True)) == [
+        recipes['B'].pk
+    ]
+    assert not SimilarRecipe.objects.filter(recipe_id=deleted).exists()
+    assert not SimilarRecipe.objects.filter(similar_id=deleted).exists()
+    assert list(SimilarRecipe.objects.filter(
+        recipe=recipes['A']
+    ).order_by('position').values_list('similar_id', flat=True)) == [
+        recipes['B'].pk
+    ]
+
+
+@pytest.mark.django_db
+def test_popular_and_similar_actions(client, recipes, make_user):
+    fans = [make_user(f'fan{index}') for index in range(2)]
+    favorite(fans, recipes['D'])
+    favorite(fans[:1], recipes['filler5'])
+    update_rankings()
+    response = client.get('/api/recipes/popular/')
+    assert response.status_code == 200
+    assert [recipe['id'] for recipe in response.json()['results']] == [
+        recipes['D'].pk, recipes['filler5'].pk
+    ]
+    response = client.get(f'/api/recipes/{recipes["A"].pk}/similar/')
+    assert response.status_code == 200
+    assert [recipe['id'] for recipe in response.json()] == [
+        recipes['B'].pk, recipes['C'].pk
+    ]
+    response = client.get(f'/api/recipes/{recipes["A"].pk}/similar/',
+                          {'limit': 1})
+    assert [recipe['id'] for recipe in response.json()] == [recipes['B'].pk]
+    assert client.get('/api/recipes/999999/similar/').status_code == 404
@@ -0,0 +1,53 @@
+import time
+
+import pytest
+
+from recipes.models import Tag
+from recipes.versioning import bump_version
+
+
+@pytest.fixture
+def short_version_ttl(settings):
+    settings.VERSION_LOCAL_TTL = 1
+
+
+def tag_names(client):
+    return [tag['name'] for tag in client.get('/api/tags/').json()]
+
+
+@pytest.mark.django_db
+def test_tag_change_resets_rendered_list(client, tag):
+    assert tag_names(client) == ['Завтрак']
+    tag.name = 'Ужин'
+    tag.save()
+    assert tag_names(client) == ['Ужин']
+
+
+@pytest.mark.django_db
+def test_change_from_other_process_seen_after_bump(client, tag):
+    assert tag_names(client) == ['Завтрак']
+    # Другой процесс меняет базу и поднимает версию в общем кэше.
+    Tag.objects.filter(pk=tag.pk).update(name='Ужин')
+    assert tag_names(client) == ['Завтрак']
+    bump_version('tags')
+    assert tag_names(client) == ['Ужин']
+
+
+@pytest.mark.django_db
+def test_local_cache_staleness_is_bounded(short_version_ttl, client, tag):
+    assert tag_names(client) == ['Завтрак']
+    # Изменение из другого процесса не дошло до кэша этого процесса.
+    Tag.objects.filter(pk=tag.pk).update(name='Ужин')
+    time.sleep(1.1)
+    assert tag_names(client) == ['Ужин']
+
+
+@pytest.mark.django_db
+def test_etag_stops_matching_after_change(client, tag):
+    etag = client.get('/api/tags/')['ETag']
+    assert client.get('/api/tags/',
+                      HTTP_IF_NONE_MATCH=etag).status_code == 304
+    tag.name = 'Ужин'
+    tag.save()
+    assert client.get('/api/tags/',
+                      HTTP_IF_NONE_MATCH=etag).status_code == 200
@@ -0,0 +1,163 @@
+import io
+
+import pytest
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from PIL import Image
+
+from api.caching import response_cache_stats
+from recipes.images import process_image
+from recipes.models import RecipeIngredient
+
+LIST_URL = '/api/recipes/'
+
+
+def detail_url(recipe):
+    return f'/api/recipes/{recipe.pk}/'
+
+
+@pytest.fixture
+def commit(django_capture_on_commit_callbacks):
+    # Версии кэша поднимаются после коммита.
+    return lambda: django_capture_on_commit_callbacks(execute=True)
+
+
+@pytest.fixture
+def recipes(make_recipe, make_user, make_ingredients, tag):
+    salt, sugar = make_ingredients('Соль', 'Сахар')
+    author = make_user('author')
+    return (
+        make_recipe('Суп', author=author, ingredients=[salt], tags=[tag]),
+        make_recipe('Торт', ingredients=[sugar]),
+    )
+
+
+def fetch(client, url, **params):
+    response = client.get(url, params)
+    assert response.status_code == 200
+    return response.get('X-Cache'), response.json()
+
+
+def warm(client, *urls):
+    for url in urls:
+        fetch(client, url)
+        assert fetch(client, url)[0] == 'HIT'
+
+
+@pytest.mark.django_db
+def test_miss_then_hit(client, recipes):
+    response_cache_stats.clear()
+    first = fetch(client, LIST_URL, limit=1, offset=1)
+    second = fetch(client, f'{LIST_URL}?offset=1&limit=1')
+    assert (first[0], second[0]) == ('MISS', 'HIT')
+    assert first[1] == second[1]
+    assert fetch(client, LIST_URL, limit=2)[0] == 'MISS'
+    stats = response_cache_stats.snapshot()['GET api:recipe-list']
+    assert (stats['hits'], stats['misses']) == (1, 2)
+
+
+@pytest.mark.django_db
+def test_authenticated_requests_bypass_cache(client, user_client, recipes):
+    warm(client, LIST_URL, detail_url(recipes[0]))
+    for url in (LIST_URL, detail_url(recipes[0])):
+        response = user_client.get(url)
+        assert response.status_code == 200
+        assert 'X-Cache' not in response
+
+
+@pytest.mark.django_db
+def test_missing_recipe_is_not_cached(client, recipes):
+    for _ in range(2):
+        response = client.get('/api/recipes/999999/')
+        assert response.status_code == 404
+        assert 'X-Cache' not in response
+
+
+@pytest.mark.django_db
+def test_recipe_edit_invalidates_only_its_pages(client, recipes, commit):
+    soup, cake = recipes
+    warm(client, LIST_URL, detail_url(soup), detail_url(cake))
+    with commit():
+        soup.name = 'Борщ'
+        soup.save()
+    status, data = fetch(client, detail_url(soup))
+    assert (status, data['name']) == ('MISS', 'Борщ')
+    status, data = fetch(client, LIST_URL)
+    assert status == 'MISS'
+    assert 'Борщ' in [recipe['name'] for recipe in data['results']]
+    assert fetch(client, detail_url(cake))[0] == 'HIT'
+
+
+@pytest.mark.django_db
+def test_tag_rename_invalidates_tagged_recipes(client, recipes, tag,
+                                               commit):
+    soup, cake = recipes
+    warm(client, LIST_URL, detail_url(soup), detail_url(cake))
+    with commit():
+        tag.name = 'Обед'
+        tag.save()
+    status, data = fetch(client, detail_url(soup))
+    assert (status, data['tags'][0]['name']) == ('MISS', 'Обед')
+    assert fetch(client, LIST_URL)[0] == 'MISS'
+    assert fetch(client, detail_url(cake))[0] == 'HIT'
+
+
+@pytest.mark.django_db
+def test_ingredient_changes_invalidate_recipes(client, recipes, commit):
+    soup, cake = recipes
+    warm(client, detail_url(soup), detail_url(cake))
+    salt = soup.ingredients.get()
+    with commit():
+        salt.name = 'Морская соль'
+        salt.save()
+    status, data = fetch(client, detail_url(soup))
+    assert (status, data['ingredients'][0]['name']) == ('MISS',
+                                                        'Морская соль')
+    assert fetch(client, detail_url(cake))[0] == 'HIT'
+    warm(client, detail_url(cake))
+    entry = RecipeIngredient.objects.get(recipe=cake)
+    with commit():
+        entry.amount = 5
+        entry.save()
+    status, data = fetch(client, detail_url(cake))
+    assert (status, data['ingredients'][0]['amount']) == ('MISS', 5)
+
+
+@pytest.mark.django_db
+def test_author_profile_update_invalidates_recipes(client, recipes,
+                                                   commit):
+    soup, cake = recipes
+    warm(client, detail_url(soup), detail_url(cake))
+    with commit():
+        soup.author.first_name = 'Пётр'
+        soup.author.save()
+    status, data = fetch(client, detail_url(soup))
+    assert (status, data['author']['first_name']) == ('MISS', 'Пётр')
+    assert fetch(client, detail_url(cake))[0] == 'HIT'
+
+
+@pytest.mark.django_db
+def test_login_does_not_invalidate(client, recipes, commit):
+    soup, _ = recipes
+    warm(client, detail_url(soup))
+    with commit():
+        soup.author.save(update_fields=['last_login'])
+    assert fetch(client, detail_url(soup))[0] == 'HIT'
+
+
+@pytest.mark.django_db
+def test_rendition_completion_invalidates_list(client, recipes, commit):
+    soup, _ = recipes
+    buffer = io.BytesIO()
+    Image.new('RGB', (400, 300), 'red').save(buffer, 'PNG')
+    default_storage.save(soup.image.name, ContentFile(buffer.getvalue()))
+    _, data = fetch(client, LIST_URL)
+    assert fetch(client, LIST_URL)[0] == 'HIT'
+    with commit():
+        process_image('recipes.Recipe', soup.pk, 'image')
+    status, fresh = fetch(client, LIST_URL)
+    assert status == 'MISS'
+    images = {recipe['id']: recipe['image'] for recipe in fresh['results']}
+    assert images[soup.pk] != {recipe['id']: recipe['image']
+                               for recipe in data['results']}[soup.pk]
+    assert '/renditions/' in images[soup.pk]
@@ -0,0 +1,71 @@
+import pytest
+
+from recipes.fulltext import fts5_query
+from recipes.stemmer import stem
+
+RECIPES_URL = '/api/recipes/'
+
+
+@pytest.mark.parametrize('word, expected', [
+    ('картофель', 'картофел'),
+    ('пирожки', 'пирожк'),
+    ('красивая', 'красив'),
+    ('варенье', 'варен'),
+    ('запечённый', 'запечен'),
+    ('вкуснейший', 'вкусн'),
+    ('помидоров', 'помидор'),
+    ('готовившись', 'готов'),
+    ('сладость', 'сладост'),
+    ('борщ', 'борщ'),
+])
+def test_stem(word, expected):
+    assert stem(word) == expected
+
+
+def test_fts5_query():
+    assert fts5_query('Жареная картошка, жареные!') == (
+        '"жарен"* "картошк"*'
+    )
+    assert fts5_query('а и') == ''
+
+
+@pytest.fixture
+def recipes(make_recipe):
+    return {
+        'name': make_recipe('Жареная картошка',
+                            description='Картофель с луком на сковороде.'),
+        'description': make_recipe(
+            'Салат', description='Подаётся к жареной картошке.'
+        ),
+        'other': make_recipe('Борщ', description='Свёкла и капуста.'),
+    }
+
+
+def search(client, text):
+    response = client.get(RECIPES_URL, {'search': text})
+    assert response.status_code == 200
+    return [recipe['id'] for recipe in response.json()['results']]
+
+
+@pytest.mark.django_db
+def test_search_finds_word_forms_and_ranks_name_first(client, recipes):
+    assert search(client, 'жареную картошку') == [
+        recipes['name'].pk, recipes['description'].pk
+    ]
+
+
+@pytest.mark.django_db
+def test_search_follows_recipe_changes(
+        client, recipes, django_capture_on_commit_callbacks):
+    assert search(client, 'свёклой') == [recipes['other'].pk]
+    with django_capture_on_commit_callbacks(execute=True):
+        recipes['other'].description = 'Капуста и морковь.'
+        recipes['other'].save()
+    assert search(client, 'свёклой') == []
+    assert search(client, 'морковью') == [recipes['other'].pk]
+
+
+@pytest.mark.django_db
+def test_search_without_terms_returns_nothing(client, recipes):
+    assert search(client, 'а') == []
+    assert len(search(client, '  ')) == len(recipes)
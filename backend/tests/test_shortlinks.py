@@ -0,0 +1,59 @@
+import pytest
+
+from recipes.shortlinks import ShortLinkResolver, decode, encode
+
+
+@pytest.fixture
+def resolver():
+    return ShortLinkResolver(max_size=100, ttl=3600, negative_ttl=60)
+
+
+@pytest.mark.parametrize('pk', [0, 1, 51, 52, 61, 62, 3843, 10 ** 9])
+def test_code_round_trip(pk):
+    code = encode(pk)
+    assert code[0].isalpha()
+    assert decode(code) == pk
+
+
+@pytest.mark.parametrize('code', ['', '1a', 'a-', 'A0!'])
+def test_invalid_code_rejected(code):
+    with pytest.raises((ValueError, KeyError)):
+        decode(code)
+
+
+@pytest.mark.django_db
+def test_new_recipe_keeps_cached_links(resolver, make_recipe,
+                                       django_assert_num_queries):
+    first = make_recipe()
+    assert resolver.exists(first.pk)
+    assert not resolver.exists(first.pk + 1)
+
+    second = make_recipe(name='Второй')
+
+    with django_assert_num_queries(0):
+        assert resolver.exists(first.pk)
+    assert resolver.exists(second.pk)
+
+
+@pytest.mark.django_db
+def test_deleted_recipe_drops_only_its_link(resolver, make_recipe,
+                                            django_assert_num_queries):
+    first, second = make_recipe(), make_recipe(name='Второй')
+    assert resolver.exists(first.pk) and resolver.exists(second.pk)
+
+    first.delete()
+
+    assert not resolver.exists(first.pk)
+    with django_assert_num_queries(0):
+        assert resolver.exists(second.pk)
+
+
+@pytest.mark.django_db
+def test_redirect(client, make_recipe, settings):
+    recipe = make_recipe()
+    response = client.get(f'/s/{encode(recipe.pk)}/')
+    assert response.status_code == 302
+    assert response['Location'] == settings.FRONTEND_RECIPE_URL.format(
+        recipe.pk
+    )
+    assert client.get(f'/s/{encode(recipe.pk + 1)}/').status_code == 404
@@ -0,0 +1,32 @@
+import pytest
+
+from recipes.models import Subscription
+
+SUBSCRIPTIONS_URL = '/api/users/subscriptions/'
+
+
+@pytest.mark.django_db
+def test_no_subscriptions_with_recipes_limit(user_client):
+    response = user_client.get(SUBSCRIPTIONS_URL, {'recipes_limit': 2})
+    assert response.status_code == 200
+    assert response.json()['results'] == []
+
+
+@pytest.mark.django_db
+def test_recipes_limit_per_author(user, user_client, make_user,
+                                  make_recipe):
+    authors = [make_user(f'author{index}') for index in range(3)]
+    for author in authors[:2]:
+        Subscription.objects.create(user=user, author=author)
+    for index in range(9):
+        make_recipe(f'Рецепт {index}', author=authors[index % 3])
+    response = user_client.get(SUBSCRIPTIONS_URL, {'recipes_limit': 2})
+    assert response.status_code == 200
+    results = {author['id']: author for author in response.json()['results']}
+    assert set(results) == {authors[0].pk, authors[1].pk}
+    for author in authors[:2]:
+        names = [recipe['name'] for recipe in results[author.pk]['recipes']]
+        assert names == sorted(author.recipes.values_list(
+            'name', flat=True
+        ))[:2]
+        assert results[author.pk]['recipes_count'] == 3